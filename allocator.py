@@ -0,0 +1,161 @@
+from typing import List, Dict, Set, Tuple, Iterable
+
+from optimizer import Line, UnknownCode, parse_lines, get_reads, get_written, get_successors, build_program_block
+from program_block import ProgramBlock
+
+WORD_SIZE = 4       # the addresses of two variables (or temps) are this far from each other
+
+
+# the temps which each line reads and writes, an indirect operand reads the temp which has the address
+def get_uses(line: Line, temps: range) -> Tuple[Set[int], Set[int]]:
+    reads = {number for mode, number in get_reads(line) if mode != '#' and number in temps}
+    written = get_written(line)
+    writes = {written[1]} if written is not None and written[0] == '' and written[1] in temps else set()
+    return reads, writes
+
+
+# the temps which are live after each line (their value may be read later)
+def get_live_out(lines: List[Line], temps: range) -> List[Set[int]]:
+    uses = [get_uses(line, temps) for line in lines]
+    successors = [[s for s in get_successors(lines, i) if s < len(lines)] for i in range(len(lines))]
+    live_in: List[Set[int]] = [set() for _ in lines]
+    live_out: List[Set[int]] = [set() for _ in lines]
+    changed = True
+    while changed:      # the lines are visited backwards, so most programs need two rounds
+        changed = False
+        for i in range(len(lines) - 1, -1, -1):
+            out = set().union(*(live_in[s] for s in successors[i]))
+            reads, writes = uses[i]
+            new_in = (out - writes) | reads
+            if new_in != live_in[i] or out != live_out[i]:
+                live_in[i], live_out[i] = new_in, out
+                changed = True
+    return live_out
+
+
+# the graph of the temps which are live at the same time, a temp interferes with the temps which are
+# live after the lines which write it
+def get_interference(lines: List[Line], temps: range, live_out: List[Set[int]]) -> Dict[int, Set[int]]:
+    graph: Dict[int, Set[int]] = {}
+    for line, out in zip(lines, live_out):
+        reads, writes = get_uses(line, temps)
+        for temp in reads | writes | out:
+            graph.setdefault(temp, set())
+        for temp in writes:
+            for other in out:
+                if other != temp:
+                    graph[temp].add(other)
+                    graph[other].add(temp)
+    return graph
+
+
+# the temps whose address is used as a number (an immediate), they must keep a slot of their own
+def get_pinned(lines: List[Line], temps: range) -> Set[int]:
+    pinned = set()
+    for line in lines:
+        for operand in line[1:]:
+            if type(operand) is tuple and operand[0] == '#' and operand[1] in temps:
+                pinned.add(operand[1])
+    return pinned
+
+
+# gives each temp a slot, two temps share a slot when they are never live at the same time
+def color(graph: Dict[int, Set[int]], pinned: Set[int]) -> Tuple[Dict[int, int], int]:
+    slots: Dict[int, int] = {}
+    slot_count = 0
+    for temp in sorted(graph):      # in the order the code generator has made them
+        if temp in pinned:
+            slots[temp] = slot_count
+            slot_count += 1
+            continue
+        used = {slots[other] for other in graph[temp] if other in slots}
+        used.update(slots[other] for other in pinned if other in slots)
+        slot = next(s for s in range(slot_count + 1) if s not in used)
+        slots[temp] = slot
+        slot_count = max(slot_count, slot + 1)
+    return slots, slot_count
+
+
+# moves the arrays from their own region (arrays) to data_end, right after the variables
+# a direct operand in the region is an array (or one of its elements), and the code generator has marked the
+# (line, column) of each immediate which is the address of an array (a literal can't be told apart from it)
+# returns the new program block and the first address after the arrays
+def place_arrays(program_block: ProgramBlock, arrays: range, data_end: int,
+                 immediates: Iterable[Tuple[int, int]]) -> Tuple[ProgramBlock, int]:
+    end = data_end + WORD_SIZE * len(arrays)
+    if not arrays:
+        return program_block, end
+    marked = set(immediates)
+
+    def move(operand: object, cell: Tuple[int, int]) -> object:
+        if type(operand) is int and operand >= arrays.start:
+            return data_end + operand - arrays.start
+        if type(operand) is str and operand:
+            mode = operand[0] if operand[0] in '#@' else ''
+            number = operand[len(mode):]
+            if number.isdecimal() and number.isascii() and int(number) >= arrays.start and \
+                    (mode == '' or mode == '#' and cell in marked):
+                return mode + str(data_end + int(number) - arrays.start)
+        return operand
+
+    placed = ProgramBlock()
+    for i, (op, x, y, z) in enumerate(program_block):
+        if op == 'JP':      # the jump targets are line numbers
+            placed[i] = op, x, y, z
+        elif op == 'JPF':
+            placed[i] = op, move(x, (i, 1)), y, z
+        else:
+            placed[i] = op, move(x, (i, 1)), move(y, (i, 2)), move(z, (i, 3))
+    return placed, end
+
+
+# moves the temps (and the stack after them) right after the data without reusing them, for the code which
+# can't be analyzed
+def relocate(program_block: ProgramBlock, temps: range, data_end: int, stack_base: int = 0) -> Tuple[ProgramBlock, int]:
+    def move(operand: object) -> object:
+        if type(operand) is int and (operand in temps or 0 < stack_base <= operand):
+            return data_end + (operand - temps.start) // temps.step * WORD_SIZE
+        if type(operand) is str and operand:
+            mode = operand[0] if operand[0] in '#@' else ''
+            number = operand[len(mode):]
+            if number.isdecimal() and number.isascii() and move(int(number)) != int(number):
+                return mode + str(move(int(number)))
+        return operand
+
+    relocated = ProgramBlock()
+    for i, (op, x, y, z) in enumerate(program_block):
+        if op == 'JP':      # the jump targets are line numbers
+            relocated[i] = op, x, y, z
+        elif op == 'JPF':
+            relocated[i] = op, move(x), y, z
+        else:
+            relocated[i] = op, move(x), move(y), move(z)
+    return relocated, data_end + WORD_SIZE * len(temps)
+
+
+# moves the temps right after the data, a temp reuses the address of a temp which is no longer live
+# data_end is the first address after the variables and the arrays, the temps of the code generator are in temps
+# a positive stack_base is the first address of the runtime stack (right after the temps), the stack is moved
+# right after the new temps
+# returns the new program block and the first address after the temps (the memory the program needs)
+def allocate(program_block: ProgramBlock, temps: range, data_end: int, stack_base: int = 0) -> Tuple[ProgramBlock, int]:
+    try:
+        lines = parse_lines(program_block)
+    except UnknownCode:
+        return relocate(program_block, temps, data_end, stack_base)
+    if any(line[0] in {'JP', 'JPF'} and line[1 if line[0] == 'JP' else 2] > len(lines) for line in lines):
+        return relocate(program_block, temps, data_end, stack_base)
+    live_out = get_live_out(lines, temps)
+    slots, slot_count = color(get_interference(lines, temps, live_out), get_pinned(lines, temps))
+    end = data_end + WORD_SIZE * slot_count
+    addresses = {temp: data_end + WORD_SIZE * slot for temp, slot in slots.items()}
+    for line in lines:
+        if line[0] in {'JP', None}:
+            continue
+        for i in range(1, 4):
+            operand = line[i]
+            if type(operand) is tuple and operand[1] in addresses:
+                line[i] = operand[0], addresses[operand[1]]
+            elif type(operand) is tuple and 0 < stack_base <= operand[1]:
+                line[i] = operand[0], end + operand[1] - stack_base
+    return build_program_block(lines), end
@@ -0,0 +1,165 @@
+"""
+    Batch compiler
+    compiles many C-minus files on all the cores, each file gets its own directory of outputs
+    (output.txt, syntax_errors.txt and parse_tree.txt) under the output directory
+
+    usage: python batch.py [-j JOBS] [-o OUTPUT_DIR] [-O] [--tree] [--suffix .txt] [--timeout SECONDS]
+                           [--cache CACHE_DIR] [--cache-size MB] FILE_OR_DIRECTORY...
+"""
+import argparse
+import io
+import os
+import signal
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple, Optional
+
+from compile_cache import CompileCache, get_program_block, MAX_SIZE
+from compiler import write_parse_tree, write_syntax_errors, write_output, build_program
+from dfa import CompiledDFA
+from parse import Parser
+from parse_table import load_table
+from parse_tree import render_tree
+
+# result of a file: (file name, elapsed seconds, size in bytes, number of syntax errors, failure message,
+# whether it was taken from the cache)
+Result = Tuple[str, float, int, int, Optional[str], bool]
+
+
+# all the files to compile, a directory is searched recursively for the files which end with suffix
+def collect_files(paths: List[str], suffix: str) -> List[str]:
+    files = []
+    for path in paths:
+        if not os.path.isdir(path):
+            files.append(path)
+            continue
+        for directory, sub_directories, names in os.walk(path):
+            sub_directories.sort()
+            files.extend(os.path.join(directory, name) for name in sorted(names) if name.endswith(suffix))
+    return files
+
+
+# the directory of the outputs of a file, it keeps the path of the file so two inputs never share it
+# (the path is relative to the current directory, or absolute for the files outside of it)
+def get_output_dir(file_name: str, output_dir: str) -> str:
+    path = os.path.relpath(file_name)
+    if path.startswith(os.pardir):
+        path = os.path.splitdrive(os.path.abspath(file_name))[1].lstrip(os.sep)
+    return os.path.join(output_dir, os.path.splitext(path)[0])
+
+
+# loads the parse table and the lexer table once in each worker, the parsers of the worker share them
+def init_worker() -> None:
+    load_table()
+    CompiledDFA()
+
+
+def raise_timeout(*_) -> None:
+    raise TimeoutError('compilation timed out')
+
+
+# compile a single file and write its outputs, a failure is returned instead of being raised
+# a positive timeout stops the compilation of a file which takes longer than that (the panic mode may never end)
+# with a cache directory, an unchanged file is not parsed again and only its cached outputs are written
+def compile_file(file_name: str, output_dir: str, tree: bool, timeout: float = 0,
+                 cache_dir: Optional[str] = None, optimized: bool = False) -> Result:
+    start = time.perf_counter()
+    if timeout > 0:
+        signal.signal(signal.SIGALRM, raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        with open(file_name, 'rb') as file:
+            content = file.read()
+        directory = get_output_dir(file_name, output_dir)
+        os.makedirs(directory, exist_ok=True)
+        cache = CompileCache(cache_dir) if cache_dir else None
+        key = cache.get_key(content, 'O' if optimized else '') if cache else ''
+        entry = cache.get(key) if cache else None
+        cached = entry is not None and (not tree or entry[2] is not None)   # an entry may have no parse tree
+        if cached:
+            program_block, syntax_errors = get_program_block(entry[0]), entry[1]
+            if tree:
+                with open(os.path.join(directory, 'parse_tree.txt'), mode='w', encoding='utf-8') as file:
+                    file.write(entry[2])
+        else:
+            parser = Parser(file_name, tree='node' if tree else None)
+            root = parser.get_parse_tree()
+            program_block, syntax_errors = build_program(parser, optimized)[0], parser.get_syntax_errors()
+            rendered_tree = None
+            if tree and cache:
+                rendered_tree = io.StringIO()
+                render_tree(root, rendered_tree)
+                rendered_tree = rendered_tree.getvalue()
+                with open(os.path.join(directory, 'parse_tree.txt'), mode='w', encoding='utf-8') as file:
+                    file.write(rendered_tree)
+            elif tree:
+                write_parse_tree(root, os.path.join(directory, 'parse_tree.txt'))
+            if cache:
+                cache.put(key, (list(program_block.instructions()), syntax_errors, rendered_tree))
+        write_syntax_errors(syntax_errors, os.path.join(directory, 'syntax_errors.txt'))
+        write_output(program_block, os.path.join(directory, 'output.txt'))
+        return file_name, time.perf_counter() - start, len(content), len(syntax_errors), None, cached
+    except Exception:
+        failure = traceback.format_exc(limit=-1).strip().splitlines()[-1]
+        return file_name, time.perf_counter() - start, 0, 0, failure, False
+    finally:
+        if timeout > 0:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+# compile the files with the given number of processes (1 compiles them in this process)
+# the results are in the order of the files, whatever the number of processes is
+def compile_files(files: List[str], output_dir: str, tree: bool = False, jobs: int = 0,
+                  timeout: float = 0, cache_dir: Optional[str] = None, optimized: bool = False) -> List[Result]:
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(files) < 2:
+        return [compile_file(file_name, output_dir, tree, timeout, cache_dir, optimized) for file_name in files]
+    with ProcessPoolExecutor(min(jobs, len(files)), initializer=init_worker) as executor:
+        chunk_size = max(1, len(files) // (jobs * 8))     # fewer round trips, but still balanced
+        count = len(files)
+        return list(executor.map(compile_file, files, [output_dir] * count, [tree] * count, [timeout] * count,
+                                 [cache_dir] * count, [optimized] * count, chunksize=chunk_size))
+
+
+# print the failures and the aggregate timing of the batch
+def report(results: List[Result], elapsed: float, jobs: int) -> None:
+    failed = [result for result in results if result[4] is not None]
+    for file_name, _, _, _, failure, _ in failed:
+        print(f'{file_name}: {failure}', file=sys.stderr)
+    compile_time = sum(result[1] for result in results)
+    size = sum(result[2] for result in results)
+    errors = sum(result[3] for result in results)
+    cached = sum(result[5] for result in results)
+    print(f'{len(results)} files ({len(failed)} failed, {cached} cached, {errors} syntax errors), {size / 1024:.1f} KB')
+    print(f'wall time {elapsed:.3f} s, compile time {compile_time:.3f} s, '
+          f'{len(results) / elapsed if elapsed else 0:.1f} files/s, {size / 1024 / elapsed if elapsed else 0:.1f} KB/s '
+          f'with {jobs} processes')
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='compile C-minus files in parallel')
+    arg_parser.add_argument('paths', nargs='+', help='source files or directories of source files')
+    arg_parser.add_argument('-j', '--jobs', type=int, default=0, help='number of processes (default: all cores)')
+    arg_parser.add_argument('-o', '--output-dir', default='build', help='directory of the outputs (default: build)')
+    arg_parser.add_argument('-O', '--optimize', action='store_true',
+                            help='optimize the three address codes (programs with functions are not optimized)')
+    arg_parser.add_argument('--tree', action='store_true', help='write parse_tree.txt too')
+    arg_parser.add_argument('--suffix', default='.txt', help='suffix of the sources in the directories')
+    arg_parser.add_argument('--timeout', type=float, default=0, help='seconds a file may take (default: no limit)')
+    arg_parser.add_argument('--cache', help='directory of the compile cache (default: no cache)')
+    arg_parser.add_argument('--cache-size', type=float, default=MAX_SIZE / (1 << 20),
+                            help=f'size limit of the cache in MB (default: {MAX_SIZE >> 20})')
+    args = arg_parser.parse_args()
+    source_files = collect_files(args.paths, args.suffix)
+    processes = args.jobs or os.cpu_count() or 1
+    batch_start = time.perf_counter()
+    batch_results = compile_files(source_files, args.output_dir, args.tree, processes, args.timeout, args.cache,
+                                  args.optimize)
+    report(batch_results, time.perf_counter() - batch_start, processes)
+    if args.cache:      # the cache is trimmed once after the build, not by every worker
+        compile_cache = CompileCache(args.cache, int(args.cache_size * (1 << 20)))
+        hits = sum(result[5] for result in batch_results)
+        compile_cache.record(hits, len(batch_results) - hits, compile_cache.evict())
+    sys.exit(1 if any(result[4] is not None for result in batch_results) else 0)
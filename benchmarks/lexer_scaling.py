@@ -0,0 +1,56 @@
+"""
+    Lexer scaling benchmark
+    times the lexers on inputs which contain one long block comment,
+    the time per character should stay the same when the comment gets longer
+
+    usage: python benchmarks/lexer_scaling.py [largest comment size in bytes]
+"""
+import os
+import sys
+import tempfile
+import time
+from typing import Type
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lexer import Lexer
+from regex_lexer import RegexLexer
+
+
+# write a program with a single comment of the given size
+def write_input(file_name: str, size: int) -> None:
+    line = 'a * b / c ** d\n'     # the stars make the DFA go back inside the comment
+    with open(file_name, 'w') as file:
+        file.write('int a;\n/*')
+        file.write(line * (size // len(line)))
+        file.write('*/\nint b;\n')
+
+
+# read all the tokens of the file and return the elapsed time
+def time_lexer(lexer_type: Type[Lexer], file_name: str) -> float:
+    start = time.perf_counter()
+    lexer = lexer_type(file_name)
+    while lexer.get_next_token()[0] != '$$':
+        pass
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    largest = int(sys.argv[1]) if len(sys.argv) > 1 else 1 << 20
+    sizes = []
+    size = largest
+    while size >= 1 << 14 and len(sizes) < 5:
+        sizes.append(size)
+        size //= 2
+    with tempfile.TemporaryDirectory() as directory:
+        file_name = os.path.join(directory, 'input.txt')
+        print(f'{"lexer":<12}{"size":>10}{"seconds":>10}{"ns/char":>10}')
+        for lexer_type in (Lexer, RegexLexer):
+            for size in reversed(sizes):
+                write_input(file_name, size)
+                elapsed = time_lexer(lexer_type, file_name)
+                print(f'{lexer_type.__name__:<12}{size:>10}{elapsed:>10.3f}{elapsed / size * 1e9:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+"""
+    Benchmark suite
+    times the lexer alone, the lexer with the parser (without the code generator), the parser alone on the
+    token arrays of the lexer and the whole compiler on generated programs of each shape, the size doubles from
+    the smallest to the largest one
+    every run is a fresh process, so the peak memory of a run is its own
+    the results can be saved and compared with the results of an older revision
+
+    usage: python benchmarks/suite.py [-s SHAPE ...] [--stages STAGE ...] [--min TOKENS] [--max TOKENS]
+                                      [-r REPEAT] [--save LABEL] [--compare OLD.json] [--threshold PERCENT]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Dict, Tuple, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.workloads import SHAPES, WorkloadGenerator
+from grammar_reader import read_grammar
+from lexer import Lexer
+from profiler import get_peak_memory
+from token_array import TokenArray
+
+RESULTS_DIRECTORY = os.path.join(ROOT, 'benchmarks', 'results')
+STAGES = ['lex', 'parse', 'tokens', 'compile']
+
+# a run: (shape, size, stage) -> tokens, characters, best seconds, peak memory and the error (if it failed)
+Key = Tuple[str, int, str]
+
+
+def count_tokens(file_name: str) -> int:
+    lexer = Lexer(file_name)
+    count = 0
+    while lexer.get_next_token()[0] != '$$':
+        count += 1
+    return count
+
+
+def run_lexer(file_name: str) -> None:
+    lexer = Lexer(file_name)
+    while lexer.get_next_token()[0] != '$$':
+        pass
+
+
+# the parser without the code generator (and without a parse tree)
+# with a token array, the parser walks the tokens which are already lexed
+def run_parser(file_name: str, tokens: Optional[TokenArray] = None) -> None:
+    from parse import Parser
+    parser = Parser(None if tokens else file_name, tree=None, tokens=tokens)
+    parser.code_generator.code_gen = lambda rule, lexeme: None
+    parser.get_parse_tree()
+
+
+# the whole compiler like compiler.py, the outputs are written to a temporary directory
+def run_compiler(file_name: str, optimized: bool) -> None:
+    from compiler import build_program, write_parse_tree, write_syntax_errors, write_output
+    from parse import Parser
+    parser = Parser(file_name, tree='node')
+    root = parser.get_parse_tree()
+    with tempfile.TemporaryDirectory() as directory:
+        write_parse_tree(root, os.path.join(directory, 'parse_tree.txt'))
+        write_syntax_errors(parser.get_syntax_errors(), os.path.join(directory, 'syntax_errors.txt'))
+        write_output(build_program(parser, optimized)[0], os.path.join(directory, 'output.txt'))
+
+
+def on_timeout(signum: int, frame: object) -> None:
+    raise TimeoutError('timed out')
+
+
+# runs a stage repeat times in this (fresh) process, returns the best time, the peak memory and the error
+def measure(stage: str, file_name: str, repeat: int, timeout: int, optimized: bool) -> Tuple[float, int, str]:
+    if hasattr(signal, 'SIGALRM'):
+        signal.signal(signal.SIGALRM, on_timeout)
+        signal.alarm(timeout)
+    best = float('inf')
+    try:
+        tokens = None
+        if stage == 'tokens':       # the input is lexed once, the runs only parse it
+            tokens = TokenArray(Lexer(file_name))
+        for _ in range(repeat):
+            start = time.perf_counter()
+            if stage == 'lex':
+                run_lexer(file_name)
+            elif stage == 'parse' or stage == 'tokens':
+                run_parser(file_name, tokens)
+            else:
+                run_compiler(file_name, optimized)
+            best = min(best, time.perf_counter() - start)
+    except Exception as error:    # a failed run is reported, the rest of the suite goes on
+        return best, get_peak_memory(), f'{type(error).__name__}: {error}'
+    finally:
+        if hasattr(signal, 'SIGALRM'):
+            signal.alarm(0)
+    return best, get_peak_memory(), ''
+
+
+def get_revision() -> str:
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                  text=True, check=True).stdout.strip()
+        changed = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                                 capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return revision + ('-dirty' if changed else '')
+
+
+def get_sizes(smallest: int, largest: int) -> List[int]:
+    sizes = []
+    size = smallest
+    while size <= largest:
+        sizes.append(size)
+        size *= 2
+    return sizes
+
+
+# runs the suite, prints a line for each run and returns the results
+def run_suite(shapes: List[str], stages: List[str], sizes: List[int], repeat: int, timeout: int, seed: int,
+              optimized: bool) -> List[dict]:
+    rules = read_grammar()[0]
+    results = []
+    context = multiprocessing.get_context('spawn')
+    print(f'{"shape":<12}{"tokens":>9}{"stage":>9}{"seconds":>10}{"tokens/s":>11}{"ns/token":>10}{"scaling":>9}'
+          f'{"peak MB":>9}')
+    with tempfile.TemporaryDirectory() as directory, context.Pool(1, maxtasksperchild=1) as pool:
+        for shape in shapes:
+            first: Dict[str, float] = {}     # ns/token of the smallest size of each stage
+            for size in sizes:
+                file_name = os.path.join(directory, f'{shape}_{size}.txt')
+                program = WorkloadGenerator(shape, seed, rules).generate(size)
+                with open(file_name, 'w') as file:
+                    file.write(program)
+                tokens = count_tokens(file_name)
+                for stage in stages:
+                    seconds, memory, error = pool.apply(measure, (stage, file_name, repeat, timeout, optimized))
+                    results.append({'shape': shape, 'size': size, 'stage': stage, 'tokens': tokens,
+                                    'characters': len(program), 'seconds': None if error else seconds,
+                                    'peak_memory': memory, 'error': error})
+                    if error:
+                        print(f'{shape:<12}{tokens:>9}{stage:>9}  failed: {error}')
+                        continue
+                    ns_per_token = seconds / tokens * 1e9
+                    scaling = ns_per_token / first.setdefault(stage, ns_per_token)
+                    print(f'{shape:<12}{tokens:>9}{stage:>9}{seconds:>10.3f}{tokens / seconds:>11.0f}'
+                          f'{ns_per_token:>10.0f}{scaling:>9.2f}{memory / (1 << 20):>9.1f}')
+    return results
+
+
+# the runs which are slower than in the old results by more than threshold percent
+def compare(results: List[dict], old_results: List[dict], threshold: float) -> List[str]:
+    old: Dict[Key, dict] = {(r['shape'], r['size'], r['stage']): r for r in old_results}
+    regressions = []
+    for result in results:
+        before = old.get((result['shape'], result['size'], result['stage']))
+        if before is None or result['seconds'] is None:
+            if before is not None and before['seconds'] is not None:
+                regressions.append(f'{result["shape"]} {result["size"]} {result["stage"]}: now fails')
+            continue
+        if before['seconds'] is None:
+            continue
+        change = (result['seconds'] / before['seconds'] - 1) * 100
+        if change > threshold:
+            regressions.append(f'{result["shape"]} {result["size"]} {result["stage"]}: '
+                               f'{before["seconds"]:.3f}s -> {result["seconds"]:.3f}s (+{change:.0f}%)')
+    return regressions
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description='benchmark the compiler on generated programs')
+    arg_parser.add_argument('-s', '--shapes', nargs='+', choices=sorted(SHAPES), default=sorted(SHAPES))
+    arg_parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    arg_parser.add_argument('--min', type=int, default=1000, help='tokens of the smallest program (default: 1000)')
+    arg_parser.add_argument('--max', type=int, default=16000, help='tokens of the largest program (default: 16000)')
+    arg_parser.add_argument('-r', '--repeat', type=int, default=3, help='the best of this many runs (default: 3)')
+    arg_parser.add_argument('--timeout', type=int, default=60, help='seconds of a stage before it fails')
+    arg_parser.add_argument('--seed', type=int, default=0, help='seed of the workload generator')
+    arg_parser.add_argument('-O', dest='optimized', action='store_true', help='optimize the code in the compile stage '
+                            '(programs with functions are not optimized)')
+    arg_parser.add_argument('--save', metavar='LABEL', help='save the results as benchmarks/results/LABEL.json')
+    arg_parser.add_argument('--compare', metavar='OLD', help='results of an older revision to compare with')
+    arg_parser.add_argument('--threshold', type=float, default=10.0,
+                            help='a run which is slower by more percent is a regression (default: 10)')
+    args = arg_parser.parse_args()
+
+    results = run_suite(args.shapes, args.stages, get_sizes(args.min, args.max), args.repeat, args.timeout,
+                        args.seed, args.optimized)
+    report = {'revision': get_revision(), 'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+              'python': platform.python_version(), 'machine': platform.machine(), 'repeat': args.repeat,
+              'seed': args.seed, 'optimized': args.optimized, 'results': results}
+    if args.save:
+        os.makedirs(RESULTS_DIRECTORY, exist_ok=True)
+        file_name = os.path.join(RESULTS_DIRECTORY, f'{args.save}.json')
+        with open(file_name, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f'saved to {file_name}')
+    if args.compare:
+        with open(args.compare) as file:
+            old_report = json.load(file)
+        regressions = compare(results, old_report['results'], args.threshold)
+        print(f'compared with {old_report["revision"]}: {len(regressions)} regressions')
+        for regression in regressions:
+            print('  ' + regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""
+    Workload generator
+    generates random C-minus programs from the rules of grammar/grammar.y, the shape of a program
+    (deep nesting, long expressions, many arrays, comments or syntax errors) is given by the weights
+    of the rules and the noise which is added to the tokens
+
+    usage: python benchmarks/workloads.py [-s SHAPE] [-n TOKENS] [--seed N] [-o FILE]
+"""
+import argparse
+import os
+import random
+import sys
+from typing import List, Dict, Tuple, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from grammar_reader import Rule, read_grammar
+
+# a shape: (weights of the rules by their text, max nesting depth, comment rate, error rate)
+# a rule which isn't in the weights has the weight 1, the rates are per token
+Shape = Tuple[Dict[str, float], int, float, float]
+
+BALANCED = {'statement_list -> statement_list statement': 6, 'local_declarations -> local_declarations '
+            'var_declaration': 2, 'factor -> call': 0.2, 'statement -> return_stmt': 0.2,
+            'expression_stmt -> break ;': 0.1, 'statement -> switch_stmt': 0.3}
+SHAPES: Dict[str, Shape] = {
+    'balanced': (BALANCED, 8, 0.0, 0.0),
+    'nested': ({**BALANCED, 'statement_list -> statement_list statement': 2, 'statement -> selection_stmt': 4,
+                'statement -> iteration_stmt': 4, 'statement -> switch_stmt': 2, 'statement -> compound_stmt': 2,
+                'case_stmts -> case_stmts case_stmt': 2}, 40, 0.0, 0.0),
+    'expressions': ({**BALANCED, 'additive_expression -> additive_expression addop term': 8,
+                     'term -> term mulop factor': 4, 'factor -> ( expression )': 2, 'statement -> expression_stmt': 6},
+                    24, 0.0, 0.0),
+    'arrays': ({**BALANCED, 'var_declaration -> type_specifier ID [ p_num NUM ] ;': 8,
+                'local_declarations -> local_declarations var_declaration': 6,
+                'var -> p_id ID [ expression ]': 6}, 8, 0.0, 0.0),
+    'comments': (BALANCED, 8, 0.5, 0.0),
+    'errors': (BALANCED, 8, 0.0, 0.05),
+}
+
+NAMES = [f'v{i}' for i in range(32)]        # names of the variables (and the functions)
+COMMENTS = ['/* a comment */', '/* a ** longer * comment\n   over two lines */', '// a line comment\n']
+NOISE = [';', '(', ')', '{', '}', '[', ']', '=', '+', '*', 'else', 'int', '5', 'x']      # tokens which break rules
+
+
+# a random program generator, the nonterminals are expanded with an explicit stack so long lists are cheap
+class WorkloadGenerator:
+
+    def __init__(self, shape: str = 'balanced', seed: int = 0, rules: Optional[List[Rule]] = None) -> None:
+        weights, self.max_depth, self.comment_rate, self.error_rate = SHAPES[shape]
+        self.rules = rules if rules is not None else read_grammar()[0]
+        self.random = random.Random(seed)
+        self.alternatives: Dict[str, List[int]] = {}    # rules of each nonterminal
+        for i, (lhs, _) in enumerate(self.rules):
+            self.alternatives.setdefault(lhs, []).append(i)
+        self.weights = [weights.get(f'{lhs} -> {" ".join(rhs) or "epsilon"}', 1.0) for lhs, rhs in self.rules]
+        self.heights = self.get_heights()
+
+    # the smallest depth of a derivation of each rule, the deepest expansions take the lowest rules
+    def get_heights(self) -> List[float]:
+        heights = {lhs: float('inf') for lhs in self.alternatives}
+        rule_heights = [float('inf')] * len(self.rules)
+        changed = True
+        while changed:
+            changed = False
+            for i, (lhs, rhs) in enumerate(self.rules):
+                height = 1 + max((heights.get(symbol, 0) for symbol in rhs), default=0)
+                if height < rule_heights[i]:
+                    rule_heights[i] = height
+                    changed = True
+                heights[lhs] = min(heights[lhs], height)
+        return rule_heights
+
+    # a nonterminal which is too deep (or over the budget of tokens) takes its lowest rule
+    def choose_rule(self, nonterminal: str, depth: int, over_budget: bool) -> int:
+        alternatives = self.alternatives[nonterminal]
+        if depth >= self.max_depth or over_budget:
+            return min(alternatives, key=lambda i: self.heights[i])
+        return self.random.choices(alternatives, [self.weights[i] for i in alternatives])[0]
+
+    # the tokens of a nonterminal, a left recursive rule (a list) keeps the depth of its nonterminal
+    # after about budget tokens, the rest of the nonterminals are expanded as small as they can be
+    def expand(self, symbol: str, depth: int = 0, budget: int = 1 << 62) -> List[str]:
+        tokens = []
+        stack = [(symbol, depth)]
+        while stack:
+            symbol, depth = stack.pop()
+            if symbol not in self.alternatives:
+                tokens.append(self.get_lexeme(symbol))
+                continue
+            lhs, rhs = self.rules[self.choose_rule(symbol, depth, len(tokens) + len(stack) >= budget)]
+            stack.extend((child, depth if child == lhs and j == 0 else depth + 1) for j, child in
+                         reversed(list(enumerate(rhs))))
+        return tokens
+
+    def get_lexeme(self, terminal: str) -> str:
+        if terminal == 'ID':
+            return self.random.choice(NAMES)
+        if terminal == 'NUM':
+            return str(self.random.randint(1, 64))
+        return terminal
+
+    # a program of about the given number of tokens: declarations and functions, and main at the end
+    # (main has a quarter of the tokens)
+    def generate(self, size: int) -> str:
+        tokens = []
+        while len(tokens) < size * 3 // 4:
+            tokens.extend(self.expand('declaration', 1, size * 3 // 4 - len(tokens)))
+        tokens.extend(['void', 'main', '(', 'void', ')'])
+        tokens.extend(self.expand('compound_stmt', 2, max(size - len(tokens), 16)))
+        return self.render(tokens)
+
+    # joins the tokens, with the comments and the syntax errors of the shape
+    def render(self, tokens: List[str]) -> str:
+        lines, line = [], []
+        for token in tokens:
+            if self.error_rate and self.random.random() < self.error_rate:
+                token = self.random.choice(NOISE + [''])       # a wrong token or a missing one
+            if self.comment_rate and self.random.random() < self.comment_rate:
+                line.append(self.random.choice(COMMENTS))
+            line.append(token)
+            if token in {';', '{', '}'} or len(line) > 16:
+                lines.append(' '.join(line))
+                line = []
+        lines.append(' '.join(line))
+        return '\n'.join(lines) + '\n'
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description='generate a random C-minus program')
+    arg_parser.add_argument('-s', '--shape', choices=sorted(SHAPES), default='balanced', help='shape of the program')
+    arg_parser.add_argument('-n', '--tokens', type=int, default=1000, help='about this many tokens (default: 1000)')
+    arg_parser.add_argument('--seed', type=int, default=0, help='seed of the random generator')
+    arg_parser.add_argument('-o', '--output', help='output file (default: stdout)')
+    args = arg_parser.parse_args()
+    program = WorkloadGenerator(args.shape, args.seed).generate(args.tokens)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(program)
+    else:
+        sys.stdout.write(program)
+
+
+if __name__ == '__main__':
+    main()
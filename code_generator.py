@@ -1,4 +1,10 @@
+from typing import Optional, List, Dict, Tuple
+
 from lexer import Lexer
+from program_block import ProgramBlock, VIRTUAL_TEMP
+from symbol_table import SymbolTable, Symbol, is_keyword
+
+MAX_UNROLLED = 8        # a longer part of a frame is saved (and restored) by a loop
 
 
 # determines the address type (implicit, explicit or immediate)
@@ -6,17 +12,52 @@ def get_str_val(item: list) -> str:
     return ('' if not item[1] else '#' if item[1] == 1 else '@') + str(item[0])
 
 
+# a function of the program, its params, locals and temps have static addresses (its frame)
+# a recursive call pushes the frame of the function to the runtime stack and pops it after the call,
+# so the other calls need no frame setup at all
+class Function:
+    __slots__ = ('symbol', 'params', 'return_address', 'frame_start', 'first_array', 'first_temp', 'skip', 'entry',
+                 'returns')
+
+    def __init__(self, symbol: Symbol, return_address: int, frame_start: int, first_array: int) -> None:
+        self.symbol = symbol                    # symbol of the function, its address keeps the return value
+        self.params: List[Symbol] = []          # params in their order
+        self.return_address = return_address    # the line which the function returns to
+        self.frame_start = frame_start          # first address of the frame (the return address, params and locals)
+        self.first_array = first_array          # first address of the local arrays of the frame
+        self.first_temp = 0                     # first temp of the function
+        self.skip = -1                          # the jump over the function, its code only runs when it's called
+        self.entry = -1                         # first line of the function
+        self.returns: List[int] = []            # the jumps of the returns of main, to the end of main
+
+
 class CodeGenerator:
 
-    def __init__(self, lexer: Lexer) -> None:
+    # the temps (from first_temp) and the arrays have virtual addresses, compiler.build_program lays them out after
+    # the variables once the code is complete
+    def __init__(self, lexer: Lexer, first_temp: int = VIRTUAL_TEMP) -> None:
         self.lexer = lexer          # lexer instance of the compiler
-        self.program_block = [[None, None, None, None] for _ in range(100)]     # program block
+        self.program_block = ProgramBlock()     # program block, it grows with the program
         self.stack = []             # semantic stack
         self.breaks_link = []       # linked list used for implementation of breaks
-        self.current_scope = 0      # scope counter
+        self.current_scope = 0      # scope counter (of the breaks)
+        self.symbols = SymbolTable()    # symbol table, its scopes are the functions and the compound statements
+        self.declared: Optional[Symbol] = None      # the last declared symbol
+        self.declaration: Optional[Symbol] = None   # a global declaration which hasn't ended, or a function
+        self.in_params = False      # are we declaring the params of a function or not
+        self.functions: Dict[int, Function] = {}    # functions by their addresses
+        self.function: Optional[Function] = None    # the function which we are in
+        self.arg_counts = []        # number of the args of each call which we are in
+        self.stack_pointer = -1     # address of the stack pointer, the first function except main makes it
+        self.recursive = False      # does the program have a recursive call or not
+        self.stack_line = -1        # the line which sets the stack pointer (at the start of main)
+        self.stack_base = 0         # first address of the runtime stack, after all the temps
+        self.array_immediates: List[Tuple[int, int]] = []     # (line, column) of the immediates of array addresses
         self.program_counter = 0    # index of the current line of program block
-        self.temp_id = 996          # temp ID
+        self.first_temp = first_temp    # address of the first temp
+        self.temp_id = first_temp - 4   # temp ID
         self.funcs = {}             # code generator functions
+        self.broken = False         # has a syntax error broken the semantic stack or not
         self.fill_funcs()
         self.token = ''             # next input called as current token
 
@@ -25,15 +66,40 @@ class CodeGenerator:
         self.temp_id += 4
         return self.temp_id
 
+    # the addresses which have been used as temps, none of them if the variables have reached the temps
+    def get_temps(self) -> range:
+        if self.get_data_end() > self.first_temp:
+            return range(0)
+        return range(self.first_temp, self.temp_id + 4, 4)
+
+    # the first address after the variables, the arrays are laid out after it with the program
+    def get_data_end(self) -> int:
+        return self.symbols.get_data_end()
+
+    # an immediate operand of a line is the address of an array, the allocator moves it with the arrays
+    def mark_array_immediate(self, line: int, column: int) -> None:
+        self.array_immediates.append((line, column))
+
     # determines which function should be called in each reduction
     def fill_funcs(self) -> None:
+        self.funcs[6] = self.end_declaration
         self.funcs[7] = self.arr_declare
+        self.funcs[8] = self.declare_int
+        self.funcs[9] = self.declare_void
+        self.funcs[10] = self.end_function
+        self.funcs[1] = self.end_program
+        self.funcs[12] = self.no_params
+        self.funcs[15] = self.pop
+        self.funcs[16] = self.array_param
+        self.funcs[17] = self.exit_block
+        self.funcs[19] = self.enter_block
         self.funcs[29] = self.pop
         self.funcs[30] = self.save_break
         self.funcs[32] = self.jpf
         self.funcs[33] = self.endif
         self.funcs[34] = self.handle_while
-        self.funcs[36] = self.pop
+        self.funcs[35] = self.return_void
+        self.funcs[36] = self.return_value
         self.funcs[37] = self.switch_jump
         self.funcs[40] = self.jpf
         self.funcs[43] = self.print_out
@@ -48,6 +114,10 @@ class CodeGenerator:
         self.funcs[56] = self.calc
         self.funcs[58] = self.mul
         self.funcs[59] = self.div
+        self.funcs[64] = self.call
+        self.funcs[66] = self.no_args
+        self.funcs[67] = self.next_arg
+        self.funcs[68] = self.first_arg
         self.funcs[69] = self.push_id
         self.funcs[70] = self.push_num
         self.funcs[71] = self.push_size
@@ -57,10 +127,31 @@ class CodeGenerator:
         self.funcs[75] = self.case_save
 
     # code_gen just calls the given reduction function
+    # after a syntax error the panic mode may have discarded what an action expects, then the action which fails is
+    # skipped and the next ones still run (without a syntax error, a failed action is a bug of the code generator)
     def code_gen(self, reduce_number: int, current_token: str) -> None:
         if reduce_number in self.funcs:
             self.token = current_token
-            self.funcs[reduce_number]()
+            try:
+                self.funcs[reduce_number]()
+            except (IndexError, KeyError, TypeError, ValueError, AttributeError):
+                if not self.broken:
+                    raise
+
+    # the parser has found a syntax error
+    def syntax_error(self) -> None:
+        self.broken = True
+
+    # fills a line which has been saved before, a line which isn't saved yet comes from a broken semantic stack
+    def patch(self, line: int, instruction: list) -> None:
+        if not 0 <= line < self.program_counter:
+            raise IndexError(f'line {line} is not saved')
+        self.program_block[line] = instruction
+
+    # adds a line to the program block
+    def emit(self, op: str, x: object, y: object = None, z: object = None) -> None:
+        self.program_block[self.program_counter] = [op, x, y, z]
+        self.program_counter += 1
 
     # pops an element from stack (used for balancing the statements)
     def pop(self) -> None:
@@ -74,19 +165,19 @@ class CodeGenerator:
     # jump if false implementation
     def jpf(self) -> None:
         x = get_str_val(self.stack[-2])
-        self.program_block[self.stack.pop()[0]] = ['JPF', x, self.program_counter, None]
+        self.patch(self.stack.pop()[0], ['JPF', x, self.program_counter, None])
         self.stack.pop()
 
     # used for jumping before entering the else
     def endif(self) -> None:
-        self.program_block[self.stack.pop()[0]] = ['JP', self.program_counter, None, None]
+        self.patch(self.stack.pop()[0], ['JP', self.program_counter, None, None])
 
     # handles the while jumps
     def handle_while(self) -> None:
         while self.breaks_link and self.breaks_link[-1][1] == self.current_scope:
             self.program_block[self.breaks_link.pop()[0]] = ['JP', self.program_counter+1, None, None]
         x = get_str_val(self.stack[-2])
-        self.program_block[self.stack.pop()[0]] = ['JPF', x, self.program_counter+1, None]
+        self.patch(self.stack.pop()[0], ['JPF', x, self.program_counter+1, None])
         self.stack.pop()
         x = get_str_val(self.stack.pop())
         self.program_block[self.program_counter] = ['JP', x, None, None]
@@ -139,7 +230,7 @@ class CodeGenerator:
 
     # pushes the ID of the next input (token) to the stack
     def push_id(self):
-        self.stack.append((self.lexer.DFA.find_addr(self.token, self.lexer.symbols), 0))
+        self.stack.append((self.symbols.get_address(self.token), 0))
 
     # push a number to the stack
     def push_num(self):
@@ -161,7 +252,7 @@ class CodeGenerator:
     # push the index and than jpf (used for if-else)
     def save_jpf(self):
         x = get_str_val(self.stack[-2])
-        self.program_block[self.stack.pop()[0]] = ['JPF', x, self.program_counter+1, None]
+        self.patch(self.stack.pop()[0], ['JPF', x, self.program_counter+1, None])
         self.stack.pop()
         self.stack.append((self.program_counter, 0))
         self.program_counter += 1
@@ -170,28 +261,262 @@ class CodeGenerator:
     def case_save(self):
         x = get_str_val(self.stack.pop())
         y = get_str_val(self.stack[-1])
-        self.program_block[self.program_counter] = ['EQ', x, y, self.get_temp()]
-        self.stack.append((self.program_block[self.program_counter][-1], 0))
+        t = self.get_temp()
+        self.program_block[self.program_counter] = ['EQ', x, y, t]
+        self.stack.append((t, 0))
         self.program_counter += 1
         self.save()
 
+    # the next 2 functions declare the name after a type specifier (it's the current token)
+    def declare_int(self):
+        self.declare('int')
+
+    def declare_void(self):
+        self.declare('void')
+
+    # a global declaration which is followed by a param (instead of ; or [) is a function
+    def declare(self, type_name: str) -> None:
+        if self.declaration is not None:
+            self.enter_function()
+        if not self.token[:1].isalpha() or is_keyword(self.token):     # a syntax error, there is no name
+            return
+        self.declared = self.symbols.declare(self.token, 'param' if self.in_params else 'variable', type_name)
+        if self.in_params and self.function is not None:
+            self.function.params.append(self.declared)
+        if not self.symbols.get_depth():
+            self.declaration = self.declared
+
+    # the global declaration has been a variable
+    def end_declaration(self):
+        self.declaration = None
+
+    # the params of the function are declared in the scope of the function
+    # main needs no return address, so the programs without other functions keep their addresses
+    def enter_function(self) -> None:
+        symbol = self.declaration
+        symbol.kind = 'function'
+        self.declaration = None
+        return_address = -1
+        if symbol.name != 'main':
+            self.get_stack_pointer()        # it's never in a frame
+            return_address = self.symbols.reserve()
+        frame_start = return_address if return_address >= 0 else self.symbols.next_address
+        self.function = self.functions[symbol.address] = Function(symbol, return_address, frame_start,
+                                                                  self.symbols.next_array)
+        self.symbols.enter_scope()
+        self.in_params = True
+
+    # the function has no params (its params are void)
+    def no_params(self):
+        if self.declaration is not None:
+            self.enter_function()
+
+    # the array params are passed by reference, the param keeps the address of the array
+    def array_param(self):
+        self.stack.pop()
+        if self.declared is not None and self.declared.kind == 'param':
+            self.declared.kind = 'reference'
+
+    # the code of a function is jumped over, main sets the stack pointer if a function is recursive
+    def start_function(self) -> None:
+        function = self.function
+        if function.symbol.name != 'main':
+            function.skip = self.program_counter
+            self.program_counter += 1
+        elif self.recursive:
+            self.stack_line = self.program_counter
+            self.program_counter += 1
+        function.entry = self.program_counter
+        function.first_temp = self.temp_id + 4
+
+    # a function returns at its end (main goes on to the code after it)
+    def end_function(self):
+        function = self.function
+        if function is not None:
+            if function.symbol.name != 'main':
+                self.emit('JP', f'@{function.return_address}')
+                self.program_block[function.skip] = ['JP', self.program_counter, None, None]
+            else:
+                for line in function.returns:
+                    self.program_block[line] = ['JP', self.program_counter, None, None]
+                self.set_stack_base()
+            self.function = None
+        self.symbols.exit_scope()
+
+    # return from a function, the return value is kept at the address of the function
+    def return_void(self):
+        function = self.function
+        if function is None:
+            return
+        if function.symbol.name == 'main':      # the jump is set at the end of main
+            function.returns.append(self.program_counter)
+            self.program_counter += 1
+        else:
+            self.emit('JP', f'@{function.return_address}')
+
+    def return_value(self):
+        value = get_str_val(self.stack.pop())
+        if self.function is not None and self.function.symbol.name != 'main':
+            self.emit('ASSIGN', value, str(self.function.symbol.address))
+        self.return_void()
+
+    # the next 3 functions count the args of a call
+    def no_args(self):
+        self.arg_counts.append(0)
+
+    def first_arg(self):
+        self.arg_counts.append(1)
+
+    def next_arg(self):
+        if self.arg_counts:
+            self.arg_counts[-1] += 1
+
+    # is an arg an array which is passed by its address
+    def is_array_arg(self, item: tuple, param: Symbol) -> bool:
+        symbol = self.symbols.get_symbol_at(item[0]) if not item[1] else None
+        return param.kind == 'reference' and symbol is not None and symbol.kind == 'array'
+
+    # copies the args to their places, an array is passed as its address
+    def copy_args(self, args: List[tuple], places: List[object], arrays: List[bool]) -> None:
+        for arg, place, array in zip(args, places, arrays):
+            self.emit('ASSIGN', f'#{arg[0]}' if array else get_str_val(arg), place)
+            if array:
+                self.mark_array_immediate(self.program_counter - 1, 1)
+
+    # calls a function, the args are copied to its params and the line after the call is its return address
+    # a recursive call keeps the frame of the function on the runtime stack during the call
+    def call(self):
+        count = self.arg_counts.pop() if self.arg_counts else 0
+        args = self.stack[len(self.stack) - count:]
+        del self.stack[len(self.stack) - count:]
+        address = self.stack.pop()[0]
+        function = self.functions.get(address)
+        if function is None or function.entry < 0:      # not a function (or main), there is nothing to call
+            self.stack.append((address, 0))
+            return
+        args = args[:len(function.params)]
+        arrays = [self.is_array_arg(arg, param) for arg, param in zip(args, function.params)]
+        recursive = function is self.function
+        if recursive:
+            self.recursive = True
+            frame = self.symbols.next_address, self.symbols.next_array, self.temp_id + 4
+            self.push_frame(*frame)
+            temps = [self.get_temp() for _ in args]     # the args may read the params which are overwritten
+            self.copy_args(args, temps, arrays)
+            args, arrays = [(t, 0) for t in temps], [False] * len(temps)
+        self.copy_args(args, [str(param.address) for param in function.params], arrays)
+        self.emit('ASSIGN', f'#{self.program_counter + 2}', str(function.return_address))
+        self.emit('JP', function.entry)
+        if recursive:
+            self.pop_frame(*frame)
+        if function.symbol.type == 'void':
+            self.stack.append((function.symbol.address, 0))
+            return
+        t = self.get_temp()
+        self.emit('ASSIGN', str(function.symbol.address), t)
+        self.stack.append((t, 0))
+
+    # the address of the stack pointer, it's made before the frame of the first function
+    def get_stack_pointer(self) -> int:
+        if self.stack_pointer < 0:
+            self.stack_pointer = self.symbols.reserve()
+        return self.stack_pointer
+
+    # pushes the frame of the current function (its variables, its arrays and its temps until the given ends) to
+    # the stack
+    def push_frame(self, variables_end: int, arrays_end: int, temps_end: int) -> None:
+        function = self.function
+        for start, end in ((function.frame_start, variables_end), (function.first_array, arrays_end),
+                           (function.first_temp, temps_end)):
+            self.copy_words(start, end, True)
+
+    def pop_frame(self, variables_end: int, arrays_end: int, temps_end: int) -> None:
+        function = self.function
+        for start, end in ((function.first_temp, temps_end), (function.first_array, arrays_end),
+                           (function.frame_start, variables_end)):
+            self.copy_words(start, end, False)
+
+    # pushes the words from start to end to the runtime stack, or pops them back in the reverse order
+    def copy_words(self, start: int, end: int, push: bool) -> None:
+        sp = str(self.get_stack_pointer())
+        words = range(start, end, 4)
+        if len(words) <= MAX_UNROLLED:
+            for address in words if push else reversed(words):
+                if push:
+                    self.emit('ASSIGN', str(address), f'@{sp}')
+                    self.emit('ADD', sp, '#4', sp)
+                else:
+                    self.emit('SUB', sp, '#4', sp)
+                    self.emit('ASSIGN', f'@{sp}', str(address))
+            return
+        pointer, t = self.get_temp(), self.get_temp()
+        self.emit('ASSIGN', f'#{start if push else end}', pointer)
+        is_array = start >= self.symbols.first_array
+        if is_array:
+            self.mark_array_immediate(self.program_counter - 1, 1)
+        loop = self.program_counter
+        if push:
+            self.emit('ASSIGN', f'@{pointer}', f'@{sp}')
+            self.emit('ADD', sp, '#4', sp)
+            self.emit('ADD', pointer, '#4', pointer)
+            self.emit('EQ', pointer, f'#{end}', t)
+        else:
+            self.emit('SUB', pointer, '#4', pointer)
+            self.emit('SUB', sp, '#4', sp)
+            self.emit('ASSIGN', f'@{sp}', f'@{pointer}')
+            self.emit('EQ', pointer, f'#{start}', t)
+        if is_array:
+            self.mark_array_immediate(self.program_counter - 1, 2)
+        self.emit('JPF', t, loop)
+
+    # the runtime stack starts after all the temps, main sets the stack pointer to it
+    def set_stack_base(self) -> None:
+        if self.stack_line < 0:
+            return
+        self.stack_base = max(self.temp_id + 4, self.get_data_end())
+        self.program_block[self.stack_line] = ['ASSIGN', f'#{self.stack_base}', str(self.stack_pointer), None]
+
+    # the temps of the functions after main are under the stack too
+    def end_program(self):
+        self.set_stack_base()
+
+    # each compound statement has its own scope, the first one of a function is its body
+    def enter_block(self):
+        if self.in_params and self.function is not None:
+            self.start_function()
+        self.in_params = False
+        self.symbols.enter_scope()
+
+    def exit_block(self):
+        self.symbols.exit_scope()
+
     # set size of the array
     def arr_declare(self):
-        self.lexer.DFA.set_size(self.token, self.stack.pop()[0], self.lexer.symbols)
+        size = self.stack.pop()[0]
+        if self.declared is not None:
+            self.symbols.set_size(self.declared, size)
+        self.declaration = None
 
     # we should play with addresses, and we did that in this function
+    # an array param has the address of the array, so its value is added instead of its address
     def arr_access(self):
         t = self.get_temp()
         x = self.stack.pop()
         x = ('' if not x[1] else '#' if x[1] == 1 else '@') + str(x[0])
         self.program_block[self.program_counter] = ['MULT', x, '#4', t]
         x = self.stack.pop()
+        symbol = self.symbols.get_symbol_at(x[0]) if not x[1] else None
+        is_reference = symbol is not None and symbol.kind == 'reference'
         x = ('' if not x[1] else '#' if x[1] == 1 else '@') + str(x[0])
-        self.program_block[self.program_counter+1] = ['ADD', f'#{x}', t, t]
+        self.program_block[self.program_counter+1] = ['ADD', x if is_reference else f'#{x}', t, t]
+        if symbol is not None and symbol.kind == 'array':
+            self.mark_array_immediate(self.program_counter + 1, 1)
         self.stack.append((t, 2))
         self.program_counter += 2
 
-    # filling out breaks which has occurred in the switch statements
+    # filling out breaks which has occurred in the switch statements, and the switch expression is popped
     def switch_jump(self):
         while self.breaks_link and self.breaks_link[-1][1] == self.current_scope:
             self.program_block[self.breaks_link.pop()[0]] = ['JP', self.program_counter, None, None]
+        self.stack.pop()
+        self.current_scope -= 1
@@ -0,0 +1,172 @@
+"""
+    Compile cache
+    keeps the results of the compiled files on disk, so an unchanged file is never parsed again
+    an entry is keyed by the hash of the source, the parse table and the compiler itself
+
+    usage: python compile_cache.py [-d CACHE_DIR] stats | evict [MAX_SIZE] | clear
+"""
+import hashlib
+import marshal
+import os
+import sys
+from typing import List, Optional, Tuple
+
+from parse_table import load_table
+from program_block import ProgramBlock, Instruction
+
+CACHE_DIR = '.cminus_cache'
+MAX_SIZE = 64 << 20         # default limit of the cache size in bytes
+STATS_FILE = 'stats'
+
+# the modules which decide the compiled code, the compiler version is the hash of their content
+COMPILER_FILES = ['lexer.py', 'dfa.py', 'symbol_table.py', 'parse.py', 'parse_table.py', 'token_array.py',
+                  'parse_tree.py', 'code_generator.py', 'program_block.py', 'optimizer.py', 'allocator.py',
+                  'compiler.py', 'sinks.py']
+
+# a cached compilation: (non-empty lines of the program block, syntax errors, rendered parse tree or None)
+Entry = Tuple[List[Instruction], List[str], Optional[str]]
+
+compiler_version: Optional[str] = None
+
+
+# hash of the compiler source files, computed once in each process
+def get_compiler_version() -> str:
+    global compiler_version
+    if compiler_version is None:
+        digest = hashlib.sha256()
+        directory = os.path.dirname(os.path.abspath(__file__))
+        for name in COMPILER_FILES:
+            with open(os.path.join(directory, name), 'rb') as file:
+                digest.update(file.read())
+        compiler_version = digest.hexdigest()
+    return compiler_version
+
+
+# rebuilds a program block from the lines of a cache entry
+def get_program_block(instructions: List[Instruction]) -> ProgramBlock:
+    program_block = ProgramBlock()
+    for i, instruction in enumerate(instructions):
+        program_block[i] = instruction
+    return program_block
+
+
+class CompileCache:
+
+    def __init__(self, directory: str = CACHE_DIR, max_size: int = MAX_SIZE) -> None:
+        self.directory = directory      # one file for each entry and the stats file
+        self.max_size = max_size        # evict makes the entries fit in this size
+        os.makedirs(directory, exist_ok=True)
+
+    # the key of a source, options are the compile options which change the result (like the lexer type)
+    def get_key(self, content: bytes, options: str = '') -> str:
+        digest = hashlib.sha256(content)
+        digest.update(f'\0{load_table()["digest"]}\0{get_compiler_version()}\0{options}'.encode())
+        return digest.hexdigest()
+
+    def get_entry_file(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.entry')
+
+    # returns the entry of the key or None, a hit makes the entry the most recently used one
+    def get(self, key: str) -> Optional[Entry]:
+        entry_file = self.get_entry_file(key)
+        try:
+            with open(entry_file, 'rb') as file:
+                entry = marshal.loads(file.read())
+            os.utime(entry_file)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        return entry if isinstance(entry, tuple) and len(entry) == 3 else None
+
+    # writes the entry, a failed write only means the next build compiles the file again
+    def put(self, key: str, entry: Entry) -> None:
+        entry_file = self.get_entry_file(key)
+        temp_file = f'{entry_file}.{os.getpid()}.tmp'
+        try:
+            with open(temp_file, 'wb') as file:
+                marshal.dump(entry, file)
+            os.replace(temp_file, entry_file)     # other processes never see a half written entry
+        except OSError:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+
+    # (last use, size, file name) of all the entries
+    def get_entries(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.entry'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    # removes the least recently used entries until the cache fits in max_size, returns the number of removed ones
+    def evict(self) -> int:
+        entries = sorted(self.get_entries())
+        size = sum(entry[1] for entry in entries)
+        removed = 0
+        while size > self.max_size:
+            _, entry_size, entry_file = entries[removed]
+            try:
+                os.remove(entry_file)
+            except OSError:
+                pass
+            size -= entry_size
+            removed += 1
+        return removed
+
+    def clear(self) -> None:
+        for entry in self.get_entries():
+            os.remove(entry[2])
+        if os.path.exists(os.path.join(self.directory, STATS_FILE)):
+            os.remove(os.path.join(self.directory, STATS_FILE))
+
+    # the counters of all the builds which have used this cache
+    def read_stats(self) -> dict:
+        try:
+            with open(os.path.join(self.directory, STATS_FILE), 'rb') as file:
+                stats = marshal.loads(file.read())
+        except (OSError, EOFError, ValueError, TypeError):
+            stats = None
+        return stats if isinstance(stats, dict) else {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    # adds the counters of a build, it's called once by the process which runs the build
+    def record(self, hits: int, misses: int, evictions: int = 0) -> None:
+        stats = self.read_stats()
+        stats['hits'] += hits
+        stats['misses'] += misses
+        stats['evictions'] += evictions
+        stats_file = os.path.join(self.directory, STATS_FILE)
+        with open(f'{stats_file}.{os.getpid()}.tmp', 'wb') as file:
+            marshal.dump(stats, file)
+        os.replace(f'{stats_file}.{os.getpid()}.tmp', stats_file)
+
+    # the counters, the hit rate and the size of the cache
+    def get_stats(self) -> dict:
+        stats = self.read_stats()
+        entries = self.get_entries()
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['entries'] = len(entries)
+        stats['size'] = sum(entry[1] for entry in entries)
+        return stats
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    cache_dir = CACHE_DIR
+    if args[:1] == ['-d'] and len(args) > 1:
+        cache_dir, args = args[1], args[2:]
+    command = args[0] if args else 'stats'
+    cache = CompileCache(cache_dir)
+    if command == 'stats':
+        cache_stats = cache.get_stats()
+        print(f'{cache_stats["entries"]} entries, {cache_stats["size"] / 1024:.1f} KB')
+        print(f'{cache_stats["hits"]} hits, {cache_stats["misses"]} misses, hit rate {cache_stats["hit_rate"]:.1%}, '
+              f'{cache_stats["evictions"]} evictions')
+    elif command == 'evict':
+        cache.max_size = int(args[1]) if len(args) > 1 else MAX_SIZE
+        cache.record(0, 0, cache.evict())
+    elif command == 'clear':
+        cache.clear()
+    else:
+        print(__doc__.strip().splitlines()[-1].strip(), file=sys.stderr)
+        sys.exit(2)
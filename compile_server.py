@@ -0,0 +1,237 @@
+"""
+    Compile server
+    a long running compiler on a unix socket, its workers keep the parse table and the DFA loaded, so a compile
+    doesn't pay the start of the interpreter and the tables
+    a request is a line of json like {"op": "compile", "source": "...", "optimize": false, "tree": true}, and its
+    response is a line of json with the contents of output.txt, syntax_errors.txt and parse_tree.txt
+    compiler.py sends its compile to the server when the server is running
+    a compile request has the versions of the compiler sources and of the parse table of the client, a server which
+    has started with other ones refuses it (then compiler.py compiles the file itself)
+
+    compile is the thinnest client, it compiles input.txt on the server like compiler.py without loading the compiler
+
+    usage: python compile_server.py [-s SOCKET] [-j JOBS] [-O] [--no-tree] [--max-errors N]
+           serve | stop | status | compile
+"""
+import json
+import os
+import socket
+import sys
+from typing import Optional
+
+SOCKET_VARIABLE = 'CMINUS_SOCKET'       # the environment variable which can give the socket path
+CONNECT_TIMEOUT = 0.5                   # seconds to wait for the server to accept a connection
+MAX_REQUEST = 1 << 26                   # longest line of a request (a source) which the server reads
+
+
+# the socket of the server of this user (tempfile is only imported for the default one)
+def get_socket_path() -> str:
+    if SOCKET_VARIABLE in os.environ:
+        return os.environ[SOCKET_VARIABLE]
+    import tempfile
+
+    return os.path.join(tempfile.gettempdir(), f'cminus-{os.getuid() if hasattr(os, "getuid") else 0}.sock')
+
+
+# sends a request to the server and returns its response, None if there is no server on the socket
+def send_request(request: dict, socket_path: Optional[str] = None) -> Optional[dict]:
+    socket_path = socket_path or get_socket_path()
+    if not hasattr(socket, 'AF_UNIX') or not os.path.exists(socket_path):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.settimeout(CONNECT_TIMEOUT)
+            client.connect(socket_path)
+            client.settimeout(None)
+            client.sendall(json.dumps(request).encode() + b'\n')
+            with client.makefile('rb') as stream:
+                line = stream.readline()
+    except OSError:     # a stale socket file or a server which has stopped
+        return None
+    return json.loads(line) if line else None
+
+
+# the versions which the client and the server of a compile must share: the hash of the compiler sources and the
+# digest of the parse table
+def get_versions() -> dict:
+    from compile_cache import get_compiler_version
+    from parse_table import load_table
+
+    return {'compiler': get_compiler_version(), 'table': load_table()['digest']}
+
+
+# sends the compile of input.txt to the server and writes the outputs like compiler.py, returns False if no server
+# is running or if it runs another version of the compiler (a failed compile exits with 1)
+def compile_on_server(build_tree: bool = True, optimized: bool = False, max_errors: Optional[int] = None,
+                      socket_path: Optional[str] = None) -> bool:
+    socket_path = socket_path or get_socket_path()
+    if not os.path.exists(socket_path):     # no server, the versions aren't computed
+        return False
+    with open('input.txt') as file:
+        source = file.read()
+    response = send_request({'op': 'compile', 'source': source, 'optimize': optimized, 'tree': build_tree,
+                             'max_errors': max_errors, 'versions': get_versions()}, socket_path)
+    if response is None:
+        return False
+    if response.get('mismatch'):
+        print('the compile server runs another version of the compiler, restart it', file=sys.stderr)
+        return False
+    if response.get('error'):
+        print(f'the compile server failed: {response["error"]}', file=sys.stderr)
+        sys.exit(1)
+    if build_tree:
+        with open('parse_tree.txt', mode='w', encoding='utf-8') as file:
+            file.write(response['parse_tree'])
+    with open('syntax_errors.txt', 'w') as file:
+        file.write(response['syntax_errors'])
+    with open('output.txt', 'w') as file:
+        file.write(response['output'])
+    return True
+
+
+# compiles a source like compiler.py and returns the contents of its output files (the parse tree is None if it's
+# not asked for), a failed compile gives the error instead
+def compile_source(source: str, optimized: bool = False, tree: bool = True, max_errors: Optional[int] = None) -> dict:
+    import traceback
+    from compiler import compile_source_text
+
+    try:
+        result = compile_source_text(source, want_tree=tree, optimized=optimized, max_errors=max_errors)
+        return {'output': result.get_output_text(), 'syntax_errors': result.get_syntax_errors_text(),
+                'parse_tree': result.get_parse_tree_text(), 'error': None}
+    except Exception:
+        return {'error': traceback.format_exc(limit=-1).strip().splitlines()[-1]}
+
+
+# loads the compiler and the tables once in each worker, every compile of the worker shares them
+def init_worker() -> None:
+    import compiler
+    from dfa import CompiledDFA
+    from parse_table import load_table
+
+    load_table()
+    CompiledDFA()
+
+
+class CompileServer:
+
+    def __init__(self, socket_path: str, jobs: int = 0) -> None:
+        self.socket_path = socket_path
+        self.jobs = jobs or os.cpu_count() or 1     # number of the worker processes
+        self.loop = None                            # the event loop of the server
+        self.executor = None                        # the pool of the workers
+        self.server = None                          # the asyncio server of the socket
+        self.compiles = 0                           # number of the compiles so far
+        self.versions = None                        # the versions of the compiler and the table of the server
+
+    # compiles a request on a worker, a worker which dies (like a compile which runs out of memory) breaks the
+    # pool, then only this compile fails and a new pool compiles the next ones
+    async def compile(self, request: dict) -> dict:
+        from concurrent.futures.process import BrokenProcessPool
+
+        executor = self.executor
+        try:
+            return await self.loop.run_in_executor(
+                executor, compile_source, request.get('source', ''), bool(request.get('optimize')),
+                bool(request.get('tree')), request.get('max_errors'))
+        except BrokenProcessPool as error:
+            if self.executor is executor:       # the other compiles of the broken pool don't make a new one
+                executor.shutdown(wait=False)
+                self.executor = self.new_executor()
+            return {'error': f'the worker of the compile died ({error})'}
+        except Exception as error:
+            return {'error': f'{type(error).__name__}: {error}'}
+
+    # a pool of the workers, each of them loads the tables once
+    def new_executor(self) -> 'ProcessPoolExecutor':
+        from concurrent.futures import ProcessPoolExecutor
+
+        return ProcessPoolExecutor(self.jobs, initializer=init_worker)
+
+    # answers the requests of a connection, a connection can send many requests one after another
+    async def handle(self, reader, writer) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    request = {'op': None}
+                op = request.get('op')
+                if op == 'compile' and request.get('versions') != self.versions:
+                    response = {'error': 'the server runs another version of the compiler', 'mismatch': True}
+                elif op == 'compile':
+                    self.compiles += 1
+                    response = await self.compile(request)
+                elif op == 'status':
+                    response = {'pid': os.getpid(), 'jobs': self.jobs, 'compiles': self.compiles,
+                                'versions': self.versions}
+                elif op == 'stop':
+                    response = {'stopped': True}
+                    self.server.close()
+                else:
+                    response = {'error': f'unknown request {op!r}'}
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    # serves until a stop request (or SIGTERM), asyncio is only imported by the server since the clients don't need it
+    async def serve(self) -> None:
+        import asyncio
+        import signal
+
+        if send_request({'op': 'status'}, self.socket_path) is not None:
+            raise RuntimeError(f'a server is already running on {self.socket_path}')
+        if os.path.exists(self.socket_path):    # the socket of a server which has stopped
+            os.remove(self.socket_path)
+        # the server loads the compiler before its workers, so the forked workers run the sources of its versions
+        init_worker()
+        self.versions = get_versions()
+        self.executor = self.new_executor()
+        try:
+            self.loop = asyncio.get_running_loop()
+            self.server = await asyncio.start_unix_server(self.handle, path=self.socket_path, limit=MAX_REQUEST)
+            os.chmod(self.socket_path, 0o600)      # only this user can compile on the server
+            self.loop.add_signal_handler(signal.SIGTERM, self.server.close)
+            print(f'serving on {self.socket_path} with {self.jobs} workers', file=sys.stderr)
+            async with self.server:
+                await self.server.wait_closed()
+        finally:
+            self.executor.shutdown()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description='run the compiler as a server on a unix socket')
+    arg_parser.add_argument('command', choices=['serve', 'stop', 'status', 'compile'])
+    arg_parser.add_argument('-s', '--socket', default=get_socket_path(),
+                            help=f'path of the socket (default: ${SOCKET_VARIABLE} or {get_socket_path()})')
+    arg_parser.add_argument('-j', '--jobs', type=int, default=0, help='number of workers (default: all cores)')
+    arg_parser.add_argument('-O', dest='optimized', action='store_true', help='optimize the three address codes')
+    arg_parser.add_argument('--no-tree', dest='tree', action='store_false', help="don't write parse_tree.txt")
+    arg_parser.add_argument('--max-errors', type=int, help='write only the first N syntax errors')
+    args = arg_parser.parse_args()
+    if args.command == 'serve':
+        import asyncio
+        try:
+            asyncio.run(CompileServer(args.socket, args.jobs).serve())
+        except KeyboardInterrupt:
+            pass
+    elif args.command == 'compile':
+        if not compile_on_server(args.tree, args.optimized, args.max_errors, args.socket):
+            print(f'no server of this compiler is running on {args.socket}', file=sys.stderr)
+            sys.exit(1)
+    else:
+        result = send_request({'op': args.command}, args.socket)
+        if result is None:
+            print(f'no server is running on {args.socket}', file=sys.stderr)
+            sys.exit(1)
+        print(json.dumps(result))
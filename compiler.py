@@ -12,41 +12,163 @@
             ['Mahdi Saber', 99105526],
             ['Parsa Enayati', 99105623]
 """
-from typing import List
-
-import anytree
+import io
+import sys
+from contextlib import nullcontext
+from typing import Any, List, Tuple, Type, Iterable, Optional, Union
 
+from allocator import allocate, place_arrays
+from lexer import Lexer
 from parse import Parser
+from parse_tree import render_tree
+from program_block import ProgramBlock
+from sinks import Sink, CollectorSink, StreamSink, FileSink
 
 
-def write_parse_tree(root: anytree.Node) -> None:
-    file = open('parse_tree.txt', mode='w', encoding='utf-8')
-    lines = []
-    for pre, _, node in anytree.RenderTree(root):
-        lines.append(f'{pre}{node.name}')
-    file.write('\n'.join(lines))
-    file.close()
+# lays out the memory of the code of the parser: the variables, then the arrays, then the temps (the runtime stack
+# of a recursive program starts after them), the code is optimized before its temps are laid out
+# returns the program block and the first address after the temps (the memory which the program needs)
+def build_program(parser: Parser, optimized: bool = False) -> Tuple[ProgramBlock, int]:
+    code_generator = parser.code_generator
+    temps = code_generator.get_temps()
+    program_block, data_end = place_arrays(code_generator.program_block, code_generator.symbols.get_arrays(),
+                                           code_generator.get_data_end(), code_generator.array_immediates)
+    if optimized:
+        from optimizer import optimize
+
+        program_block = optimize(program_block, temps)
+    return allocate(program_block, temps, data_end, code_generator.stack_base)
 
 
-def write_syntax_errors(syntax_errors: List[str]) -> None:
-    file = open('syntax_errors.txt', 'w')
-    file.write('\n'.join(syntax_errors))
-    if not len(syntax_errors):
-        file.write('There is no syntax error.')
+def write_parse_tree(root: Any, file_name: str = 'parse_tree.txt') -> None:
+    file = open(file_name, mode='w', encoding='utf-8')
+    render_tree(root, file)
     file.close()
 
 
-def write_output(program_block: list) -> None:
-    file = open('output.txt', 'w')
-    program_block = list(filter(lambda x: x[0], program_block))
-    for i, pb in enumerate(program_block):
-        pb = '(' + ', '.join(list(map(str, (filter(lambda x: x, pb))))) + ')'
-        file.write(f'{i}\t{pb}\n')
-    file.close()
+# the format of syntax_errors.txt, for the arguments of a stream sink
+ERROR_FORMAT = {'end': '', 'empty': 'There is no syntax error.',
+                'dropped_note': '{} more syntax errors are not reported'}
+
+
+# the sink of syntax_errors.txt, at most limit errors are written (all of them if it's None)
+def get_error_sink(file_name: str = 'syntax_errors.txt', limit: Optional[int] = None) -> FileSink:
+    return FileSink(file_name, limit=limit, **ERROR_FORMAT)
+
+
+def write_syntax_errors(syntax_errors: Iterable[str], file_name: str = 'syntax_errors.txt') -> None:
+    with get_error_sink(file_name) as sink:
+        for syntax_error in syntax_errors:
+            sink.write(syntax_error)
+
+
+# writes the lines of the code to a sink, the empty lines are skipped
+def write_code(program_block: ProgramBlock, sink: Sink) -> None:
+    for i, pb in enumerate(program_block.instructions()):
+        sink.write(f'{i}\t(' + ', '.join(str(x) for x in pb if x) + ')')
+
+
+def write_output(program_block: ProgramBlock, file_name: str = 'output.txt') -> None:
+    with FileSink(file_name) as sink:
+        write_code(program_block, sink)
+
+
+# the result of an in-memory compile: the code, the syntax errors and the parse tree (if it's asked for)
+class CompileResult:
+    __slots__ = 'program_block', 'instructions', 'syntax_errors', 'error_count', 'parse_tree', 'memory_end'
+
+    def __init__(self, program_block: ProgramBlock, syntax_errors: List[str], error_count: int,
+                 parse_tree: Any = None, memory_end: int = 0) -> None:
+        self.program_block = program_block                          # the program block, which the VM can run
+        self.instructions = list(program_block.instructions())      # the lines of output.txt as tuples
+        self.syntax_errors = syntax_errors      # the syntax errors (only the first ones with a limit)
+        self.error_count = error_count          # the number of all the syntax errors
+        self.parse_tree = parse_tree            # the root ParseNode of the tree, or None
+        self.memory_end = memory_end            # the first address after the data and the temps of the program
+
+    # the contents of output.txt
+    def get_output_text(self) -> str:
+        text = io.StringIO()
+        with StreamSink(text) as sink:
+            write_code(self.program_block, sink)
+        return text.getvalue()
+
+    # the contents of syntax_errors.txt, with the note about the errors over the limit
+    def get_syntax_errors_text(self) -> str:
+        text = io.StringIO()
+        with StreamSink(text, limit=len(self.syntax_errors), **ERROR_FORMAT) as sink:
+            for syntax_error in self.syntax_errors:
+                sink.write(syntax_error)
+            sink.count = self.error_count       # the errors which weren't kept are dropped ones
+        return text.getvalue()
+
+    # the contents of parse_tree.txt, None if there is no tree
+    def get_parse_tree_text(self) -> Optional[str]:
+        if self.parse_tree is None:
+            return None
+        text = io.StringIO()
+        render_tree(self.parse_tree, text)
+        return text.getvalue()
+
+
+# compiles a source in memory, without reading or writing any file, a bytes source is decoded as utf-8
+# the compiles share nothing but the loaded tables, so many of them can run in one process
+# max_errors keeps only the first syntax errors, the errors of the code generator are raised
+# prelex lexes the whole source into a token array before the parse
+def compile_source_text(source: Union[str, bytes], *, want_tree: bool = False, optimized: bool = False,
+                        max_errors: Optional[int] = None, lexer_type: Type[Lexer] = Lexer,
+                        prelex: bool = False) -> CompileResult:
+    if isinstance(source, bytes):
+        source = source.decode('utf-8')
+    error_sink = CollectorSink(max_errors)
+    parser = Parser(io.StringIO(source, newline=None), lexer_type, tree='node' if want_tree else None,
+                    error_sink=error_sink, prelex=prelex)
+    root = parser.get_parse_tree()
+    program_block, memory_end = build_program(parser, optimized)
+    return CompileResult(program_block, error_sink.records, error_sink.count, root, memory_end)
 
 
 if __name__ == '__main__':
-    parser = Parser('input.txt')
-    write_parse_tree(parser.get_parse_tree())
-    write_syntax_errors(parser.get_syntax_errors())
-    write_output(parser.code_generator.program_block)
+    build_tree = '--no-tree' not in sys.argv[1:]    # only generate the code, without writing parse_tree.txt
+    # -O optimizes the three address codes, a program with functions is only laid out
+    optimized = '-O' in sys.argv[1:]
+    # --profile prints the timers and counters of the phases as a table (or --profile=json as json) to stderr
+    profile_format = next((arg.partition('=')[2] or 'table' for arg in sys.argv[1:] if arg.startswith('--profile')),
+                          None)
+    profile = None
+    if profile_format:
+        from profiler import Profile, instrument, count_results
+
+        profile = Profile()
+    phase = profile.phase if profile else lambda name: nullcontext()
+    # --max-errors=N writes only the first N syntax errors
+    max_errors = next((int(arg.partition('=')[2]) for arg in sys.argv[1:] if arg.startswith('--max-errors=')), None)
+    prelex = '--prelex' in sys.argv[1:]             # lex the whole input before the parse (a profile times both)
+    # a running compile server (compile_server.py) compiles the file, unless it's profiled or --local is given
+    if not profile and '--local' not in sys.argv[1:]:
+        from compile_server import compile_on_server
+
+        if compile_on_server(build_tree, optimized, max_errors):
+            sys.exit(0)
+    error_sink = get_error_sink(limit=max_errors)      # the errors are written while the parser finds them
+    parser = Parser('input.txt', tree='node' if build_tree else None, error_sink=error_sink, prelex=prelex)
+    if profile:
+        instrument(parser, profile)
+    if prelex:
+        with phase('prelex'):
+            parser.lex_tokens()
+    with error_sink, phase('parse'):
+        root = parser.get_parse_tree()
+    if build_tree:
+        with phase('write_tree'):
+            write_parse_tree(root)
+    with phase('optimize' if optimized else 'layout'):
+        program_block, memory_end = build_program(parser, optimized)
+    with phase('write_code'):
+        write_output(program_block)
+    if profile:
+        count_results(parser, profile)
+        profile.count('memory end', memory_end)
+        if optimized:
+            profile.count('optimized instructions', sum(1 for _ in program_block.instructions()))
+        print(profile.to_json() if profile_format == 'json' else profile.to_table(), file=sys.stderr)
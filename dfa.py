@@ -1,5 +1,8 @@
+from array import array
 from collections import defaultdict
-from typing import List, Dict, Tuple, Callable
+from typing import List, Dict, Tuple, Callable, Optional
+
+from symbol_table import get_keyword_id_token
 
 
 # a helper function to add all digits through 0-9 to a DFA state
@@ -134,29 +137,31 @@ def initial_dfa() -> List[Dict[str, int]]:
 # the next 5 functions are implemented just for more flexibility
 
 
-def number_token(lexeme: str, symbols: Dict[str, Tuple[str, int, int]]) -> str:
+def number_token(lexeme: str) -> str:
     return 'NUM'
 
 
-def symbol_token(lexeme: str, symbols: Dict[str, Tuple[str, int, int]]) -> str:
+def symbol_token(lexeme: str) -> str:
     return 'SYMBOL'
 
 
-def comment_token(lexeme: str, symbols: Dict[str, Tuple[str, int, int]]) -> str:
+def comment_token(lexeme: str) -> str:
     return 'COMMENT'
 
 
-def unmatched_token(lexeme: str, symbols: Dict[str, Tuple[str, int, int]]) -> str:
+def unmatched_token(lexeme: str) -> str:
     return 'Unmatched comment'
 
 
-def eof_token(lexeme: str, symbols: Dict[str, Tuple[str, int, int]]) -> str:
+def eof_token(lexeme: str) -> str:
     return '$$'
 
 
 # this function determines how each state affects the lexer pointer (how much should we backtrack)
+# state 15 (a line comment ended by EOF) consumes the EOF like NUM and ID do, giving it back made the lexer
+# read past the end of the input on its next call
 def get_back_points() -> List[int]:
-    return [0, 0, 2, 0, 2, 1, 0, 1, 2, 0, 0, 0, 2, 1, 0, 1, 1, 2, 0, 1, 2, 0]
+    return [0, 0, 2, 0, 2, 1, 0, 1, 2, 0, 0, 0, 2, 1, 0, 0, 1, 2, 0, 1, 2, 0]
 
 
 class DFA:
@@ -166,11 +171,10 @@ class DFA:
         self.states = initial_dfa()     # DFA states
         self.current_state = 0          # DFA current state which is zero
         self.back_point = get_back_points()     # DFA backtrack amounts for each state
-        self.variable_counter = 96
 
     # this function determines the DFA goal states
     # each goal maps to a function which returns its token type like KEYWORD, NUM or Unmatched comment
-    def get_dfa_goals(self) -> Dict[int, Callable[[str, Dict[str, Tuple[str, int, int]]], str]]:
+    def get_dfa_goals(self) -> Dict[int, Callable[[str], str]]:
         goals = dict()
         goals[2] = number_token
         goals[4] = self.keyword_id_token
@@ -186,29 +190,24 @@ class DFA:
         goals[21] = eof_token
         return goals
 
-    def find_addr(self, lexeme: str, symbols: Dict[str, Tuple[str, int, int]]) -> int:
-        if lexeme not in symbols:
-            self.variable_counter += 4
-            symbols[lexeme] = ('ID', self.variable_counter, 1)
-        return symbols[lexeme][1]
-
-    def keyword_id_token(self, lexeme: str, symbols: Dict[str, Tuple[str, int, int]]) -> str:
-        if lexeme not in symbols:
-            self.variable_counter += 4
-            symbols[lexeme] = ('ID', self.variable_counter, 1)
-        return symbols[lexeme][0]
+    # the lexer only needs to know if an identifier is a keyword, the symbols are kept by the code generator
+    def keyword_id_token(self, lexeme: str) -> str:
+        return get_keyword_id_token(lexeme)
 
-    def set_size(self, lexeme: str, size: int, symbols: Dict[str, Tuple[str, int, int]]) -> None:
-        symbols[lexeme] = (symbols[lexeme][0], symbols[lexeme][1], size)
-        self.variable_counter += (size-1)*4
+    # returns the token type of the goal we have reached, only this step needs the lexeme
+    def get_goal_token(self, lexeme: str) -> str:
+        if self.current_state == 3:     # we have reached EOF while reading a keyword or id
+            return self.keyword_id_token(lexeme)
+        return self.goals[self.current_state](lexeme)
 
     # this function gets a character and move towards states in the DFA
-    def change_state(self, c: str, lexeme: str, symbols: Dict[str, Tuple[str, int, int]]) -> Tuple[str, int, bool]:
+    # a None token means we have reached a goal, and its type should be taken from get_goal_token
+    def change_state(self, c: str) -> Tuple[Optional[str], int, bool]:
         if c == '$$':
             if self.current_state == 1:     # we have a number as the last token
                 return 'NUM', 0, True
             elif self.current_state == 3:   # we have a keyword or id as the last token
-                return self.keyword_id_token(lexeme, symbols), 0, True
+                return None, 0, True
             elif 10 <= self.current_state <= 12:    # we have an unclosed comment
                 return 'Unclosed comment', 0, True
         if self.states[self.current_state][c] is None:  # if we reached an unexpected character
@@ -218,6 +217,105 @@ class DFA:
             self.current_state = 0
             return 'Invalid input', 0, True         # else, return an Invalid input error
         self.current_state = self.states[self.current_state][c]     # update the current state
-        if self.current_state in self.goals:        # if we have reached a goal, return its token
-            return self.goals[self.current_state](lexeme[:len(lexeme)-self.back_point[self.current_state]+1], symbols), self.back_point[self.current_state], self.current_state == 0
+        if self.current_state in self.goals:        # if we have reached a goal, the lexer asks for its token
+            return None, self.back_point[self.current_state], self.current_state == 0
         return '', self.back_point[self.current_state], self.current_state == 0     # else, return an empty string as token
+
+
+# character classes of the compiled DFA, all characters of a class behave the same in every state
+DIGIT, LETTER, NORMAL_SYMBOL, SLASH, STAR, EQUAL, SPACE, NEWLINE, EOF, OTHER = range(10)
+N_CLASSES = 10
+
+# negative cells of the compiled table, which are the special cases of DFA.change_state
+INVALID_INPUT, INVALID_NUMBER, NUM_AT_EOF, ID_AT_EOF, UNCLOSED_AT_EOF = range(-1, -6, -1)
+
+
+# maps each character to its class, characters which are not in the map belong to OTHER
+def get_char_classes() -> Dict[str, int]:
+    classes = dict()
+    add_nums(classes, DIGIT)
+    add_letters(classes, LETTER)
+    add_normal_symbols(classes, NORMAL_SYMBOL)
+    classes['/'] = SLASH
+    classes['*'] = STAR
+    classes['='] = EQUAL
+    add_spaces(classes, SPACE)
+    classes['\n'] = NEWLINE
+    classes['$$'] = EOF
+    return classes
+
+
+# finds the destination of a DFA state with a character, without inserting into the defaultdict
+def get_transition(state: Dict[str, int], c: str) -> Optional[int]:
+    if c in state:
+        return state[c]
+    return state.default_factory() if getattr(state, 'default_factory', None) else None
+
+
+# this function compiles the DFA states into a flat table indexed by state * N_CLASSES + class
+def compile_dfa(states: List[Dict[str, int]], classes: Dict[str, int]) -> array:
+    members = [[c for c, k in classes.items() if k == cls] for cls in range(N_CLASSES)]
+    members[OTHER] = ['@']      # any character which is not in the classes
+    table = array('h', [INVALID_INPUT]) * (len(states) * N_CLASSES)
+    for s, state in enumerate(states):
+        for c in state:
+            if c not in classes:
+                raise ValueError(f'character {c!r} of state {s} has no character class')
+        for cls in range(N_CLASSES):
+            dst = {get_transition(state, c) for c in members[cls]}
+            if len(dst) != 1:
+                raise ValueError(f'state {s} splits the character class {cls}')
+            dst = dst.pop()
+            if dst is not None:
+                table[s * N_CLASSES + cls] = dst
+            elif s == 1:
+                table[s * N_CLASSES + cls] = INVALID_NUMBER
+    # the EOF character is checked before the transitions in DFA.change_state
+    table[1 * N_CLASSES + EOF] = NUM_AT_EOF
+    table[3 * N_CLASSES + EOF] = ID_AT_EOF
+    for s in range(10, 13):
+        table[s * N_CLASSES + EOF] = UNCLOSED_AT_EOF
+    return table
+
+
+# the compiled table is the same for every CompiledDFA, so it's built once per process
+compiled_dfa: Optional[Tuple[Dict[str, int], array]] = None
+
+
+# returns the character classes and the compiled table
+def get_compiled_dfa(states: List[Dict[str, int]]) -> Tuple[Dict[str, int], array]:
+    global compiled_dfa
+    if compiled_dfa is None:
+        classes = get_char_classes()
+        compiled_dfa = classes, compile_dfa(states, classes)
+    return compiled_dfa
+
+
+# a table driven version of the DFA, the DFA class is kept as its reference implementation
+class CompiledDFA(DFA):
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.classes, self.table = get_compiled_dfa(self.states)    # character classes and compiled transitions
+        # prebuilt result of reaching each state, goals whose token depends on the lexeme have a None token
+        self.results = []
+        for s, back in enumerate(self.back_point):
+            if self.goals.get(s) == self.keyword_id_token:
+                self.results.append((None, back, False))
+            elif s in self.goals:
+                self.results.append((self.goals[s](''), back, False))
+            else:
+                self.results.append(('', back, s == 0))
+        self.special_results = {INVALID_INPUT: ('Invalid input', 0, True), INVALID_NUMBER: ('Invalid number', 0, True),
+                                NUM_AT_EOF: ('NUM', 0, True), ID_AT_EOF: (None, 0, True),
+                                UNCLOSED_AT_EOF: ('Unclosed comment', 0, True)}
+
+    # this function gets a character and move towards states in the DFA, exactly like DFA.change_state
+    def change_state(self, c: str) -> Tuple[Optional[str], int, bool]:
+        state = self.table[self.current_state * N_CLASSES + self.classes.get(c, OTHER)]
+        if state >= 0:
+            self.current_state = state
+            return self.results[state]
+        if state >= INVALID_NUMBER:     # only the errors reset the DFA, the EOF cases keep the state
+            self.current_state = 0
+        return self.special_results[state]
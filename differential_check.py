@@ -0,0 +1,145 @@
+"""
+    Differential check
+    checks that the rewritten parts of the compiler give the same results as the reference ones:
+    the compiled DFA, the chunked source reader and the regex lexer give the tokens of the original DFA,
+    the packed parse table has the actions and the gotos of grammar/table.json,
+    and the streaming tree renderer writes the text of anytree.RenderTree for every tree builder
+    the inputs are the given files, or generated programs of every workload shape and random text
+
+    usage: python differential_check.py [-n COUNT] [--seed N] [FILE ...]
+"""
+import argparse
+import io
+import json
+import random
+import sys
+from typing import List, Tuple, Iterator
+
+from benchmarks.workloads import SHAPES, WorkloadGenerator
+from dfa import DFA
+from lexer import Lexer
+from parse import Parser
+from parse_table import TABLE_FILE, ERROR, pack_action
+from parse_tree import render_tree
+from regex_lexer import RegexLexer
+from token_array import TokenArray, VALID_TOKENS
+
+CHUNK_SIZES = [1, 7]        # small chunks of the source reader, so the lexemes are split between the chunks
+RANDOM_CHARACTERS = 'ab1 0\n\t;:,[](){}+-*/<=#@!$/*' + '\r\f\v'
+
+
+# all the tokens of a lexer, with the $$ at the end
+def get_tokens(lexer: Lexer) -> List[Tuple[str, str, int]]:
+    tokens = [lexer.get_next_token()]
+    while tokens[-1][0] != '$$':
+        tokens.append(lexer.get_next_token())
+    return tokens
+
+
+# the lexers which have to give the tokens of the original DFA
+def check_lexers(source: str) -> List[str]:
+    errors = []
+    expected = get_tokens(Lexer(io.StringIO(source), DFA()))
+    lexers = [('compiled DFA', Lexer(io.StringIO(source))), ('regex lexer', RegexLexer(io.StringIO(source)))]
+    for chunk_size in CHUNK_SIZES:
+        lexer = Lexer(io.StringIO(source))
+        lexer.chars.chunk_size = chunk_size
+        lexers.append((f'chunks of {chunk_size}', lexer))
+    for name, lexer in lexers:
+        tokens = get_tokens(lexer)
+        if tokens != expected:
+            i = next((i for i, (a, b) in enumerate(zip(tokens, expected)) if a != b), min(len(tokens), len(expected)))
+            errors.append(f'{name}: token {i} is {tokens[i] if i < len(tokens) else None}, '
+                          f'not {expected[i] if i < len(expected) else None}')
+    tokens = TokenArray(Lexer(io.StringIO(source)))
+    if [tokens.get_token(i) for i in range(len(tokens) - 1)] != [t for t in expected if t[0] in VALID_TOKENS]:
+        errors.append('token array: the tokens are not the valid tokens of the lexer')
+    return errors
+
+
+# the packed actions and gotos of every state, against the cells of the json table
+def check_table() -> List[str]:
+    errors = []
+    with open(TABLE_FILE) as file:
+        source = json.load(file)
+    parser = Parser(io.StringIO(''), tree=None)
+    for state, row in source['parse_table'].items():
+        parser.stack = [(None, int(state))]
+        for terminal, terminal_id in parser.terminal_ids.items():
+            parser.current_terminal = terminal_id
+            expected = pack_action(row[terminal]) if terminal in row else ERROR
+            if parser.get_current_action() != expected:
+                errors.append(f'state {state}: the action of {terminal} is not {row.get(terminal, "empty")}')
+        for non_terminal, non_terminal_id in parser.non_terminal_ids.items():
+            expected = int(row[non_terminal].split('_')[1]) if non_terminal in row else -1
+            if parser.get_goto(int(state), non_terminal_id) != expected:
+                errors.append(f'state {state}: the goto of {non_terminal} is not {row.get(non_terminal, "empty")}')
+    return errors
+
+
+# the rendered tree of each builder (and of a parser which walks a token array), against anytree.RenderTree
+def check_trees(source: str) -> List[str]:
+    import anytree
+
+    parser = Parser(io.StringIO(source), tree='anytree')
+    root = parser.get_parse_tree()
+    expected = '\n'.join(f'{pre}{node.name}' for pre, _, node in anytree.RenderTree(root))
+    syntax_errors = parser.get_syntax_errors()
+    errors = []
+    for name, tree, prelex in [('anytree', None, False), ('node', 'node', False), ('token array', 'node', True)]:
+        if tree is not None:
+            parser = Parser(io.StringIO(source), tree=tree, prelex=prelex)
+            root = parser.get_parse_tree()
+        text = io.StringIO()
+        render_tree(root, text)
+        if text.getvalue() != expected:
+            errors.append(f'{name}: the rendered tree is not the one of anytree.RenderTree')
+        if parser.get_syntax_errors() != syntax_errors:
+            errors.append(f'{name}: the syntax errors are not the same')
+    return errors
+
+
+def read_sources(file_names: List[str]) -> Iterator[Tuple[str, str]]:
+    for file_name in file_names:
+        with open(file_name) as file:
+            yield file_name, file.read()
+
+
+# generated programs of every shape and random text, the sizes grow with the index
+def generate_sources(count: int, seed: int) -> Iterator[Tuple[str, str]]:
+    generator = random.Random(seed)
+    for i in range(count):
+        for shape in sorted(SHAPES):
+            yield f'{shape} {i}', WorkloadGenerator(shape, seed + i).generate(50 + 50 * i)
+        yield f'random {i}', ''.join(generator.choice(RANDOM_CHARACTERS) for _ in range(100 + 100 * i))
+
+
+# checks the sources, prints the differences and returns their number
+def run_checks(sources: Iterator[Tuple[str, str]]) -> int:
+    differences = 0
+    for error in check_table():
+        print(f'parse table: {error}')
+        differences += 1
+    checked = 0
+    for name, source in sources:
+        checked += 1
+        for error in check_lexers(source) + check_trees(source):
+            print(f'{name}: {error}')
+            differences += 1
+    print(f'{checked} sources, {differences} differences', file=sys.stderr)
+    return differences
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description='check the rewritten parts of the compiler against the '
+                                                     'reference ones')
+    arg_parser.add_argument('files', nargs='*', help='sources to check (default: generated programs)')
+    arg_parser.add_argument('-n', '--count', type=int, default=20, help='generated programs of each shape')
+    arg_parser.add_argument('--seed', type=int, default=0, help='seed of the generated programs')
+    args = arg_parser.parse_args()
+    if run_checks(read_sources(args.files) if args.files else generate_sources(args.count, args.seed)):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
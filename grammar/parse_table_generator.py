@@ -1,126 +1,305 @@
-import re
+"""
+    Parse table generator
+    builds the LR(0) states and the LALR(1) lookaheads of grammar.y and writes the parse table to table.json,
+    no external tool is needed (the states are numbered like bison numbers them)
+    the sets of terminals are bitsets, a terminal is a bit of an integer
+    by default a state reduces its rules on the FOLLOW sets like the table always did, --lookaheads lalr
+    reduces them only on their LALR(1) lookaheads
+    a table file which is written again keeps the order of its sets and rows, so an up to date one doesn't change
+
+    usage: python grammar/parse_table_generator.py [-g GRAMMAR] [-o TABLE] [--lookaheads follow|lalr] [--check]
+"""
+import argparse
 import json
+import os
+import sys
+import time
+from typing import List, Dict, Tuple, Optional, Iterable
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(DIRECTORY))
+
+from grammar_reader import GRAMMAR_FILE, Rule, read_grammar
+
+TABLE_FILE = os.path.join(DIRECTORY, 'table.json')
+
+# an item is (rule, position of the dot in its right hand side), a kernel is a sorted tuple of items
+Item = Tuple[int, int]
+Kernel = Tuple[Item, ...]
+
+
+# the symbols of a grammar and their FIRST and FOLLOW sets
+class Grammar:
+
+    def __init__(self, rules: List[Rule], terminals: List[str]) -> None:
+        self.rules = rules
+        self.terminals = terminals
+        self.non_terminals = []                         # in the order of their first rule, $accept is the first
+        self.rules_of: Dict[str, List[int]] = {}        # rules of each non-terminal
+        for i, (lhs, _) in enumerate(rules):
+            if lhs not in self.rules_of:
+                self.non_terminals.append(lhs)
+                self.rules_of[lhs] = []
+            self.rules_of[lhs].append(i)
+        self.bits = {terminal: 1 << i for i, terminal in enumerate(terminals)}
+        # the numbers of the symbols which order the transitions of a state: $, the other terminals in the order
+        # they first appear in the rules, and then the non-terminals
+        order = list(dict.fromkeys(['$'] + [symbol for _, rhs in rules for symbol in rhs if symbol in self.bits]))
+        order += [t for t in terminals if t not in order] + self.non_terminals
+        self.numbers = {symbol: i for i, symbol in enumerate(order)}
+        self.nullable, self.first = self.get_first()
+        self.follow = self.get_follow()
+
+    def is_terminal(self, symbol: str) -> bool:
+        return symbol in self.bits
+
+    # the nullable non-terminals and the FIRST set of each symbol
+    def get_first(self) -> Tuple[set, Dict[str, int]]:
+        nullable = set()
+        first = {nt: 0 for nt in self.non_terminals}
+        first.update(self.bits)
+        changed = True
+        while changed:
+            changed = False
+            for lhs, rhs in self.rules:
+                bits = first[lhs]
+                for symbol in rhs:
+                    bits |= first[symbol]
+                    if symbol not in nullable:
+                        break
+                else:
+                    if lhs not in nullable:
+                        nullable.add(lhs)
+                        changed = True
+                if bits != first[lhs]:
+                    first[lhs] = bits
+                    changed = True
+        return nullable, first
+
+    # the FIRST set of a string of symbols and whether it is nullable
+    def get_first_of(self, symbols: List[str]) -> Tuple[int, bool]:
+        bits = 0
+        for symbol in symbols:
+            bits |= self.first[symbol]
+            if symbol not in self.nullable:
+                return bits, False
+        return bits, True
+
+    def get_follow(self) -> Dict[str, int]:
+        follow = {nt: 0 for nt in self.non_terminals}
+        changed = True
+        while changed:
+            changed = False
+            for lhs, rhs in self.rules:
+                after = follow[lhs]     # the terminals which can follow the rest of the rule
+                for symbol in reversed(rhs):
+                    if not self.is_terminal(symbol):
+                        if follow[symbol] | after != follow[symbol]:
+                            follow[symbol] |= after
+                            changed = True
+                        after = after | self.first[symbol] if symbol in self.nullable else self.first[symbol]
+                    else:
+                        after = self.bits[symbol]
+        return follow
+
+    # the terminals of a bitset, in the order of the terminals
+    def get_terminals(self, bits: int) -> List[str]:
+        return [terminal for i, terminal in enumerate(self.terminals) if bits >> i & 1]
+
+
+# the LR(0) states of a grammar and the LALR(1) lookaheads of their items
+class Automaton:
+
+    def __init__(self, grammar: Grammar) -> None:
+        self.grammar = grammar
+        self.kernels: List[Kernel] = []                 # kernel items of each state
+        self.transitions: List[Dict[str, int]] = []     # the state after each symbol of each state
+        self.build_states()
+        self.lookaheads = self.get_lookaheads()
+
+    # the items of a kernel and the items which are added for the non-terminals after their dots
+    def get_closure(self, kernel: Kernel) -> List[Item]:
+        rules = self.grammar.rules
+        items = list(kernel)
+        seen = set()
+        for rule, dot in items:
+            rhs = rules[rule][1]
+            if dot < len(rhs) and not self.grammar.is_terminal(rhs[dot]) and rhs[dot] not in seen:
+                seen.add(rhs[dot])
+                items.extend((r, 0) for r in self.grammar.rules_of[rhs[dot]])
+        return items
+
+    # the states are numbered in the order they are found, the successors of a state in the order of their symbols
+    def build_states(self) -> None:
+        rules = self.grammar.rules
+        numbers = self.grammar.numbers
+        states = {((0, 0),): 0}
+        self.kernels.append(((0, 0),))
+        i = 0
+        while i < len(self.kernels):
+            successors: Dict[str, List[Item]] = {}
+            for rule, dot in self.get_closure(self.kernels[i]):
+                rhs = rules[rule][1]
+                if dot < len(rhs):
+                    successors.setdefault(rhs[dot], []).append((rule, dot + 1))
+            transitions = {}
+            for symbol in sorted(successors, key=numbers.__getitem__):
+                kernel = tuple(sorted(set(successors[symbol])))
+                if kernel not in states:
+                    states[kernel] = len(self.kernels)
+                    self.kernels.append(kernel)
+                transitions[symbol] = states[kernel]
+            self.transitions.append(transitions)
+            i += 1
+
+    # the LR(1) closure of a kernel item with a lookahead which stands for the lookaheads of the item itself
+    # returns the lookaheads of the items of the closure
+    def get_item_closure(self, item: Item, marker: int) -> Dict[Item, int]:
+        grammar = self.grammar
+        lookaheads = {item: marker}
+        work = [item]
+        while work:
+            rule, dot = work.pop()
+            rhs = grammar.rules[rule][1]
+            if dot == len(rhs) or grammar.is_terminal(rhs[dot]):
+                continue
+            bits, nullable = grammar.get_first_of(rhs[dot + 1:])
+            if nullable:
+                bits |= lookaheads[rule, dot]
+            for r in grammar.rules_of[rhs[dot]]:
+                old = lookaheads.get((r, 0), 0)
+                if old | bits != old:
+                    lookaheads[r, 0] = old | bits
+                    work.append((r, 0))
+        return lookaheads
+
+    # the lookaheads of the items of each state, by the spontaneous generation and the propagation of the
+    # lookaheads between the kernel items (the dragon book algorithm with bitsets)
+    def get_lookaheads(self) -> List[Dict[Item, int]]:
+        rules = self.grammar.rules
+        marker = 1 << len(self.grammar.terminals)
+        kernel_lookaheads: List[Dict[Item, int]] = [dict.fromkeys(kernel, 0) for kernel in self.kernels]
+        closures: List[List[Tuple[Item, Dict[Item, int]]]] = []
+        propagation: Dict[Tuple[int, Item], List[Tuple[int, Item]]] = {}
+        for state, kernel in enumerate(self.kernels):
+            closures.append([])
+            for item in kernel:
+                closure = self.get_item_closure(item, marker)
+                closures[state].append((item, closure))
+                for (rule, dot), bits in closure.items():
+                    rhs = rules[rule][1]
+                    if dot == len(rhs):
+                        continue
+                    target = self.transitions[state][rhs[dot]], (rule, dot + 1)
+                    kernel_lookaheads[target[0]][target[1]] |= bits & ~marker
+                    if bits & marker:
+                        propagation.setdefault((state, item), []).append(target)
+        changed = True
+        while changed:
+            changed = False
+            for (state, item), targets in propagation.items():
+                bits = kernel_lookaheads[state][item]
+                for target_state, target_item in targets:
+                    old = kernel_lookaheads[target_state][target_item]
+                    if old | bits != old:
+                        kernel_lookaheads[target_state][target_item] = old | bits
+                        changed = True
+        lookaheads = []
+        for state, items in enumerate(closures):
+            state_lookaheads: Dict[Item, int] = {}
+            for kernel_item, closure in items:
+                for item, bits in closure.items():
+                    if bits & marker:
+                        bits = bits & ~marker | kernel_lookaheads[state][kernel_item]
+                    state_lookaheads[item] = state_lookaheads.get(item, 0) | bits
+            lookaheads.append(state_lookaheads)
+        return lookaheads
+
+    # the rules which each state reduces and their lookaheads
+    def get_reductions(self, state: int) -> List[Tuple[int, int]]:
+        rules = self.grammar.rules
+        return sorted((rule, bits) for (rule, dot), bits in self.lookaheads[state].items()
+                      if dot == len(rules[rule][1]) and rule != 0)
+
+
+# the keys of a set or of a row in the order of their old list or row, if it has the same keys
+# (the table file keeps its order, so a table which is up to date is written as it is)
+def keep_order(keys: List[str], old_keys: Optional[Iterable[str]]) -> List[str]:
+    old_keys = list(old_keys) if old_keys is not None else None
+    return old_keys if old_keys is not None and sorted(old_keys) == sorted(keys) else keys
+
+
+# the parse table in the format of table.json, reduce_on is 'follow' or 'lalr'
+# the sets and the rows are in the order of the old table (if it's given) where they have the same keys
+# a reduction replaces a shift or an earlier reduction of the same terminal, the conflicts are returned
+def build_table(grammar: Grammar, automaton: Automaton, reduce_on: str = 'follow',
+                old: Optional[dict] = None) -> Tuple[dict, List[str]]:
+    old = old or {}
+    old_first, old_follow, old_rows = old.get('first', {}), old.get('follow', {}), old.get('parse_table', {})
+    table = {'terminals': grammar.terminals, 'non_terminals': grammar.non_terminals,
+             'first': {symbol: keep_order(grammar.get_terminals(grammar.first[symbol]), old_first.get(symbol))
+                       for symbol in grammar.non_terminals + grammar.terminals},
+             'follow': {nt: keep_order(grammar.get_terminals(grammar.follow[nt]), old_follow.get(nt))
+                        for nt in grammar.non_terminals},
+             'grammar': {i: [lhs, '->'] + (rhs or ['epsilon']) for i, (lhs, rhs) in enumerate(grammar.rules)},
+             'parse_table': {}}
+    conflicts = []
+    for state, transitions in enumerate(automaton.transitions):
+        if (0, 2) in automaton.kernels[state]:      # $accept -> start $ .
+            table['parse_table'][state] = {'$': 'accept'}
+            continue
+        row = {}
+        for symbol, target in transitions.items():
+            row[symbol] = f'{"shift" if grammar.is_terminal(symbol) else "goto"}_{target}'
+        for rule, bits in automaton.get_reductions(state):
+            lhs = grammar.rules[rule][0]
+            for terminal in grammar.get_terminals(grammar.follow[lhs] if reduce_on == 'follow' else bits):
+                if terminal in row:
+                    conflicts.append(f'state {state}: {row[terminal]} and reduce_{rule} on {terminal}')
+                row[terminal] = f'reduce_{rule}'
+        table['parse_table'][state] = {key: row[key] for key in keep_order(list(row), old_rows.get(str(state)))}
+    return table, conflicts
+
+
+# the tables are the same, the order of the sets doesn't matter
+def same_tables(table: dict, other: dict) -> bool:
+    def normalize(t: dict) -> dict:
+        t = json.loads(json.dumps(t))
+        for key in ('first', 'follow'):
+            t[key] = {symbol: sorted(terminals) for symbol, terminals in t[key].items()}
+        return t
+    return normalize(table) == normalize(other)
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description='generate the parse table of a grammar')
+    arg_parser.add_argument('-g', '--grammar', default=GRAMMAR_FILE, help='the yacc grammar (default: grammar.y)')
+    arg_parser.add_argument('-o', '--output', default=TABLE_FILE, help='the table file (default: table.json)')
+    arg_parser.add_argument('--lookaheads', choices=['follow', 'lalr'], default='follow',
+                            help='the terminals a rule is reduced on (default: follow)')
+    arg_parser.add_argument('--check', action='store_true', help='only check that the table file is up to date')
+    args = arg_parser.parse_args()
+
+    old = None          # the table file, its sets and its rows keep their order
+    if os.path.exists(args.output):
+        with open(args.output) as file:
+            old = json.load(file)
+    start = time.perf_counter()
+    grammar = Grammar(*read_grammar(args.grammar))
+    automaton = Automaton(grammar)
+    table, conflicts = build_table(grammar, automaton, args.lookaheads, old)
+    elapsed = time.perf_counter() - start
+    for conflict in conflicts:
+        print(f'conflict in {conflict}', file=sys.stderr)
+    print(f'{len(grammar.rules)} rules, {len(automaton.kernels)} states, {len(conflicts)} conflicts '
+          f'in {elapsed * 1000:.1f} ms', file=sys.stderr)
+    if args.check:
+        up_to_date = old is not None and same_tables(table, old)
+        print(f'{args.output} is {"up to date" if up_to_date else "out of date"}', file=sys.stderr)
+        sys.exit(0 if up_to_date else 1)
+    with open(args.output, 'w') as file:
+        file.write(json.dumps(table, indent=4))
 
 
-def correct_form(token):
-    token = re.sub('[\'"]', '', token)
-    if token == '$end':
-        return '$'
-    return token
-
-
-f = open("grammar.output", "r")
-content = f.read()
-content = content.replace('/* empty */', 'epsilon')
-f.close()
-x = content.split('\n\n\n')
-
-table = {'terminals': [], 'non_terminals': [], 'first': {}, 'follow': {}, 'grammar': {}, 'parse_table': {}}
-
-# extract grammar rules
-for rule in x[0].split('\n\n')[1:]:
-    rule_number = None
-    non_terminal = None
-    flag = False
-    s = []
-    for t in rule.split():
-        if t.isnumeric():
-            rule_number = int(t)
-            flag = True
-        elif flag and not non_terminal:
-            non_terminal = correct_form(t.replace(':', ''))
-        elif t == '|':
-            table['grammar'][rule_number - 1] = [non_terminal, '->'] + s
-            s = []
-        else:
-            s.append(correct_form(t))
-    table['grammar'][rule_number] = [non_terminal, '->'] + s
-
-# extract terminals
-for terminal in x[1].split('\n')[2:]:
-    t = correct_form(terminal.split()[0])
-    if t != 'error':  # bison adds an error terminal to the grammar
-        table['terminals'].append(t)
-
-# extract non terminals
-for non_terminal in x[2].split('\n')[2:]:
-    nt = correct_form(non_terminal.split()[0])
-    if nt != 'on':
-        table['non_terminals'].append(nt)
-
-
-# create first and follow set
-# bison does not show which non-terminal to reduce at
-# so we need the follow set of the non-terminals
-
-def union(x1, x2):
-    n = len(x1)
-    x1 |= x2
-    return len(x1) != n
-
-
-first = {i: set() for i in table['non_terminals']}
-first.update((i, {i}) for i in table['terminals'])
-follow = {i: set() for i in table['non_terminals']}
-follow['program'] = set('$')
-epsilon = set()
-while True:
-    updated = False
-
-    for rule in table['grammar'].values():
-        nt, expression = rule[0], rule[2:]
-
-        # first
-        for symbol in expression:
-            if symbol == 'epsilon':
-                updated |= union(epsilon, {nt})
-                break
-            updated |= union(first[nt], first[symbol])
-            if symbol not in epsilon:
-                break
-
-        # follow
-        aux = follow[nt]
-        for symbol in reversed(expression):
-            if symbol == 'epsilon':
-                break
-            if symbol in follow:
-                updated |= union(follow[symbol], aux)
-            if symbol in epsilon:
-                aux = aux.union(first[symbol])
-            else:
-                aux = first[symbol]
-
-    if not updated:
-        break
-
-table['first'] = first
-table['follow'] = follow
-
-# create the parse table
-for state, content in enumerate(x[3:]):
-    table['parse_table'][state] = {}
-    if '$default  accept' in content:
-        table['parse_table'][state]['$'] = 'accept'
-        continue
-    shifts = re.findall(r"(\S*)\s*shift, and go to state (\d+)", content)
-    gotos = re.findall(r"  (\S*)\s*go to state (\d+)", content)
-    reduces = re.findall(r"reduce using rule (\d+) \S*", content)
-    for terminal, dst in shifts:
-        table['parse_table'][state][correct_form(terminal)] = f'shift_{dst}'
-    for non_terminal, dst in gotos:
-        table['parse_table'][state][correct_form(non_terminal)] = f'goto_{dst}'
-    for reduce_rule in reduces:
-        nt = table['grammar'][int(reduce_rule)][0]
-        for symbol in table['follow'][nt]:
-            table['parse_table'][state][correct_form(symbol)] = f'reduce_{reduce_rule}'
-
-# create a json file containing the information
-# set are not json serializable, so we convert them to lists
-for t in table['non_terminals'] + table['terminals']:
-    table['first'][t] = list(table['first'][t])
-    if t in table['follow']:
-        table['follow'][t] = list(table['follow'][t])
-json_object = json.dumps(table, indent=4)
-with open("table.json", "w") as outfile:
-    outfile.write(json_object)
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+import os
+import re
+from typing import List, Tuple
+
+GRAMMAR_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'grammar', 'grammar.y')
+
+# a rule of the grammar: (left hand side, right hand side symbols), an epsilon rule has no symbols
+Rule = Tuple[str, List[str]]
+
+# the symbols of the rules section: quoted terminals, names and the punctuation of the rules
+SYMBOL_PATTERN = re.compile(r'"[^"]*"|\'[^\']*\'|[A-Za-z_$][A-Za-z0-9_$]*|[:|;]')
+
+
+# the rules and the terminals of a yacc grammar, rule 0 is $accept -> start $ like in the bison output
+# (so the rules have the numbers which the parse table uses)
+# the terminals are in the order of their token numbers in bison: $, the character literals by their code,
+# the declared tokens and then the other literals
+def read_grammar(file_name: str = GRAMMAR_FILE) -> Tuple[List[Rule], List[str]]:
+    with open(file_name) as file:
+        content = re.sub(r'/\*.*?\*/', ' ', file.read(), flags=re.S)
+    declarations, rules_section = content.split('%%')[:2]
+    tokens = []
+    start = None
+    for line in declarations.splitlines():
+        words = line.split()
+        if words[:1] == ['%token']:
+            tokens.extend(word for word in words[1:] if word not in tokens)
+        elif words[:1] == ['%start'] and len(words) > 1:
+            start = words[1]
+    rules = []
+    literals = []
+    lhs, rhs = None, []
+    symbols = SYMBOL_PATTERN.findall(rules_section)
+    for i, symbol in enumerate(symbols):
+        if i + 1 < len(symbols) and symbols[i + 1] == ':':
+            lhs, rhs = symbol, []
+        elif symbol == ':':
+            continue
+        elif symbol in {'|', ';'}:
+            rules.append((lhs, rhs))
+            rhs = []
+        elif symbol[0] in '"\'':
+            if symbol[1:-1] not in literals:
+                literals.append(symbol[1:-1])
+            rhs.append(symbol[1:-1])
+        else:
+            rhs.append(symbol)
+    if lhs is None:
+        raise ValueError(f'{file_name} has no rules')
+    characters = sorted((literal for literal in literals if len(literal) == 1), key=ord)
+    terminals = ['$'] + characters + tokens + [literal for literal in literals if len(literal) != 1]
+    return [('$accept', [start or rules[0][0], '$'])] + rules, terminals
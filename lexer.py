@@ -1,64 +1,151 @@
-from typing import List, Tuple, Dict
-from dfa import DFA
+from typing import List, Tuple, TextIO, Optional, Union
+from dfa import DFA, CompiledDFA
 
 
-# get initial keywords as the symbol table
-def get_initial_symbols() -> Dict[str, Tuple[str, int, int]]:
-    keywords = ['if', 'else', 'void', 'int', 'while', 'break', 'switch', 'default', 'case', 'return', 'endif', 'output']
-    return {x: ('KEYWORD', 0, 1) for x in keywords}
+# this class reads the input file chunk by chunk instead of loading all of it
+# it only keeps the characters that the lexer may still go back to, so memory stays bounded
+class SourceReader:
 
+    def __init__(self, source: TextIO, chunk_size: int = 1 << 16) -> None:
+        self.source = source            # the opened input file
+        self.chunk_size = chunk_size    # number of characters read at once
+        self.buffer = ''                # characters we currently keep in memory, joined in one string
+        self.chunks: List[str] = []     # chunks read after the buffer, they are joined only when they are sliced
+        self.chunk = ''                 # last chunk read
+        self.chunk_start = 0            # index of chunk[0] in the whole input
+        self.base = 0                   # index of buffer[0] in the whole input
+        self.end = 0                    # number of characters read so far
+        self.eof = False                # have we read the whole input or not
+        self.last_char = ''             # last character of the whole input (used for the EOF line number)
+        self.line_pos = 0               # an index which we know its line number
+        self.line = 0                   # line number of line_pos
 
-# this function takes a file_name, and returns all its characters with its line number
-def get_chars(file_name: str) -> List[Tuple[int, str]]:
-    result = []
-    with open(file_name) as code:
-        for i, line in enumerate(code):
-            for c in line:
-                result.append((i, c))
-        result.append((i+1, '$$'))
-    return result
+    # read the next chunk of the input (at least size characters), returns False if there is nothing left
+    # the chunk is not added to the buffer yet, so a long lexeme doesn't copy the buffer on every chunk
+    def fill(self, size: int = 0) -> bool:
+        if self.eof:
+            return False
+        chunk = self.source.read(max(size, self.chunk_size))
+        if not chunk:
+            self.eof = True
+            self.source.close()
+            return False
+        self.chunks.append(chunk)
+        self.chunk = chunk
+        self.chunk_start = self.end
+        self.end += len(chunk)
+        self.last_char = chunk[-1]
+        return True
+
+    # add the chunks which are read to the buffer
+    def join(self) -> None:
+        if self.chunks:
+            self.buffer = ''.join([self.buffer] + self.chunks)
+            self.chunks = []
+
+    # returns the character at the given index, or '$$' right after the last character
+    def char_at(self, index: int) -> str:
+        i = index - self.base
+        if i < len(self.buffer):
+            return self.buffer[i]
+        i = index - self.chunk_start
+        while i >= len(self.chunk):
+            if not self.fill():
+                if index == self.end:
+                    return '$$'
+                raise IndexError('reading past the end of the input')
+            i = index - self.chunk_start
+        if i >= 0:      # the lexer reads forward, so the character is almost always in the last chunk
+            return self.chunk[i]
+        self.join()
+        return self.buffer[index - self.base]
+
+    # checks if the lexer has passed the '$$' character
+    def is_exhausted(self, index: int) -> bool:
+        return index > 0 and self.char_at(index - 1) == '$$'
+
+    # move the line cursor to the given index by counting the newlines in between
+    def move_line_cursor(self, index: int) -> None:
+        self.join()
+        if index >= self.line_pos:
+            self.line += self.buffer.count('\n', self.line_pos - self.base, index - self.base)
+        else:
+            self.line -= self.buffer.count('\n', index - self.base, self.line_pos - self.base)
+        self.line_pos = index
+
+    # returns the characters between the given indexes
+    def slice(self, start: int, end: int) -> str:
+        self.join()
+        return self.buffer[start - self.base:end - self.base]
+
+    # returns the line number of the character at the given index
+    def line_at(self, index: int) -> int:
+        if self.char_at(index) == '$$':     # '$$' is placed on the line after the last one
+            self.move_line_cursor(self.end)
+            return self.line + (self.last_char not in {'\n', ''})
+        self.move_line_cursor(index)
+        return self.line
+
+    # the lexer never goes back before the given index, so we can drop the characters before it
+    def release(self, index: int) -> None:
+        i = index - self.base
+        if i < self.chunk_size:     # dropping small prefixes is not worth copying the buffer
+            return
+        if self.line_pos < index:
+            self.move_line_cursor(index)
+        self.join()
+        self.buffer = self.buffer[i:]
+        self.base = index
 
 
 class Lexer:
 
-    def __init__(self, file_name: str) -> None:
-        self.chars = get_chars(file_name)   # get input characters
+    # the input is a file name or an opened text stream (like io.StringIO), the stream is closed at its end
+    # dfa can be given to use another DFA implementation, like the reference DFA class
+    def __init__(self, file_name: Union[str, TextIO], dfa: Optional[DFA] = None) -> None:
+        self.chars = SourceReader(open(file_name) if isinstance(file_name, str) else file_name)  # read lazily
         self.pointer = 0    # indicates the index we are reading in the characters array
         self.lineno = 0     # indicates the line number that our token is started
-        self.lexeme = ''    # the current lexeme we have read
-        self.DFA = DFA()    # we use a DFA to get the tokens
-        self.symbols = get_initial_symbols()    # symbol table
+        self.start = 0      # index of the first character of the current lexeme
+        self.end = 0        # index after the last character of the current lexeme (EOF is not a part of it)
+        self.DFA = dfa if dfa is not None else CompiledDFA()    # we use a DFA to get the tokens
         self.spaces = {' ', '\n', '\t', '\f', '\r', '\v'}   # all whitespace characters
 
-    # returns the symbol table
-    def get_symbols(self) -> Dict[str, Tuple[str, int, int]]:
-        return self.symbols
-
     # read the next character and change the DFA state according to the character
-    def get_dfa_state(self):
-        c = self.chars[self.pointer][1]
-        self.lexeme += '' if c == '$$' else c
+    def get_dfa_state(self) -> Tuple[Optional[str], int, bool]:
+        c = self.chars.char_at(self.pointer)
         self.pointer += 1   # move pointer forward
-        return self.DFA.change_state(self.chars[self.pointer - 1][1], self.lexeme, self.symbols)
+        if c != '$$':
+            self.end = self.pointer
+        return self.DFA.change_state(c)
+
+    # apply the DFA result to the pointer and the current lexeme
+    def move_back(self, back: int, reset: bool) -> None:
+        self.pointer -= back    # some states will change our pointer position
+        if reset:
+            self.start = self.end = self.pointer
+        else:
+            self.end = max(self.start, self.end - back)
 
     # this function returns the next token recognized by the lexer
     def get_next_token(self) -> Tuple[str, str, int]:
-        if self.pointer >= len(self.chars):     # if pointer has exceeded the number of characters, return EOF
-            return '$$', '', self.chars[-1][0]
+        if self.chars.is_exhausted(self.pointer):   # if pointer has exceeded the number of characters, return EOF
+            return '$$', '', self.chars.line_at(self.pointer - 1)
+        self.chars.release(self.start)      # the lexer never goes back before the current lexeme
         result = self.get_dfa_state()   # read next character
         is_changed = False      # a bool value to correctly determine the line number
         while result[0] == '':  # while we haven't reached a token, read the next character
-            if not is_changed and self.chars[self.pointer][1] not in self.spaces:
+            if not is_changed and self.chars.char_at(self.pointer) not in self.spaces:
                 # we use the first non-space character line number as the token line number
                 is_changed = True
-                self.lineno = self.chars[self.pointer][0]
-            self.pointer -= result[1]   # some states will change our pointer position
-            self.lexeme = '' if result[2] else self.lexeme[:len(self.lexeme)-result[1]]     # update the lexeme
+                self.lineno = self.chars.line_at(self.pointer)
+            self.move_back(result[1], result[2])
             result = self.get_dfa_state()
-        self.pointer -= result[1]
-        returned_lexeme = self.lexeme[:len(self.lexeme) - (result[1] - 1)]  # final lexeme
-        self.lexeme = '' if result[2] else self.lexeme[:len(self.lexeme) - result[1]]
-        if result[0] == 'Unclosed comment':
+        # the final lexeme is sliced only once, without the characters the DFA gives back
+        returned_lexeme = self.chars.slice(self.start, max(self.start, self.end - max(result[1] - 1, 0)))
+        token = result[0] if result[0] is not None else self.DFA.get_goal_token(returned_lexeme)
+        self.move_back(result[1], result[2])
+        if token == 'Unclosed comment':
             # if we have got an Unclosed comment token, we should check whether its length is below 7 or not
-            return result[0], returned_lexeme if len(returned_lexeme) < 7 else (returned_lexeme[:7] + '...'), self.lineno
-        return result[0], returned_lexeme, self.lineno  # we return the token, its lexeme and its line number
+            return token, returned_lexeme if len(returned_lexeme) < 7 else (returned_lexeme[:7] + '...'), self.lineno
+        return token, returned_lexeme, self.lineno  # we return the token, its lexeme and its line number
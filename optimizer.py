@@ -0,0 +1,306 @@
+from typing import List, Optional, Tuple, Dict, Set, Iterable
+
+from program_block import ProgramBlock, PACKED_LIMIT
+
+# an operand is (mode, number), the mode is '#' (immediate), '' (direct) or '@' (indirect)
+Operand = Tuple[str, int]
+# a line is [opcode, x, y, z], an empty line (or a removed one) has None as its opcode
+Line = List[Optional[object]]
+
+ARITHMETIC = {'ADD', 'SUB', 'MULT', 'DIV', 'EQ', 'LT'}
+FOLDS = {'ADD': lambda x, y: x + y, 'SUB': lambda x, y: x - y, 'MULT': lambda x, y: x * y,
+         'EQ': lambda x, y: int(x == y), 'LT': lambda x, y: int(x < y)}     # DIV is left to the runtime
+MAX_ROUNDS = 10
+
+
+# the program uses something which the optimizer doesn't know, so the program is kept as it is
+class UnknownCode(Exception):
+    pass
+
+
+def parse_operand(operand: object) -> Optional[Operand]:
+    if operand is None:
+        return None
+    if type(operand) is int and operand >= 0:
+        return '', operand
+    if type(operand) is str and operand:
+        mode = operand[0] if operand[0] in '#@' else ''
+        number = operand[len(mode):]
+        if mode == '#' and number.startswith('-'):      # folded constants may be negative
+            number = number[1:]
+        if number.isdecimal() and number.isascii():
+            return mode, int(operand[len(mode):])
+    raise UnknownCode(operand)
+
+
+def parse_target(target: object) -> int:
+    operand = parse_operand(target)
+    if operand is None or operand[0]:
+        raise UnknownCode(target)
+    return operand[1]
+
+
+# the lines of the program block with parsed operands, jump targets are line numbers
+def parse_lines(program_block: ProgramBlock) -> List[Line]:
+    lines = []
+    for op, x, y, z in program_block:
+        if op is None:
+            lines.append([None, None, None, None])
+        elif op in ARITHMETIC:
+            lines.append([op, parse_operand(x), parse_operand(y), get_destination(z)])
+        elif op == 'ASSIGN':
+            lines.append([op, parse_operand(x), get_destination(y), None])
+        elif op == 'JPF':
+            lines.append([op, parse_operand(x), parse_target(y), None])
+        elif op == 'JP':
+            lines.append([op, parse_target(x), None, None])
+        elif op == 'PRINT':
+            lines.append([op, parse_operand(x), None, None])
+        else:
+            raise UnknownCode(op)
+        if any(operand is None for operand in lines[-1][1:get_arity(op)]):
+            raise UnknownCode(op)
+    return lines
+
+
+def get_destination(operand: object) -> Operand:
+    operand = parse_operand(operand)
+    if operand is None or operand[0] == '#':
+        raise UnknownCode(operand)
+    return operand
+
+
+# number of the operands of an opcode (with the destination)
+def get_arity(op: Optional[str]) -> int:
+    return 4 if op in ARITHMETIC else 3 if op in {'ASSIGN', 'JPF'} else 2 if op in {'JP', 'PRINT'} else 1
+
+
+# the operands which a line reads, an indirect destination reads its address
+def get_reads(line: Line) -> List[Operand]:
+    op = line[0]
+    if op in ARITHMETIC:
+        reads = [line[1], line[2]]
+    elif op == 'ASSIGN':
+        reads = [line[1]]
+    elif op in {'JPF', 'PRINT'}:
+        return [line[1]]
+    else:
+        return []
+    destination = get_written(line)
+    if destination[0] == '@':
+        reads.append(('', destination[1]))
+    return reads
+
+
+def get_written(line: Line) -> Optional[Operand]:
+    return line[3] if line[0] in ARITHMETIC else line[2] if line[0] == 'ASSIGN' else None
+
+
+def get_target(line: Line) -> int:
+    return line[1] if line[0] == 'JP' else line[2]
+
+
+# the lines which the line may run after itself
+def get_successors(lines: List[Line], i: int) -> Iterable[int]:
+    op = lines[i][0]
+    if op == 'JP':
+        return lines[i][1],
+    if op == 'JPF':
+        return i + 1, lines[i][2]
+    return i + 1,
+
+
+# the first lines of the basic blocks
+def get_leaders(lines: List[Line]) -> Set[int]:
+    leaders = {0}
+    for i, line in enumerate(lines):
+        if line[0] == 'JP':
+            leaders.update((line[1], i + 1))
+        elif line[0] == 'JPF':
+            leaders.update((line[2], i + 1))
+    return leaders
+
+
+# how many times each address is read, directly or as the address of an indirect operand
+def count_reads(lines: List[Line]) -> Dict[int, int]:
+    reads = {}
+    for line in lines:
+        for mode, number in get_reads(line):
+            if mode != '#':
+                reads[number] = reads.get(number, 0) + 1
+    return reads
+
+
+# constant folding with constant and copy propagation inside the basic blocks
+# known maps an address to the operand which has the same value (an immediate or another address)
+def propagate(lines: List[Line]) -> bool:
+    changed = False
+    leaders = get_leaders(lines)
+    known: Dict[int, Operand] = {}
+
+    def replace(operand: Operand) -> Operand:
+        mode, number = operand
+        if mode == '' and number in known:
+            return known[number]
+        if mode == '@' and number in known:     # the address itself is known
+            value = known[number]
+            return ('', value[1]) if value[0] == '#' else ('@', value[1]) if value[0] == '' else operand
+        return operand
+
+    for i, line in enumerate(lines):
+        if i in leaders:
+            known.clear()
+        op = line[0]
+        if op is None or op == 'JP':
+            continue
+        old = list(line)
+        line[1] = replace(line[1])
+        if op in ARITHMETIC:
+            line[2] = replace(line[2])
+            if line[1][0] == '#' and line[2][0] == '#' and op in FOLDS:
+                value = FOLDS[op](line[1][1], line[2][1])
+                if -PACKED_LIMIT <= value < PACKED_LIMIT:      # a larger value keeps its operation
+                    line[:] = ['ASSIGN', ('#', value), line[3], None]
+                    op = 'ASSIGN'
+        elif op == 'JPF' and line[1][0] == '#':
+            line[:] = ['JP', line[2], None, None] if line[1][1] == 0 else [None, None, None, None]
+            op = line[0]
+        destination = get_written(line)
+        if destination is not None and destination[0] == '@':
+            line[get_arity(op) - 1] = destination = replace(destination)
+        if op == 'ASSIGN' and line[1] == destination:       # copying an address to itself
+            line[:] = [None, None, None, None]
+            destination = None
+        changed |= line != old
+        if destination is None:
+            continue
+        if destination[0] == '@':       # it may write any address
+            known.clear()
+            continue
+        known.pop(destination[1], None)
+        for address in [address for address, value in known.items() if value == destination]:
+            del known[address]
+        if op == 'ASSIGN' and line[1][0] != '@' and line[1] != destination:
+            known[destination[1]] = line[1]
+    return changed
+
+
+# removes the temps which are never read, and writes the result of an operation directly to the
+# destination of the copy which follows it, when that copy is the only use of the temp
+def remove_temps(lines: List[Line], temps: range) -> bool:
+    changed = False
+    reads = count_reads(lines)
+    leaders = get_leaders(lines)
+    for i, line in enumerate(lines):
+        destination = get_written(line)
+        if destination is None or destination[0] != '' or destination[1] not in temps:
+            continue
+        if reads.get(destination[1], 0) == 0:
+            for mode, number in get_reads(line):
+                if mode != '#':
+                    reads[number] -= 1
+            line[:] = [None, None, None, None]
+            changed = True
+        elif reads[destination[1]] == 1 and line[0] in ARITHMETIC and i + 1 < len(lines) and i + 1 not in leaders:
+            copy = lines[i + 1]
+            if copy[0] == 'ASSIGN' and copy[1] == destination:
+                line[3] = copy[2]
+                lines[i + 1] = [None, None, None, None]
+                reads[destination[1]] = 0
+                changed = True
+    return changed
+
+
+# the line which really runs when we jump to the target (the empty lines and the jumps are skipped)
+# the lines which are skipped on the way are added to seen
+def follow(lines: List[Line], target: int, seen: Optional[Set[int]] = None) -> int:
+    seen = set() if seen is None else seen
+    while target < len(lines) and target not in seen:
+        seen.add(target)
+        line = lines[target]
+        if line[0] is None:
+            target += 1
+        elif line[0] == 'JP':
+            target = line[1]
+        else:
+            break
+    return target
+
+
+# jump threading, a jump to the next running line is removed and the lines which never run are removed too
+# a jump is only removed when the way to the next running line doesn't pass the jump itself (like the jump back
+# of a loop which is reached by a break), without it that way would become a loop
+def thread_jumps(lines: List[Line]) -> bool:
+    changed = False
+    for i, line in enumerate(lines):
+        position = 1 if line[0] == 'JP' else 2 if line[0] == 'JPF' else 0
+        if not position:
+            continue
+        target = follow(lines, line[position])
+        if target != line[position]:
+            line[position] = target
+            changed = True
+        passed = set()
+        if target == follow(lines, i + 1, passed) and i not in passed:
+            lines[i] = [None, None, None, None]
+            changed = True
+    reached = [False] * len(lines)
+    pending = [0]
+    while pending:
+        i = pending.pop()
+        if i >= len(lines) or reached[i]:
+            continue
+        reached[i] = True
+        pending.extend(get_successors(lines, i))
+    for i, line in enumerate(lines):
+        if not reached[i] and line[0] is not None:
+            lines[i] = [None, None, None, None]
+            changed = True
+    return changed
+
+
+def format_operand(operand: Optional[Operand]) -> Optional[str]:
+    return None if operand is None else operand[0] + str(operand[1])
+
+
+# drops the empty lines and renumbers the jump targets
+def build_program_block(lines: List[Line]) -> ProgramBlock:
+    new_index = []
+    count = 0
+    for line in lines:
+        new_index.append(count)
+        count += line[0] is not None
+    new_index.append(count)
+    program_block = ProgramBlock()
+    for line in lines:
+        op = line[0]
+        if op is None:
+            continue
+        if op == 'JP':
+            line = [op, new_index[line[1]], None, None]
+        elif op == 'JPF':
+            line = [op, format_operand(line[1]), new_index[line[2]], None]
+        else:
+            line = [op] + [format_operand(operand) for operand in line[1:]]
+        program_block[len(program_block)] = line
+    return program_block
+
+
+# optimizes the three address codes, temps are the addresses which the code generator uses as temps
+# (a temp which is never read can be removed, the other addresses may be read by the indirect operands)
+# the result has no empty lines, and a program which the optimizer doesn't understand is returned as it is
+# (a program with functions is one: its return addresses are immediates which the optimizer can't tell from numbers)
+def optimize(program_block: ProgramBlock, temps: range = range(0)) -> ProgramBlock:
+    try:
+        lines = parse_lines(program_block)
+    except UnknownCode:
+        return program_block
+    if any(get_target(line) > len(lines) for line in lines if line[0] in {'JP', 'JPF'}):
+        return program_block
+    for _ in range(MAX_ROUNDS):
+        changed = propagate(lines)
+        changed |= remove_temps(lines, temps)
+        changed |= thread_jumps(lines)
+        if not changed:
+            break
+    return build_program_block(lines)
@@ -1,143 +1,236 @@
-import json
-from typing import Tuple, List
-import anytree
+from typing import Tuple, List, Type, Optional, Any, Union, TextIO
 
 from lexer import Lexer
-from code_generator import CodeGenerator
+from code_generator import CodeGenerator, VIRTUAL_TEMP
+from parse_table import load_table, get_packed, ERROR, SHIFT, ACCEPT, ACTION_BITS
+from parse_tree import TREE_BUILDERS
+from sinks import Sink, CollectorSink
+from token_array import TokenArray, VALID_TOKENS, get_terminal, get_leaf_name
 
 
 class Parser:
-    # initialize the parser
-    def __init__(self, input_file_name: str) -> None:
-        table_file = open('grammar/table.json')
-        table = json.load(table_file)
-        self.valid_tokens = {'NUM', 'ID', 'KEYWORD', 'SYMBOL', '$$'}    # valid tokens
+    # initialize the parser, the input is a file name or an opened text stream
+    # lexer_type selects the lexer backend (Lexer or RegexLexer)
+    # tree selects the parse tree: 'anytree' nodes, light 'tuple' nodes, or None to only generate the code
+    # first_temp is the address of the first temp of the code generator
+    # the syntax errors are written to error_sink as they are found, by default they are collected in a list
+    # prelex lexes the whole input into a TokenArray before the parse, and the parser walks its arrays
+    # tokens are the arrays of an input which is already lexed (then the input can be None)
+    def __init__(self, input_file_name: Optional[Union[str, TextIO]], lexer_type: Type[Lexer] = Lexer,
+                 tree: Optional[str] = 'anytree', first_temp: int = VIRTUAL_TEMP, error_sink: Optional[Sink] = None,
+                 prelex: bool = False, tokens: Optional[TokenArray] = None) -> None:
+        table = load_table()                                            # shared and cached parse table
+        self.valid_tokens = VALID_TOKENS                                # valid tokens
         self.non_terminals = set(table['non_terminals'])                # grammar non-terminals
         self.follow = table['follow']                                   # follow sets
+        self.has_goto_states = table['has_goto']                        # states which have a goto (panic mode)
         self.grammar = table['grammar']                                 # the grammar itself
-        self.parse_table = table['parse_table']                         # parse table
-        self.lexer = Lexer(input_file_name)                             # connection between parser and lexer
-        self.current_token = '', '', -1                                 # current token
+        self.terminal_ids = table['terminal_ids']                       # integer id of each terminal
+        self.non_terminal_ids = table['non_terminal_ids']               # integer id of each non-terminal
+        self.non_terminal_names = table['non_terminals']                # name of each non-terminal id
+        self.action_width = table['action_width']                       # number of columns in action
+        # the packed actions (by state and terminal id), goto states (by state and non-terminal id) and panic mode
+        # non-terminal ids (by state and terminal id): the offset of each state, the packed cells and the offset
+        # of the state of each cell
+        self.action_offsets, self.action_values, self.action_check = get_packed(table, 'action')
+        self.goto_offsets, self.goto_values, self.goto_check = get_packed(table, 'goto')
+        self.recovery_offsets, self.recovery_values, self.recovery_check = get_packed(table, 'recovery')
+        self.default_reductions = table['default_reductions']           # the only action of a state (or 0)
+        self.reduce_lookaheads = table['reduce_lookaheads']             # terminals of the default reductions
+        self.rule_lhs = table['rule_lhs']                               # non-terminal id of each rule
+        self.rule_length = table['rule_length']                         # right hand side length of each rule
+        self.lexer = lexer_type(input_file_name) if input_file_name is not None else None   # connection to lexer
+        self.prelex = prelex or tokens is not None                      # walk a token array or call the lexer
+        self.tokens = tokens                                            # the token array (made by lex_tokens)
+        self.token_index = -1                                           # index of the current token in tokens
+        self.current_token = '', '', -1                                 # current token (when there's no array)
+        self.current_terminal = -1                                      # terminal id of the current token
+        self.current_lexeme = ''                                        # lexeme of the current token
+        self.current_name = ''                                          # leaf name of the current token
         self.stack = []                                                 # stack for LR(1) parsing
-        self.syntax_errors = []                                         # list of syntax errors
+        self.error_sink = error_sink or CollectorSink()                 # writer of the syntax errors
         self.has_parse_tree = True                                      # parse will be successful or not
-        self.code_generator = CodeGenerator(self.lexer)
+        self.eof_recoveries = set()                                     # stack states of the panic modes at $
+        self.tree_builder = TREE_BUILDERS[tree]() if tree else None     # None means the stack only keeps names
+        self.code_generator = CodeGenerator(self.lexer, first_temp)
+
+    # lexes the whole input into the token array, unless the parser already has one
+    def lex_tokens(self) -> TokenArray:
+        if self.tokens is None:
+            self.tokens = TokenArray(self.lexer)
+        return self.tokens
 
     # this function calls get_next_token in lexer until we reach a valid token (not a lexical error or COMMENT)
+    # with a token array it only moves to the next index, the index stays on the last token ($)
     def update_token(self) -> None:
+        tokens = self.tokens
+        if tokens is not None:
+            index = self.token_index
+            if index < len(tokens.terminals) - 1:
+                index = self.token_index = index + 1
+            lexeme_id = tokens.lexeme_ids[index]
+            self.current_terminal = tokens.terminals[index]
+            self.current_lexeme = tokens.lexemes[lexeme_id]
+            self.current_name = tokens.names[lexeme_id]
+            return
         self.current_token = self.lexer.get_next_token()
         while not self.current_token[0] in self.valid_tokens:
             self.current_token = self.lexer.get_next_token()
+        kind, self.current_lexeme = self.current_token[0], self.current_token[1]
+        # tokens which are not terminals (like an empty SYMBOL) get the last column, which has no action
+        self.current_terminal = self.terminal_ids.get(get_terminal(kind, self.current_lexeme), self.action_width - 1)
+        self.current_name = get_leaf_name(kind, self.current_lexeme)
+
+    # the current token like the lexer returns it (the panic mode reads its kind and line number)
+    def get_current_token(self) -> Tuple[str, str, int]:
+        return self.tokens.get_token(self.token_index) if self.tokens is not None else self.current_token
 
     # some tokens are called with their lexeme (like int) but some aren't (like NUM)...
     def get_value_of_token(self) -> str:
-        if self.current_token[0] == 'KEYWORD' or self.current_token[0] == 'SYMBOL':
-            return self.current_token[1]
-        if self.current_token[0] == '$$':
-            return '$'
-        return self.current_token[0]
+        return get_terminal(*self.get_current_token()[:2])
 
     # which action should we make? we will find out after looking up the parse table
-    def get_current_action(self) -> str:
-        token = self.get_value_of_token()
-        if self.parse_table[str(self.stack[-1][1])].get(token) is None:
-            return ''       # if the cell is empty, return an empty string
-        return self.parse_table[str(self.stack[-1][1])][token]
+    # a state with a default reduction only checks if the terminal is one of its lookaheads
+    def get_current_action(self) -> int:
+        state = self.stack[-1][1]
+        reduction = self.default_reductions[state]
+        if reduction:
+            return reduction if self.reduce_lookaheads[state] >> self.current_terminal & 1 else ERROR
+        offset = self.action_offsets[state]
+        cell = offset + self.current_terminal
+        return self.action_values[cell] if self.action_check[cell] == offset else ERROR
+
+    # returns the goto state of a state with a non-terminal id
+    def get_goto(self, state: int, non_terminal: int) -> int:
+        offset = self.goto_offsets[state]
+        return self.goto_values[offset + non_terminal] if self.goto_check[offset + non_terminal] == offset else -1
+
+    # returns a node without children, without a tree builder the stack just keeps the name
+    def new_leaf(self, name: str) -> Any:
+        return self.tree_builder.leaf(name) if self.tree_builder else name
+
+    # returns the name of a node of the stack (used for the panic mode errors)
+    def get_node_name(self, node: Any) -> str:
+        return self.tree_builder.name(node) if self.tree_builder else node
 
     # this function handles the shift action
     def shift(self, state: int) -> None:
-        if self.current_token[0] == '$$':
-            self.stack.append((anytree.Node('$'), state))
-        else:
-            self.stack.append((anytree.Node(f'({self.current_token[0]}, {self.current_token[1]})'), state))
+        self.stack.append((self.new_leaf(self.current_name), state))
         self.update_token()
 
     # this function handles the reduce action
-    def reduce(self, state: str) -> None:
-        children = []
-        if self.grammar[state][2] == 'epsilon':
-            children.append(anytree.Node('epsilon'))
+    def reduce(self, rule: int) -> None:
+        length = self.rule_length[rule]
+        lhs = self.rule_lhs[rule]
+        if self.tree_builder is None:       # only the states and the semantic actions matter
+            if length:
+                del self.stack[-length:]
+            terminal = self.non_terminal_names[lhs]
         else:
-            for _ in range(len(self.grammar[state]) - 2):
-                children.append(self.stack.pop()[0])
-        terminal = anytree.Node(self.grammar[state][0], children=children[::-1])
-        new_state = int(self.parse_table[str(self.stack[-1][1])][self.grammar[state][0]].split('_')[1])
-        self.stack.append((terminal, new_state))
-        self.code_generator.code_gen(int(state), self.current_token[1])
+            if length:
+                children = [node for node, _ in self.stack[-length:]]
+                del self.stack[-length:]
+            else:
+                children = [self.tree_builder.leaf('epsilon')]
+            terminal = self.tree_builder.node(self.non_terminal_names[lhs], children)
+        state = self.stack[-1][1]
+        cell = self.goto_offsets[state] + lhs       # an LR parser always has the goto of a reduction
+        self.stack.append((terminal, self.goto_values[cell]))
+        self.code_generator.code_gen(rule, self.current_lexeme)
 
     # this function accepts the current parsing
     def accept(self) -> None:
         last = self.stack.pop()         # join the ($) token to program node
-        anytree.Node(last[0].name, parent=self.stack[-1][0])
+        if self.tree_builder:
+            root = self.tree_builder.add_child(self.stack[-1][0], self.tree_builder.leaf(self.get_node_name(last[0])))
+            self.stack[-1] = root, self.stack[-1][1]
 
     # this function does the action we should make in each step
-    def take_action(self, current_action: str) -> bool:
-        if current_action == '':        # if current action is empty, we should enter the panic mode
+    def take_action(self, current_action: int) -> bool:
+        kind = current_action & ((1 << ACTION_BITS) - 1)
+        if kind == ERROR:           # if current action is empty, we should enter the panic mode
             return self.panic_recovery()
-        if current_action == 'accept':  # if current action is accept, accept the parsing
+        if kind == ACCEPT:          # if current action is accept, accept the parsing
             self.accept()
             return False            # return False so the parsing won't get further more
-        current_action = current_action.split('_')
-        if current_action[0] == 'shift':
-            self.shift(int(current_action[1]))
+        if kind == SHIFT:
+            self.shift(current_action >> ACTION_BITS)
         else:
-            self.reduce(current_action[1])
+            self.reduce(current_action >> ACTION_BITS)
         return True                 # return True so we can continue parsing
 
     # checks if a state has a goto to a non-terminal or not
     def has_goto(self, state: int) -> bool:
-        for k, v in self.parse_table[str(state)].items():
-            if k in self.non_terminals:
-                return True
-        return False
+        return self.has_goto_states[state] != 0
 
     # checks if with current token, state can follow any non-terminal
     def can_follow(self, state: int) -> Tuple[str, bool]:
-        token = self.get_value_of_token()
-        for k, v in sorted(self.parse_table[str(state)].items()):
-            if k in self.non_terminals and token in self.follow[k]:
-                return k, True
-        return '', False
+        offset = self.recovery_offsets[state]
+        cell = offset + self.current_terminal
+        non_terminal = self.recovery_values[cell] if self.recovery_check[cell] == offset else -1
+        if non_terminal == -1:
+            return '', False
+        return self.non_terminal_names[non_terminal], True
 
     # pop the stack until we find a state which has goto (Step 1 of Panic Mode)
     def find_goto(self) -> None:
         while not self.has_goto(self.stack[-1][1]):
             popped = self.stack.pop()
-            self.syntax_errors.append(f'syntax error , discarded {popped[0].name} from stack')
+            self.error_sink.write(f'syntax error , discarded {self.get_node_name(popped[0])} from stack')
 
     # discard the tokens until we find a token which can follow a non-terminal (Step 2 and 3 of Panic Mode)
     def find_follower(self) -> bool:
         can_follow = self.can_follow(self.stack[-1][1])
         while not can_follow[1]:                    # STEP 2
-            if self.current_token[0] == '$$':       # when we discard $ token, we halt the parsing
-                self.syntax_errors.append(f'#{self.current_token[2] + 1} : syntax error , Unexpected EOF')
+            token = self.get_current_token()
+            if token[0] == '$$':                    # when we discard $ token, we halt the parsing
+                self.error_sink.write(f'#{token[2] + 1} : syntax error , Unexpected EOF')
                 self.has_parse_tree = False         # we don't have a PARSE TREE
                 return False
-            self.syntax_errors.append(f'#{self.current_token[2] + 1} : syntax error , discarded {self.current_token[1]} from input')
+            self.error_sink.write(f'#{token[2] + 1} : syntax error , discarded {token[1]} from input')
             self.update_token()
             can_follow = self.can_follow(self.stack[-1][1])
         # STEP 3: stack the new non-terminal
-        self.syntax_errors.append(f'#{self.current_token[2] + 1} : syntax error , missing {can_follow[0]}')
-        new_state = int(self.parse_table[str(self.stack[-1][1])][can_follow[0]].split('_')[1])
-        self.stack.append((anytree.Node(can_follow[0]), new_state))
+        self.error_sink.write(f'#{self.get_current_token()[2] + 1} : syntax error , missing {can_follow[0]}')
+        new_state = self.get_goto(self.stack[-1][1], self.non_terminal_ids[can_follow[0]])
+        self.stack.append((self.new_leaf(can_follow[0]), new_state))
         return True             # parsing should be continued
 
     # panic mode recovery
+    # a panic mode at $ which starts again with the same stack would never end, then the parsing halts
     def panic_recovery(self) -> bool:
-        self.syntax_errors.append(f'#{self.current_token[2]+1} : syntax error , illegal {self.current_token[1]}')
+        self.code_generator.syntax_error()
+        token = self.get_current_token()
+        if token[0] == '$$':
+            states = tuple(state for _, state in self.stack)
+            if states in self.eof_recoveries:
+                self.error_sink.write(f'#{token[2] + 1} : syntax error , Unexpected EOF')
+                self.has_parse_tree = False
+                return False
+            self.eof_recoveries.add(states)
+        self.error_sink.write(f'#{token[2]+1} : syntax error , illegal {token[1]}')
         self.update_token()
         self.find_goto()
         return self.find_follower()
 
-    # parse the program and get the parse tree
-    def get_parse_tree(self) -> anytree.Node:
-        self.stack = [(anytree.Node(''), 0)]
+    # parse the program and get the parse tree (None if the parser builds no tree)
+    def get_parse_tree(self) -> Any:
+        self.stack = [(self.new_leaf(''), 0)]
+        if self.prelex:
+            self.lex_tokens()
+            self.token_index = -1
         self.update_token()
         res = self.take_action(self.get_current_action())
         while res:      # while parsing is continued, we take an action
             res = self.take_action(self.get_current_action())
-        return self.stack[-1][0] if self.has_parse_tree else anytree.Node('')
+        if self.tree_builder is None:
+            return None
+        return self.stack[-1][0] if self.has_parse_tree else self.tree_builder.leaf('')
 
-    # get all the syntax errors of the written program
+    # get all the syntax errors of the written program (only a collector sink keeps them)
     def get_syntax_errors(self) -> List[str]:
-        return self.syntax_errors
+        return self.error_sink.records if isinstance(self.error_sink, CollectorSink) else []
+
+    # the number of the syntax errors, the ones which a limited sink drops too
+    def get_error_count(self) -> int:
+        return self.error_sink.count
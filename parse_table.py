@@ -0,0 +1,214 @@
+import marshal
+import os
+import sys
+from array import array
+from typing import Dict, List, Tuple, Optional
+
+TABLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'grammar', 'table.json')
+CACHE_VERSION = 4       # change it whenever the cached data changes
+
+# kinds of the packed actions, an action is (argument << ACTION_BITS) | kind and an empty cell is 0
+ERROR, SHIFT, REDUCE, ACCEPT = range(4)
+ACTION_BITS = 2
+
+# the packed matrices of the table, each of them is kept in the three arrays of pack_rows
+PACKED_KEYS = ['action', 'goto', 'recovery']
+PACKED_ARRAYS = ['offsets', 'values', 'check']
+
+# the compiled arrays of the table, marshal keeps them as lists
+# (the packed matrices stay lists, the parser reads a list faster than an array)
+ARRAY_KEYS = ['rule_lhs', 'rule_length', 'has_goto']
+
+# the parts of the json table which the parser doesn't need after it's compiled
+SOURCE_KEYS = ['first', 'parse_table']
+
+# tables which are already loaded in this process, the key is the table file name
+# each value has the (modification time, size) of the file when we loaded it
+loaded_tables: Dict[str, Tuple[Tuple[int, int], dict]] = {}
+
+
+# packs an action of the json table like 'shift_17' into an integer
+def pack_action(action: str) -> int:
+    if action == 'accept':
+        return ACCEPT
+    kind, argument = action.split('_')
+    return int(argument) << ACTION_BITS | (SHIFT if kind == 'shift' else REDUCE)
+
+
+# interns the terminals and non-terminals to integers and builds the ACTION and GOTO matrices, the matrices are
+# packed by pack_rows and a state which only reduces a single rule gets a default reduction
+# the ACTION matrix has one extra column for the tokens which are not terminals, all of its cells are empty
+def compile_table(table: dict) -> dict:
+    terminal_ids = {t: i for i, t in enumerate(table['terminals'])}
+    non_terminal_ids = {nt: i for i, nt in enumerate(table['non_terminals'])}
+    action_width = len(terminal_ids) + 1
+    goto_width = len(non_terminal_ids)
+    action = [ERROR] * (len(table['parse_table']) * action_width)
+    goto = [-1] * (len(table['parse_table']) * goto_width)
+    for state, row in table['parse_table'].items():
+        for symbol, act in row.items():
+            if symbol in non_terminal_ids:
+                goto[int(state) * goto_width + non_terminal_ids[symbol]] = int(act.split('_')[1])
+            else:
+                action[int(state) * action_width + terminal_ids[symbol]] = pack_action(act)
+    rules = [table['grammar'][str(i)] for i in range(len(table['grammar']))]
+    has_goto, recovery = compile_recovery(table, goto, terminal_ids, goto_width, action_width)
+    default_reductions, reduce_lookaheads = get_default_reductions(action, action_width)
+    table['terminal_ids'] = terminal_ids
+    table['non_terminal_ids'] = non_terminal_ids
+    table['action_width'] = action_width
+    table['goto_width'] = goto_width
+    for key, matrix, width, empty in (('action', action, action_width, ERROR), ('goto', goto, goto_width, -1),
+                                      ('recovery', recovery, action_width, -1)):
+        for name, packed in zip(PACKED_ARRAYS, pack_rows(matrix, width, empty)):
+            table[f'{key}_{name}'] = packed
+    table['rule_lhs'] = [non_terminal_ids[rule[0]] for rule in rules]
+    table['rule_length'] = [0 if rule[2] == 'epsilon' else len(rule) - 2 for rule in rules]
+    table['has_goto'] = has_goto
+    table['default_reductions'] = default_reductions
+    table['reduce_lookaheads'] = reduce_lookaheads
+    for key in SOURCE_KEYS:
+        del table[key]
+    return table
+
+
+# the arrays of a packed matrix of a table
+def get_packed(table: dict, key: str) -> Tuple[list, list, list]:
+    return tuple(table[f'{key}_{name}'] for name in PACKED_ARRAYS)
+
+
+# packs a sparse matrix by row displacement (a comb): the rows which are the same are kept once, and each unique
+# row is laid over the others at an offset of its own where none of its cells hits a cell of another row
+# returns the offset of each state, the packed cells and the offset of the row of each cell
+# (a cell of another row, or of no row at all, is an empty cell of this one)
+def pack_rows(matrix: List[int], width: int, empty: int) -> Tuple[list, list, list]:
+    unique: Dict[tuple, int] = {}
+    rows = [unique.setdefault(tuple(matrix[i:i + width]), len(unique)) for i in range(0, len(matrix), width)]
+    offsets = [0] * len(unique)
+    used = set()
+    values: List[int] = []
+    check: List[int] = []
+    cells = [[(column, value) for column, value in enumerate(row) if value != empty] for row in unique]
+    for row in sorted(range(len(cells)), key=lambda r: -len(cells[r])):       # the dense rows first
+        offset = 0
+        while offset in used or any(offset + column < len(check) and check[offset + column] != -1
+                                    for column, _ in cells[row]):
+            offset += 1
+        if len(check) < offset + width:      # every column of the row can be looked up
+            values.extend([empty] * (offset + width - len(check)))
+            check.extend([-1] * (offset + width - len(check)))
+        for column, value in cells[row]:
+            values[offset + column] = value
+            check[offset + column] = offset
+        offsets[row] = offset
+        used.add(offset)
+    return [offsets[row] for row in rows], values, check
+
+
+# the default reduction of each state whose actions all reduce the same rule (0 for the other states), and the
+# terminals which it's reduced on as a bitset, any other terminal is still an error
+def get_default_reductions(action: List[int], width: int) -> Tuple[list, list]:
+    default_reductions = []
+    reduce_lookaheads = []
+    for i in range(0, len(action), width):
+        actions = {act for act in action[i:i + width] if act != ERROR}
+        reduction = actions.pop() if len(actions) == 1 else ERROR
+        if reduction & ((1 << ACTION_BITS) - 1) != REDUCE:
+            reduction = ERROR
+        default_reductions.append(reduction)
+        reduce_lookaheads.append(sum(1 << column for column in range(width) if action[i + column] != ERROR)
+                                 if reduction else 0)
+    return default_reductions, reduce_lookaheads
+
+
+# the tables of the panic mode, laid out like the ACTION and GOTO arrays
+# has_goto tells if a state has a goto to any non-terminal
+# recovery has the non-terminal id which the panic mode stacks in a state for a terminal (-1 if there is none),
+# it's the first one by name of the non-terminals of the state which the terminal can follow
+def compile_recovery(table: dict, goto: list, terminal_ids: Dict[str, int], goto_width: int,
+                     action_width: int) -> Tuple[list, list]:
+    non_terminals = table['non_terminals']
+    by_name = sorted(range(goto_width), key=lambda i: non_terminals[i])
+    follow = [set(table['follow'].get(nt, ())) for nt in non_terminals]
+    states = len(goto) // goto_width if goto_width else 0
+    has_goto = [0] * states
+    recovery = [-1] * (states * action_width)
+    for state in range(states):
+        row = state * goto_width
+        for nt in by_name:
+            if goto[row + nt] == -1:
+                continue
+            has_goto[state] = 1
+            for terminal in follow[nt]:
+                cell = state * action_width + terminal_ids[terminal]
+                if recovery[cell] == -1:
+                    recovery[cell] = nt
+    return has_goto, recovery
+
+
+# the cache file of a table file, it's written next to the table itself
+def get_cache_file(file_name: str) -> str:
+    return file_name + '.cache'
+
+
+# the cache format and the python version, a cache written by another version is never used
+def get_cache_version() -> str:
+    return f'{CACHE_VERSION}-{sys.version_info[0]}.{sys.version_info[1]}-{marshal.version}'
+
+
+# hash of the table file content, the cache is keyed by it
+def get_digest(content: bytes) -> str:
+    import hashlib      # imported here since loading it costs more than reading a valid cache
+    return hashlib.sha256(content).hexdigest()
+
+
+# read the cache file, returns its (version, (modification time, size), digest, table) or None
+def read_cache(cache_file: str) -> Optional[tuple]:
+    try:
+        with open(cache_file, 'rb') as file:
+            cache = marshal.loads(file.read())
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    return cache if isinstance(cache, tuple) and len(cache) == 4 and cache[0] == get_cache_version() else None
+
+
+# write the cache file, a read only grammar directory just means we have no cache
+def write_cache(cache_file: str, version: Tuple[int, int], digest: str, table: dict) -> None:
+    temp_file = f'{cache_file}.{os.getpid()}.tmp'
+    try:
+        with open(temp_file, 'wb') as file:
+            marshal.dump((get_cache_version(), version, digest, table), file)
+        os.replace(temp_file, cache_file)     # other processes never see a half written cache
+    except OSError:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+
+# returns the parse table, which is shared between all the parsers of the process
+# the json file is decoded only when its hash differs from the hash of the cached table
+def load_table(file_name: str = TABLE_FILE) -> dict:
+    stat = os.stat(file_name)
+    version = stat.st_mtime_ns, stat.st_size
+    if file_name in loaded_tables and loaded_tables[file_name][0] == version:
+        return loaded_tables[file_name][1]
+    cache_file = get_cache_file(file_name)
+    cache = read_cache(cache_file)
+    if cache is not None and cache[1] == version:     # the file is untouched since we cached it
+        digest, table = cache[2], cache[3]
+    else:
+        with open(file_name, 'rb') as file:
+            content = file.read()
+        digest = get_digest(content)
+        # the file may be touched but not changed, then we only update the cached modification time
+        if cache is not None and cache[2] == digest:
+            table = cache[3]
+        else:
+            import json     # only needed when the table has really changed
+            table = compile_table(json.loads(content))
+        write_cache(cache_file, version, digest, table)
+    table = dict(table)
+    for key in ARRAY_KEYS:
+        table[key] = array('i', table[key])
+    table['digest'] = digest        # the compile cache is keyed by it
+    loaded_tables[file_name] = version, table
+    return table
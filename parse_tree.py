@@ -0,0 +1,100 @@
+from typing import List, Tuple, Any, TextIO
+
+# a light parse tree node is a (name, children) tuple
+TupleNode = Tuple[str, tuple]
+
+# prefixes of the rendered tree, the same as the default style of anytree.RenderTree
+CONT, END = '\u251c\u2500\u2500 ', '\u2514\u2500\u2500 '     # before a child which has (or hasn't) a next sibling
+VERTICAL, SPACE = '\u2502   ', '    '                          # under a child which has (or hasn't) a next sibling
+
+
+# a compact parse tree node, it only keeps its name and its children
+class ParseNode:
+    __slots__ = 'name', 'children'
+
+    def __init__(self, name: str, children: List['ParseNode']) -> None:
+        self.name = name                # the grammar symbol or the (token, lexeme) of the node
+        self.children = children        # children from left to right
+
+    def __repr__(self) -> str:
+        return f'ParseNode({self.name!r})'
+
+
+# builds the parse tree out of ParseNode objects, it's the tree which compiler.py writes
+class NodeTreeBuilder:
+
+    def leaf(self, name: str) -> ParseNode:
+        return ParseNode(name, [])
+
+    def node(self, name: str, children: List[ParseNode]) -> ParseNode:
+        return ParseNode(name, children)
+
+    def name(self, node: ParseNode) -> str:
+        return node.name
+
+    def add_child(self, parent: ParseNode, child: ParseNode) -> ParseNode:
+        parent.children.append(child)
+        return parent
+
+
+# builds the parse tree out of light (name, children) tuples
+class TupleTreeBuilder:
+
+    # a node without any children (terminals, epsilon and the missing non-terminals of the panic mode)
+    def leaf(self, name: str) -> TupleNode:
+        return name, ()
+
+    # a non-terminal node with its children
+    def node(self, name: str, children: List[TupleNode]) -> TupleNode:
+        return name, tuple(children)
+
+    def name(self, node: TupleNode) -> str:
+        return node[0]
+
+    # returns the parent with the new child at the end of its children
+    def add_child(self, parent: TupleNode, child: TupleNode) -> TupleNode:
+        return parent[0], parent[1] + (child,)
+
+
+# builds the parse tree out of anytree nodes, anytree is only imported when this tree is asked for
+class AnyTreeBuilder:
+
+    def __init__(self) -> None:
+        import anytree
+        self.Node = anytree.Node
+
+    def leaf(self, name: str) -> Any:
+        return self.Node(name)
+
+    def node(self, name: str, children: List[Any]) -> Any:
+        return self.Node(name, children=children)
+
+    def name(self, node: Any) -> str:
+        return node.name
+
+    def add_child(self, parent: Any, child: Any) -> Any:
+        child.parent = parent
+        return parent
+
+
+# tree builders by the name the parser takes
+TREE_BUILDERS = {'anytree': AnyTreeBuilder, 'node': NodeTreeBuilder, 'tuple': TupleTreeBuilder}
+
+
+# writes the tree (of ParseNode, tuple or anytree nodes) to the file, line by line in the format of anytree.RenderTree
+# the nodes are visited with an explicit stack, so a deep tree (like a long statement_list) has no recursion limit
+def render_tree(root: Any, file: TextIO, batch_size: int = 1024) -> None:
+    name, children = root if root.__class__ is tuple else (root.name, root.children)
+    lines = [name]
+    stack = [(child, '', i == 0) for i, child in enumerate(reversed(children))]
+    while stack:
+        node, indent, last = stack.pop()
+        name, children = node if node.__class__ is tuple else (node.name, node.children)
+        lines.append(f'\n{indent}{END if last else CONT}{name}')
+        if children:
+            indent += SPACE if last else VERTICAL
+            stack.extend((children[i], indent, i == len(children) - 1) for i in range(len(children) - 1, -1, -1))
+        if len(lines) >= batch_size:
+            file.write(''.join(lines))
+            lines.clear()
+    file.write(''.join(lines))
@@ -0,0 +1,129 @@
+import json
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Callable, Optional, Iterator, ContextManager, Any
+
+try:
+    import resource
+except ImportError:     # there is no resource module on windows, the peak memory is not sampled there
+    resource = None
+
+from parse import Parser
+
+
+# the peak resident memory of the process in bytes (0 if it can't be sampled)
+def get_peak_memory() -> int:
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024    # linux gives kilobytes
+
+
+# timers and counters of a compilation, a compiler without a profile is not instrumented at all
+class Profile:
+
+    def __init__(self) -> None:
+        self.phases: Dict[str, List[float]] = {}    # wall seconds, cpu seconds and calls of each phase
+        self.counters: Dict[str, int] = {}          # characters, tokens, shifts, panic recoveries, instructions
+        self.reduces: Dict[int, int] = {}           # number of the reductions of each rule
+        self.memory: Dict[str, int] = {}            # peak memory after each phase
+        self.rules: List[str] = []                  # text of each rule, for the table
+
+    def add_time(self, name: str, wall: float, cpu: float, calls: int = 1) -> None:
+        timer = self.phases.setdefault(name, [0.0, 0.0, 0])
+        timer[0] += wall
+        timer[1] += cpu
+        timer[2] += calls
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    # times a phase of the pipeline and samples the peak memory after it
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - wall, time.process_time() - cpu)
+            self.memory[name] = get_peak_memory()
+
+    # wraps a function so each call is timed as a part of a phase
+    def timed(self, name: str, function: Callable) -> Callable:
+        def wrapper(*args: Any) -> Any:
+            wall, cpu = time.perf_counter(), time.process_time()
+            try:
+                return function(*args)
+            finally:
+                self.add_time(name, time.perf_counter() - wall, time.process_time() - cpu)
+        return wrapper
+
+    # wraps a function so its calls are counted
+    def counted(self, name: str, function: Callable) -> Callable:
+        def wrapper(*args: Any) -> Any:
+            self.counters[name] = self.counters.get(name, 0) + 1
+            return function(*args)
+        return wrapper
+
+    def to_dict(self) -> dict:
+        return {'phases': {name: {'wall': wall, 'cpu': cpu, 'calls': calls}
+                           for name, (wall, cpu, calls) in self.phases.items()},
+                'counters': self.counters,
+                'reduces': {str(rule): count for rule, count in sorted(self.reduces.items())},
+                'peak_memory': self.memory}
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+
+    # the profile as a table, the phases which run inside the parse (lex, code_gen, tree) are nested in it
+    def to_table(self, top_rules: int = 10) -> str:
+        lines = [f'{"phase":<12}{"wall ms":>12}{"cpu ms":>12}{"calls":>10}{"peak MB":>10}']
+        for name, (wall, cpu, calls) in self.phases.items():
+            memory = f'{self.memory[name] / (1 << 20):.1f}' if self.memory.get(name) else ''
+            lines.append(f'{name:<12}{wall * 1000:>12.3f}{cpu * 1000:>12.3f}{calls:>10}{memory:>10}')
+        lines.append('')
+        lines.extend(f'{name:<24}{count:>10}' for name, count in self.counters.items())
+        if self.reduces:
+            lines.append('')
+            lines.append(f'{sum(self.reduces.values())} reductions, the most frequent rules:')
+            for rule, count in sorted(self.reduces.items(), key=lambda item: -item[1])[:top_rules]:
+                text = self.rules[rule] if rule < len(self.rules) else ''
+                lines.append(f'{rule:>4} {text:<48}{count:>10}')
+        return '\n'.join(lines)
+
+
+# instruments a parser (its lexer, code generator and tree builder) with the profile
+# the instance methods are replaced by wrappers, so a parser which isn't instrumented runs its plain methods
+def instrument(parser: Parser, profile: Profile) -> None:
+    lexer, code_generator = parser.lexer, parser.code_generator
+    lexer.get_next_token = profile.timed('lex', lexer.get_next_token)
+    code_generator.code_gen = profile.timed('code_gen', code_generator.code_gen)
+    if parser.tree_builder is not None:
+        parser.tree_builder.node = profile.timed('tree', parser.tree_builder.node)
+    profile.counters.update({'shifts': 0, 'panic recoveries': 0})
+    parser.shift = profile.counted('shifts', parser.shift)
+    parser.panic_recovery = profile.counted('panic recoveries', parser.panic_recovery)
+    reduce = parser.reduce
+    reduces = profile.reduces
+
+    def counted_reduce(rule: int) -> None:
+        reduces[rule] = reduces.get(rule, 0) + 1
+        reduce(rule)
+
+    parser.reduce = counted_reduce
+    profile.rules = [' '.join(parser.grammar[str(rule)]) for rule in range(len(parser.grammar))]
+
+
+# the counters which are read once after the parse (the lexer and the program block already know them)
+def count_results(parser: Parser, profile: Profile) -> None:
+    chars = parser.lexer.chars
+    profile.count('characters', chars.end)
+    profile.count('tokens', int(profile.phases.get('lex', (0, 0, 0))[2]))
+    profile.count('syntax errors', parser.get_error_count())
+    profile.count('instructions', sum(1 for _ in parser.code_generator.program_block.instructions()))
+
+
+# a phase of an optional profile
+def phase(profile: Optional[Profile], name: str) -> ContextManager:
+    return profile.phase(name) if profile is not None else nullcontext()
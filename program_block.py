@@ -0,0 +1,105 @@
+from array import array
+from typing import Iterator, Optional, Sequence, Tuple, Union
+
+Operand = Union[str, int, None]
+Instruction = Tuple[Optional[str], Operand, Operand, Operand]
+
+# opcodes of the three address codes, 0 is an empty line of the program block
+OPCODES = ['', 'ADD', 'SUB', 'MULT', 'DIV', 'EQ', 'LT', 'ASSIGN', 'JPF', 'JP', 'PRINT']
+OPCODE_IDS = {op: i for i, op in enumerate(OPCODES)}
+
+# an operand is an integer (a jump target or a temp) or an address: direct, immediate (#) or indirect (@)
+INTEGER, DIRECT, IMMEDIATE, INDIRECT = range(4)
+MODE_BITS = 2
+MODE_MASK = (1 << MODE_BITS) - 1
+PREFIXES = {'#': IMMEDIATE, '@': INDIRECT}
+PACKED_LIMIT = 1 << (63 - MODE_BITS)    # a packed number is in [-PACKED_LIMIT, PACKED_LIMIT), so it fits in int64
+VIRTUAL_TEMP = 1 << 30  # first temp of the code which the allocator lays out again, no variable can reach it
+                        # (and no line either, a line at a temp is a broken semantic stack)
+
+
+# a growable program block, which keeps the opcodes and the operands in parallel typed arrays
+# the lines can be set in any order (the jumps are filled after their target is known), and the lines
+# which are skipped stay empty
+class ProgramBlock:
+
+    def __init__(self) -> None:
+        self.opcodes = array('H')                   # opcode id of each line
+        self.opcode_names = list(OPCODES)           # the opcodes, a broken semantic stack may give others
+        self.opcode_ids = dict(OPCODE_IDS)
+        # an integer or an address is kept as (number << MODE_BITS) | mode, other operands (like None)
+        # are kept as -1 - (their index in operands)
+        self.columns = (array('q'), array('q'), array('q'))
+        self.operands = [None]          # the other operands, None is always -1
+        self.operand_ids = {None: -1}   # index of the other operands, so each of them is kept once
+
+    # the id of an opcode, a falsy opcode means an empty line
+    def encode_opcode(self, op: Operand) -> int:
+        if not op:
+            return 0
+        if op not in self.opcode_ids:
+            self.opcode_ids[op] = len(self.opcode_names)
+            self.opcode_names.append(op)
+        return self.opcode_ids[op]
+
+    # encodes an operand to be kept in a column, a number which doesn't fit in a packed operand is kept as an other one
+    def encode(self, operand: Operand) -> int:
+        if type(operand) is int and 0 <= operand < PACKED_LIMIT:
+            return operand << MODE_BITS | INTEGER
+        if type(operand) is str and operand:
+            mode = PREFIXES.get(operand[0], DIRECT)
+            number = operand[1:] if mode != DIRECT else operand
+            if number.isdecimal() and number.isascii() and (number[0] != '0' or number == '0') and \
+                    len(number) < 20 and int(number) < PACKED_LIMIT:
+                return int(number) << MODE_BITS | mode
+        if operand not in self.operand_ids:
+            self.operand_ids[operand] = -1 - len(self.operands)
+            self.operands.append(operand)
+        return self.operand_ids[operand]
+
+    def decode(self, value: int) -> Operand:
+        if value < 0:
+            return self.operands[-1 - value]
+        mode = value & MODE_MASK
+        if mode == INTEGER:
+            return value >> MODE_BITS
+        return ('', '', '#', '@')[mode] + str(value >> MODE_BITS)
+
+    # adds empty lines until the block has the given length
+    def grow(self, length: int) -> None:
+        if length > VIRTUAL_TEMP:
+            raise IndexError(f'program block line {length - 1} is a temp address')
+        extra = length - len(self.opcodes)
+        self.opcodes.extend(array('H', [0]) * extra)
+        for column in self.columns:
+            column.extend(array('q', [-1]) * extra)
+
+    def __len__(self) -> int:
+        return len(self.opcodes)
+
+    # sets a line of the program block, the block grows to have that line (but never to a temp address)
+    def __setitem__(self, index: int, instruction: Sequence[Operand]) -> None:
+        if index < 0:
+            index += len(self.opcodes)
+        if index >= len(self.opcodes):
+            self.grow(index + 1)
+        op, *operands = instruction
+        self.opcodes[index] = self.encode_opcode(op)
+        for column, operand in zip(self.columns, operands):
+            column[index] = self.encode(operand)
+
+    # returns a line of the program block as (opcode, x, y, z), an empty line is (None, None, None, None)
+    def __getitem__(self, index: int) -> Instruction:
+        opcode = self.opcodes[index]
+        operands = tuple(self.decode(column[index]) for column in self.columns)
+        return (self.opcode_names[opcode] if opcode else None,) + operands
+
+    def __iter__(self) -> Iterator[Instruction]:
+        for i in range(len(self.opcodes)):
+            yield self[i]
+
+    # the lines which are not empty, in their order
+    def instructions(self) -> Iterator[Instruction]:
+        for i, opcode in enumerate(self.opcodes):
+            if opcode:
+                yield self[i]
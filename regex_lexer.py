@@ -0,0 +1,100 @@
+import re
+from typing import Tuple, Optional, Union, TextIO
+
+from dfa import DFA
+from lexer import Lexer
+
+
+SPACES = r' \n\t\f\r\v'                 # all whitespace characters
+NORMAL_SYMBOLS = r';:,+\-<\[\](){}'    # symbols which are tokens on their own
+
+# one match of this pattern skips the whitespaces and reads a whole token
+# the alternatives are ordered so the first one which matches is the token the DFA would return
+TOKEN_PATTERN = re.compile(
+    rf'(?P<spaces>[{SPACES}]*)(?:'
+    rf'(?P<invalid_number>[0-9]+[^0-9{NORMAL_SYMBOLS}/*={SPACES}])'
+    rf'|(?P<num>[0-9]+)'
+    rf'|(?P<invalid_id>[A-Za-z][A-Za-z0-9]*[^A-Za-z0-9{NORMAL_SYMBOLS}/*={SPACES}])'
+    rf'|(?P<id>[A-Za-z][A-Za-z0-9]*)'
+    rf'|(?P<symbol>==|[{NORMAL_SYMBOLS}])'
+    rf'|(?P<invalid_equal>=[^=0-9A-Za-z{NORMAL_SYMBOLS}{SPACES}])'
+    rf'|(?P<comment>/\*(?s:.*?)\*/|//[^\n]*\n?)'
+    rf'|(?P<unclosed_comment>/\*(?s:.*))'
+    rf'|(?P<invalid_slash>/[^/*0-9A-Za-z{NORMAL_SYMBOLS}{SPACES}])'
+    rf'|(?P<unmatched_comment>\*/)'
+    rf'|(?P<lone_symbol>[=/*])'
+    rf'|(?P<invalid_input>(?s:.)))?'
+)
+
+# token type of each alternative of the pattern (id is decided by the keyword check)
+TOKEN_TYPES = {'invalid_number': 'Invalid number', 'num': 'NUM', 'invalid_id': 'Invalid input', 'symbol': 'SYMBOL',
+               'invalid_equal': 'Invalid input', 'comment': 'COMMENT', 'unclosed_comment': 'Unclosed comment',
+               'invalid_slash': 'Invalid input', 'unmatched_comment': 'Unmatched comment', 'lone_symbol': 'SYMBOL',
+               'invalid_input': 'Invalid input'}
+
+# errors make the DFA restart from state 0 without reading the last character again
+ERRORS = {'invalid_number', 'invalid_id', 'invalid_equal', 'invalid_slash', 'invalid_input'}
+
+
+# a lexer which reads a whole token with one regex match instead of moving the DFA character by character
+# it returns exactly the same tokens (and line numbers) as Lexer
+class RegexLexer(Lexer):
+
+    def __init__(self, file_name: Union[str, TextIO], dfa: Optional[DFA] = None) -> None:
+        super().__init__(file_name, dfa)
+        self.restarted = True       # the DFA is in state 0 without any character to read again
+        self.finished = False       # we have returned the EOF token
+
+    # match the token pattern at the pointer, reading more input until the match can't get longer
+    def match_token(self) -> re.Match:
+        reader = self.chars
+        reader.join()
+        match = TOKEN_PATTERN.match(reader.buffer, self.pointer - reader.base)
+        # the buffer is doubled each time, so a long token is matched again only a few times
+        while match.end() >= len(reader.buffer) and reader.fill(len(reader.buffer)):
+            reader.join()
+            match = TOKEN_PATTERN.match(reader.buffer, self.pointer - reader.base)
+        return match
+
+    # the line number which Lexer.get_next_token would give to a token starting at start
+    def get_lineno(self, start: int, kind: Optional[str], lexeme: str) -> int:
+        if not self.restarted or start > self.pointer:
+            return self.chars.line_at(start)
+        # the DFA checks the line of the second character, unless the first one has already ended the token
+        if kind in {'symbol', 'invalid_input', None} and len(lexeme) < 2:
+            return self.lineno
+        c = self.chars.char_at(start + 1)
+        return self.chars.line_at(start + 1) if c not in self.spaces else self.lineno
+
+    # this function returns the next token recognized by the lexer
+    def get_next_token(self) -> Tuple[str, str, int]:
+        reader = self.chars
+        if self.finished:
+            return '$$', '', reader.line_at(self.pointer)
+        reader.release(self.pointer)
+        match = self.match_token()
+        kind = match.lastgroup
+        start = reader.base + match.end('spaces')
+        if kind == 'spaces':    # there is nothing but whitespace left
+            self.lineno = self.get_lineno(start, None, '')
+            self.pointer = start
+            self.finished = True
+            return '$$', '', self.lineno
+        lexeme = match.group(kind)
+        if self.restarted:
+            self.lineno = self.get_lineno(start, kind, lexeme)
+        else:       # the usual case, the token line is the line of its first character
+            reader.move_line_cursor(start)
+            self.lineno = reader.line
+        self.pointer = reader.base + match.end()
+        self.restarted = kind in ERRORS
+        token = TOKEN_TYPES[kind] if kind != 'id' else self.DFA.keyword_id_token(lexeme)
+        if match.end() == len(reader.buffer):     # match_token only stops at the end of the buffer on EOF
+            # these tokens consume the EOF, like a line comment which has no newline at its end
+            if kind in {'num', 'id', 'unclosed_comment'} or (lexeme.startswith('//') and not lexeme.endswith('\n')):
+                self.finished = True
+            elif kind == 'lone_symbol':     # the DFA loses the symbol when it backtracks from EOF
+                lexeme = ''
+        if kind == 'unclosed_comment' and len(lexeme) >= 7:
+            lexeme = lexeme[:7] + '...'
+        return token, lexeme, self.lineno
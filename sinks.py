@@ -0,0 +1,97 @@
+from typing import List, Optional, TextIO
+
+BUFFER_SIZE = 1024      # records which a stream sink keeps before it writes them at once
+
+
+# a writer of records (the syntax errors or the lines of the code), this one only counts them
+# a sink with a limit counts the records over the limit but drops them
+class Sink:
+
+    def __init__(self, limit: Optional[int] = None) -> None:
+        self.count = 0              # number of the records, the dropped ones too
+        self.limit = limit          # number of the records which are kept (None means all of them)
+
+    def get_dropped(self) -> int:
+        return self.count - self.limit if self.limit is not None and self.count > self.limit else 0
+
+    def write(self, record: str) -> None:
+        self.count += 1
+        if self.limit is None or self.count <= self.limit:
+            self.emit(record)
+
+    def emit(self, record: str) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> 'Sink':
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+
+# keeps the records in a list, the parser collects its syntax errors in one by default
+class CollectorSink(Sink):
+
+    def __init__(self, limit: Optional[int] = None) -> None:
+        super().__init__(limit)
+        self.records: List[str] = []
+
+    def emit(self, record: str) -> None:
+        self.records.append(record)
+
+
+# writes the records to a text stream, the records are joined by separator and end is written after the last one
+# empty is written if there is no record at all, and a note about the dropped records is the last record
+class StreamSink(Sink):
+
+    def __init__(self, stream: TextIO, separator: str = '\n', end: str = '\n', empty: str = '',
+                 limit: Optional[int] = None, dropped_note: str = '{} more records are not written') -> None:
+        super().__init__(limit)
+        self.stream = stream
+        self.separator = separator
+        self.end = end
+        self.empty = empty
+        self.dropped_note = dropped_note
+        self.buffer: List[str] = []     # records which are not written yet
+        self.written = 0                # records which are already written
+        self.closed = False
+
+    def emit(self, record: str) -> None:
+        self.buffer.append(record)
+        if len(self.buffer) >= BUFFER_SIZE:
+            self.flush()
+
+    # writes the buffered records with a single write
+    def flush(self) -> None:
+        if self.buffer:
+            self.stream.write((self.separator if self.written else '') + self.separator.join(self.buffer))
+            self.written += len(self.buffer)
+            self.buffer.clear()
+
+    # writes the rest of the records, a sink is closed once
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        if self.get_dropped():
+            self.buffer.append(self.dropped_note.format(self.get_dropped()))
+        self.flush()
+        self.stream.write(self.end if self.written else self.empty)
+        self.stream.flush()
+
+
+# a stream sink of a file, the file is opened by the sink and closed with it
+class FileSink(StreamSink):
+
+    def __init__(self, file_name: str, separator: str = '\n', end: str = '\n', empty: str = '',
+                 limit: Optional[int] = None, dropped_note: str = '{} more records are not written',
+                 encoding: Optional[str] = None) -> None:
+        super().__init__(open(file_name, 'w', encoding=encoding), separator, end, empty, limit, dropped_note)
+
+    def close(self) -> None:
+        super().close()
+        self.stream.close()
+
@@ -0,0 +1,113 @@
+from sys import intern
+from typing import List, Dict, Optional
+
+KEYWORDS = frozenset({'if', 'else', 'void', 'int', 'while', 'break', 'switch', 'default', 'case', 'return', 'endif',
+                      'output'})
+FIRST_ADDRESS = 100     # address of the first variable
+ARRAY_BASE = 1 << 40    # first address of the arrays until the allocator lays them out after the variables
+WORD_SIZE = 4           # every variable (and every element of an array) takes a word
+
+
+# checks if an identifier is a keyword
+def is_keyword(lexeme: str) -> bool:
+    return lexeme in KEYWORDS
+
+
+# the token type of a lexeme which looks like an identifier
+def get_keyword_id_token(lexeme: str) -> str:
+    return 'KEYWORD' if lexeme in KEYWORDS else 'ID'
+
+
+class Symbol:
+    __slots__ = 'name', 'kind', 'address', 'size', 'type'
+
+    def __init__(self, name: str, kind: str, address: int, size: int, type_name: str) -> None:
+        self.name = name            # interned name of the symbol
+        self.kind = kind            # 'variable', 'array', 'param', 'reference' (an array param) or 'function'
+        self.address = address      # address of the symbol (the first element of an array)
+        self.size = size            # number of words of the symbol
+        self.type = type_name       # 'int' or 'void'
+
+    def __repr__(self) -> str:
+        return f'Symbol({self.name!r}, {self.kind!r}, {self.address}, {self.size}, {self.type!r})'
+
+
+# a stack of scopes, a name is looked up from the innermost scope to the global one
+# every symbol gets its own address, so the symbols of two scopes never share their memory
+# the arrays have a region of their own, far above the variables, so the variables stay next to each other
+class SymbolTable:
+
+    def __init__(self, first_address: int = FIRST_ADDRESS, first_array: int = ARRAY_BASE) -> None:
+        self.scopes: List[Dict[str, Symbol]] = [{}]    # the global scope is always at the bottom
+        self.next_address = first_address               # first free address of the variables
+        self.first_array = first_array                  # first address of the arrays
+        self.next_array = first_array                   # first free address of the arrays
+        self.addresses: Dict[int, Symbol] = {}          # the symbol of each address, of all the scopes
+
+    def get_depth(self) -> int:
+        return len(self.scopes) - 1
+
+    def enter_scope(self) -> None:
+        self.scopes.append({})
+
+    # leaves the innermost scope, the global scope is never left (the panic mode may skip a scope entry)
+    def exit_scope(self) -> None:
+        if len(self.scopes) > 1:
+            self.scopes.pop()
+
+    # adds a symbol to the innermost scope (or to the global one), a symbol of an outer scope with the same name
+    # is shadowed
+    def declare(self, name: str, kind: str = 'variable', type_name: str = 'int', is_global: bool = False) -> Symbol:
+        name = intern(name)
+        symbol = Symbol(name, kind, self.next_address, 1, type_name)
+        self.next_address += WORD_SIZE
+        self.scopes[0 if is_global else -1][name] = symbol
+        self.addresses[symbol.address] = symbol
+        return symbol
+
+    # words which no symbol has (like the return address of a function), returns the address of the first one
+    def reserve(self, size: int = 1) -> int:
+        self.next_address += WORD_SIZE * size
+        return self.next_address - WORD_SIZE * size
+
+    def lookup(self, name: str) -> Optional[Symbol]:
+        for scope in reversed(self.scopes):
+            symbol = scope.get(name)
+            if symbol is not None:
+                return symbol
+        return None
+
+    def get_symbol_at(self, address: int) -> Optional[Symbol]:
+        return self.addresses.get(address)
+
+    # the address of a name, a name which is never declared becomes a global variable
+    def get_address(self, name: str) -> int:
+        symbol = self.lookup(name)
+        if symbol is None:
+            symbol = self.declare(name, is_global=True)
+        return symbol.address
+
+    # makes a symbol an array, it's moved to the end of the arrays unless it's already the last array
+    # (a variable which has just been declared gives its word back)
+    def set_size(self, symbol: Symbol, size: int) -> None:
+        size = max(size, 1)
+        if symbol.kind == 'array' and symbol.address + WORD_SIZE * symbol.size == self.next_array:
+            self.next_array += WORD_SIZE * (size - symbol.size)
+        else:
+            if self.addresses.get(symbol.address) is symbol:
+                del self.addresses[symbol.address]
+            if symbol.kind != 'array' and symbol.address + WORD_SIZE == self.next_address:
+                self.next_address = symbol.address
+            symbol.address = self.next_array
+            self.next_array += WORD_SIZE * size
+            self.addresses[symbol.address] = symbol
+        symbol.kind = 'array'
+        symbol.size = size
+
+    # the first address after all the variables
+    def get_data_end(self) -> int:
+        return self.next_address
+
+    # the addresses of all the arrays
+    def get_arrays(self) -> range:
+        return range(self.first_array, self.next_array, WORD_SIZE)
@@ -0,0 +1,47 @@
+from compiler import compile_source_text
+from symbol_table import ARRAY_BASE
+from vm import VM
+
+MAX_STEPS = 100000
+
+
+def run(source: str, optimized: bool) -> list:
+    return VM(compile_source_text(source, optimized=optimized).program_block, MAX_STEPS).run()
+
+
+# the variables are next to each other, the arrays are after them and the temps after the arrays in every build
+def test_layout():
+    source = ('int x; int a[3]; int y; void main(void) { int b[2]; x = 1; a[2] = x + 1; y = a[2]; b[1] = y; '
+              'output(b[1]); }')
+    result = compile_source_text(source)
+    # x, y and main are at 100, 104 and 108, then a at 112 and b at 124, and the temps start at 132
+    assert result.instructions[:4] == [('ASSIGN', '#1', '100', None), ('MULT', '#2', '#4', '132'),
+                                       ('ADD', '#112', '132', '132'), ('ADD', '100', '#1', '136')]
+    assert result.instructions[9] == ('ADD', '#124', '132', '132')
+    assert result.memory_end == 140
+    assert VM(result.program_block).run() == [2]
+    result = compile_source_text(source, optimized=True)
+    assert result.memory_end == 132 and VM(result.program_block).run() == [2]
+
+
+# the temps reuse their addresses after the data, also without -O
+def test_temps_after_the_data():
+    result = compile_source_text('void main(void) { int a; a = 1 + 2; a = a * 3 + a * 4; output(a - 1); }')
+    assert {line[3] for line in result.instructions if line[0] in {'ADD', 'SUB', 'MULT'}} == {'108', '112'}
+    assert result.memory_end == 116
+    assert VM(result.program_block).run() == [20]
+
+
+# the local arrays of a recursive function are in its frame, they are pushed and popped with its variables
+def test_recursion_with_arrays():
+    source = ('int f(int n) { int a[3]; int big[10]; int k; k = 0; while (k < 10) { big[k] = n; k = k + 1; } '
+              'if (n == 0) { return 0; } else { a[0] = n; a[2] = n * 10; a[1] = f(n - 1); '
+              'return a[0] + a[1] + a[2] + big[9]; } endif } '
+              'void main(void) { int g[2]; g[1] = f(5); output(g[1]); }')
+    assert run(source, False) == run(source, True) == [180]
+
+
+# a literal is never taken for the address of an array
+def test_literal_at_the_array_region():
+    source = f'int a[2]; void main(void) {{ a[1] = 3; output({ARRAY_BASE}); output({ARRAY_BASE + 4}); output(a[1]); }}'
+    assert run(source, False) == run(source, True) == [ARRAY_BASE, ARRAY_BASE + 4, 3]
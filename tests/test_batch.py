@@ -0,0 +1,72 @@
+import os
+import time
+
+import batch
+from batch import collect_files, compile_file, compile_files, get_output_dir
+
+SOURCES = {'a.txt': 'void main(void) { output(1); }', 'sub/a.txt': 'void main(void) { output(2) }',
+           'sub/b.cm': 'int x;'}
+
+
+def write_sources(directory) -> None:
+    for name, source in SOURCES.items():
+        os.makedirs(os.path.dirname(os.path.join(directory, name)), exist_ok=True)
+        with open(os.path.join(directory, name), 'w') as file:
+            file.write(source)
+
+
+def read(file_name: str) -> str:
+    with open(file_name) as file:
+        return file.read()
+
+
+# each input keeps its path under the output directory, so files of the same name don't share their outputs
+def test_output_dirs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert get_output_dir('a.txt', 'build') == os.path.join('build', 'a')
+    assert get_output_dir(os.path.join('sub', 'a.txt'), 'build') == os.path.join('build', 'sub', 'a')
+    outside = os.path.join(os.path.dirname(str(tmp_path)), 'c.txt')
+    assert get_output_dir(outside, 'build') == os.path.join('build', os.path.splitext(outside)[0].lstrip(os.sep))
+
+
+def test_collect_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_sources('src')
+    assert collect_files(['src'], '.txt') == [os.path.join('src', 'a.txt'), os.path.join('src', 'sub', 'a.txt')]
+    assert collect_files([os.path.join('src', 'sub', 'b.cm')], '.txt') == [os.path.join('src', 'sub', 'b.cm')]
+
+
+# the processes write the outputs of a single process, and the results are in the order of the files
+def test_parallel(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_sources('src')
+    files = collect_files(['src'], '.txt')
+    results = compile_files(files, 'one', tree=True, jobs=1)
+    assert [result[0] for result in compile_files(files, 'many', tree=True, jobs=2)] == files
+    assert results[0][3] == 0 and results[1][3] > 0 and all(result[4] is None for result in results)
+    for name in ['a', os.path.join('sub', 'a')]:
+        for output in ['output.txt', 'syntax_errors.txt', 'parse_tree.txt']:
+            assert read(os.path.join('one', 'src', name, output)) == read(os.path.join('many', 'src', name, output))
+    assert read(os.path.join('one', 'src', 'a', 'syntax_errors.txt')) == 'There is no syntax error.'
+
+
+# a file which takes too long is a failure of its own, the next files are still compiled
+def test_timeout(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_sources('src')
+
+    class SlowParser(batch.Parser):
+        def get_parse_tree(self):
+            time.sleep(5)
+
+    monkeypatch.setattr(batch, 'Parser', SlowParser)
+    result = compile_file(os.path.join('src', 'a.txt'), 'build', tree=False, timeout=0.1)
+    assert result[4] == 'TimeoutError: compilation timed out' and result[1] < 5
+    monkeypatch.undo()
+    monkeypatch.chdir(tmp_path)
+    assert compile_file(os.path.join('src', 'a.txt'), 'build', tree=False, timeout=5)[4] is None
+
+
+def test_missing_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert compile_file('missing.txt', 'build', tree=False)[4].startswith('FileNotFoundError')
@@ -0,0 +1,28 @@
+from compiler import compile_source_text
+from vm import VM
+
+MAX_STEPS = 100000
+
+
+def run(source: str, optimized: bool = False) -> list:
+    return VM(compile_source_text(source, optimized=optimized).program_block, MAX_STEPS).run()
+
+
+# a switch ends its break scope, so a break of the loop around it jumps out of the loop
+def test_break_after_switch():
+    source = ('void main(void){ int i; i = 0; while (i < 5) { i = i + 1; if (i == 3) { break; } else { i = i; } endif '
+              'switch (i) { case 1: output(100); break; default: output(i); } } output(i * 10); }')
+    assert run(source) == run(source, True) == [100, 2, 30]
+
+
+# after a syntax error the actions which fail on the stack of the panic mode are skipped, the others still run
+def test_syntax_errors():
+    for source in ['void main(void){ int a; while (a < ) { a = a + 1; } output(a); }',
+                   'void main(void){ int a; while ( { break; } output(a); }',
+                   'int f(int a) { return a + ; } void main(void){ output(f(1)); }']:
+        result = compile_source_text(source, want_tree=True)
+        assert result.error_count > 0
+        assert result.get_syntax_errors_text().startswith('#1 : syntax error')
+    source = 'void main(void){ int a; a = 2; output(a) output(a + 1); }'
+    instructions = list(compile_source_text(source).program_block.instructions())
+    assert instructions == [('ASSIGN', '#2', '104', None), ('ADD', '104', '#1', '108'), ('PRINT', '108', None, None)]
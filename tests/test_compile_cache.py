@@ -0,0 +1,64 @@
+import os
+
+from batch import compile_file
+from compile_cache import CompileCache
+
+ENTRY = ([('PRINT', '#1', None, None)], [], None)
+
+
+def test_put_get(tmp_path):
+    cache = CompileCache(str(tmp_path))
+    key = cache.get_key(b'void main(void) {}')
+    assert cache.get(key) is None
+    cache.put(key, ENTRY)
+    assert cache.get(key) == ENTRY
+    assert cache.get_key(b'void main(void) {}', 'O') != key and cache.get_key(b'int x;') != key
+
+
+# the least recently used entries are removed first, a get counts as a use
+def test_evict(tmp_path):
+    cache = CompileCache(str(tmp_path))
+    for i, key in enumerate(['a', 'b', 'c']):
+        cache.put(key, ENTRY)
+        os.utime(cache.get_entry_file(key), (i, i))
+    size = sum(entry[1] for entry in cache.get_entries())
+    assert cache.get('a') == ENTRY
+    cache.max_size = size * 2 // 3
+    assert cache.evict() == 1
+    assert cache.get('b') is None and cache.get('a') == ENTRY and cache.get('c') == ENTRY
+    cache.max_size = size
+    assert cache.evict() == 0
+
+
+def test_clear_and_stats(tmp_path):
+    cache = CompileCache(str(tmp_path))
+    cache.put('a', ENTRY)
+    cache.record(3, 1, 2)
+    stats = cache.get_stats()
+    assert (stats['hits'], stats['misses'], stats['evictions'], stats['entries']) == (3, 1, 2, 1)
+    assert stats['hit_rate'] == 0.75
+    cache.clear()
+    assert cache.get('a') is None and cache.get_stats()['entries'] == 0 and cache.get_stats()['hits'] == 0
+
+
+# a broken entry is a miss
+def test_broken_entry(tmp_path):
+    cache = CompileCache(str(tmp_path))
+    with open(cache.get_entry_file('a'), 'wb') as file:
+        file.write(b'broken')
+    assert cache.get('a') is None
+
+
+# the second build of an unchanged file is taken from the cache and writes the same outputs
+def test_cached_build(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with open('a.txt', 'w') as file:
+        file.write('void main(void) { int a; a = 2; output(a); }')
+    outputs = []
+    for build in ['first', 'second']:
+        result = compile_file('a.txt', build, tree=True, cache_dir='cache')
+        assert result[5] == (build == 'second')
+        with open(os.path.join(build, 'a', 'output.txt')) as output, \
+                open(os.path.join(build, 'a', 'parse_tree.txt'), encoding='utf-8') as tree:
+            outputs.append((output.read(), tree.read()))
+    assert outputs[0] == outputs[1]
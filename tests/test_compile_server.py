@@ -0,0 +1,93 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+import compile_server
+from compile_server import CompileServer, compile_on_server, get_versions, send_request
+from compiler import compile_source_text
+
+SERVER = compile_server.__file__
+SOURCE = 'void main(void) { int a; a = 2; output(a * 3); }'
+ERROR_SOURCE = 'void main(void) { int a; a = 1 + ; output(a) }'
+
+pytestmark = pytest.mark.skipif(not hasattr(compile_server.socket, 'AF_UNIX'), reason='no unix sockets')
+
+
+# a server on a socket of its own, stopped after the test
+@pytest.fixture
+def server(tmp_path):
+    socket_path = str(tmp_path / 'server.sock')
+    process = subprocess.Popen([sys.executable, SERVER, '-s', socket_path, '-j', '1', 'serve'],
+                               stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while send_request({'op': 'status'}, socket_path) is None:
+        assert process.poll() is None and time.monotonic() < deadline
+        time.sleep(0.05)
+    yield socket_path
+    send_request({'op': 'stop'}, socket_path)
+    process.wait(30)
+
+
+def read(file_name: str) -> str:
+    with open(file_name, encoding='utf-8') as file:
+        return file.read()
+
+
+# the server writes the files which a local compile writes
+def test_round_trip(server, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for source in [SOURCE, ERROR_SOURCE]:
+        with open('input.txt', 'w') as file:
+            file.write(source)
+        assert compile_on_server(socket_path=server)
+        result = compile_source_text(source, want_tree=True)
+        assert read('output.txt') == result.get_output_text()
+        assert read('syntax_errors.txt') == result.get_syntax_errors_text()
+        assert read('parse_tree.txt') == result.get_parse_tree_text()
+    status = send_request({'op': 'status'}, server)
+    assert status['compiles'] == 2 and status['versions'] == get_versions()
+
+
+# a client of other compiler sources or of another table is refused, and compiles the file itself
+def test_version_mismatch(server, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with open('input.txt', 'w') as file:
+        file.write(SOURCE)
+    for key in ['compiler', 'table']:
+        versions = dict(get_versions(), **{key: 'other'})
+        response = send_request({'op': 'compile', 'source': SOURCE, 'versions': versions}, server)
+        assert response['mismatch'] and 'output' not in response
+        monkeypatch.setattr(compile_server, 'get_versions', lambda: versions)
+        assert not compile_on_server(socket_path=server) and not os.path.exists('output.txt')
+    assert send_request({'op': 'compile', 'source': SOURCE}, server)['mismatch']
+    assert send_request({'op': 'status'}, server)['compiles'] == 0
+
+
+# a compile which kills its worker (like one which runs out of memory)
+def kill_worker(*_) -> dict:
+    os._exit(1)
+
+
+# only the compile of a dead worker fails, a new pool compiles the next ones
+def test_broken_pool(monkeypatch):
+    async def run() -> tuple:
+        server = CompileServer('', jobs=1)
+        server.loop = asyncio.get_running_loop()
+        server.executor = server.new_executor()
+        try:
+            request = {'source': SOURCE, 'tree': True}
+            monkeypatch.setattr(compile_server, 'compile_source', kill_worker)
+            broken = server.executor
+            failed = await server.compile(request)
+            monkeypatch.undo()
+            return failed, server.executor is not broken, await server.compile(request)
+        finally:
+            server.executor.shutdown()
+
+    failed, replaced, response = asyncio.run(run())
+    assert failed['error'].startswith('the worker of the compile died') and replaced
+    assert response['error'] is None and response['output'] == compile_source_text(SOURCE).get_output_text()
@@ -0,0 +1,55 @@
+import os
+import subprocess
+import sys
+
+import compiler
+from compiler import compile_source_text
+
+SOURCE = 'int x;\nvoid main(void) {\n    int a[2];\n    x = 4; a[1] = x * 2;\n    output(a[1] + x);\n}\n'
+ERROR_SOURCE = 'void main(void) { int a; a = 1 + ; output(a) }'
+
+
+def read(file_name: str) -> str:
+    with open(file_name, encoding='utf-8') as file:
+        return file.read()
+
+
+# the texts of a compile are the files which compiler.py writes for the same input
+def test_files(tmp_path):
+    for source in [SOURCE, ERROR_SOURCE]:
+        with open(tmp_path / 'input.txt', 'w') as file:
+            file.write(source)
+        subprocess.run([sys.executable, compiler.__file__, '--local'], cwd=tmp_path, check=True)
+        result = compile_source_text(source, want_tree=True)
+        assert result.get_output_text() == read(tmp_path / 'output.txt')
+        assert result.get_syntax_errors_text() == read(tmp_path / 'syntax_errors.txt')
+        assert result.get_parse_tree_text() == read(tmp_path / 'parse_tree.txt')
+        assert result.instructions == list(result.program_block.instructions())
+
+
+# a bytes source is decoded and its newlines are translated like the lines of a text file
+def test_source_types():
+    result = compile_source_text(SOURCE, want_tree=True)
+    for source in [SOURCE.encode(), SOURCE.replace('\n', '\r\n'), SOURCE.replace('\n', '\r\n').encode()]:
+        other = compile_source_text(source, want_tree=True)
+        assert other.instructions == result.instructions
+        assert other.get_parse_tree_text() == result.get_parse_tree_text()
+
+
+def test_options():
+    result = compile_source_text(SOURCE)
+    assert result.parse_tree is None and result.get_parse_tree_text() is None
+    assert result.syntax_errors == [] and result.error_count == 0 and result.memory_end > 0
+    assert result.get_syntax_errors_text() == 'There is no syntax error.'
+    optimized = compile_source_text(SOURCE, optimized=True)
+    assert len(optimized.instructions) < len(result.instructions)
+    errors = compile_source_text(ERROR_SOURCE)
+    limited = compile_source_text(ERROR_SOURCE, max_errors=1)
+    assert limited.syntax_errors == errors.syntax_errors[:1] and limited.error_count == errors.error_count > 1
+
+
+# a compile doesn't write any file
+def test_no_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    compile_source_text(ERROR_SOURCE, want_tree=True, optimized=True)
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,45 @@
+import io
+import string
+
+from dfa import DFA, CompiledDFA
+from lexer import Lexer
+
+CHARACTERS = list(string.printable) + ['$$', 'é']
+SOURCES = ['int a[10];\nvoid main(void) { a[1] = 2 * 3; if (a == b) return; else x = 1 < 2; }',
+           '/* a comment */ a /* an unclosed comment',
+           '12ab 3$ @ a=b==c ==* */ /*/ // a line comment\nx', '*/', 'a/', '']
+
+
+# every cell of the compiled table is the transition of the reference DFA
+# the compiled DFA gives the token of a goal right away, unless it depends on the lexeme (keywords and ids)
+# the last state is the EOF goal, which has no transitions since the lexer never reads after it
+def test_transitions():
+    for state in range(len(DFA().states) - 1):
+        for c in CHARACTERS:
+            reference, compiled = DFA(), CompiledDFA()
+            reference.current_state = compiled.current_state = state
+            token, back, reset = reference.change_state(c)
+            if token is None and compiled.change_state(c)[0] is not None:
+                token = reference.get_goal_token('')
+            compiled.current_state = state
+            assert compiled.change_state(c) == (token, back, reset), (state, c)
+            assert compiled.current_state == reference.current_state, (state, c)
+
+
+def get_tokens(source: str, dfa: DFA) -> list:
+    lexer = Lexer(io.StringIO(source), dfa)
+    tokens = [lexer.get_next_token()]
+    while tokens[-1][0] != '$$':
+        tokens.append(lexer.get_next_token())
+    return tokens
+
+
+def test_tokens():
+    for source in SOURCES:
+        assert get_tokens(source, CompiledDFA()) == get_tokens(source, DFA()), source
+
+
+# a line comment at the end of the input is followed by EOF (the lexer used to read past the end after it)
+def test_line_comment_at_eof():
+    for dfa in [DFA(), CompiledDFA()]:
+        assert get_tokens('a //', dfa) == [('ID', 'a', 0), ('COMMENT', '//', 0), ('$$', '', 1)]
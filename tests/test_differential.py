@@ -0,0 +1,11 @@
+from differential_check import check_table, check_lexers, check_trees, generate_sources
+
+
+def test_parse_table():
+    assert check_table() == []
+
+
+# a few small generated programs of every shape, differential_check.py checks more and larger ones
+def test_generated_sources():
+    for name, source in generate_sources(3, 0):
+        assert check_lexers(source) + check_trees(source) == [], name
@@ -0,0 +1,71 @@
+import io
+
+from dfa import DFA
+from lexer import Lexer, SourceReader
+
+SOURCE = 'int a[10];\n/* a comment\n over two lines */ void main(void) {\n\ta = 12 + b3; // the end\n}'
+
+
+def get_tokens(lexer: Lexer) -> list:
+    tokens = [lexer.get_next_token()]
+    while tokens[-1][0] != '$$':
+        tokens.append(lexer.get_next_token())
+    return tokens
+
+
+# the lexemes which are split between small chunks give the tokens of the whole input
+def test_chunks():
+    expected = get_tokens(Lexer(io.StringIO(SOURCE), DFA()))
+    for chunk_size in range(1, 8):
+        lexer = Lexer(io.StringIO(SOURCE))
+        lexer.chars.chunk_size = chunk_size
+        assert get_tokens(lexer) == expected
+
+
+# a lexeme longer than many chunks is joined once when it is sliced, not on every chunk
+def test_long_lexeme():
+    comment = '/*' + 'x' * 1000 + '*/'
+    lexer = Lexer(io.StringIO(comment + ' a'))
+    lexer.chars.chunk_size = 10
+    joins = []
+    join = lexer.chars.join
+    lexer.chars.join = lambda: (joins.append(len(lexer.chars.chunks)), join())[1]
+    assert lexer.get_next_token()[:2] == ('COMMENT', comment)
+    assert max(joins) >= 100 and sum(1 for chunks in joins if chunks) <= 2
+    assert lexer.get_next_token()[:2] == ('ID', 'a')
+
+
+# the EOF token is on the line after the last one, a newline at the end of the input doesn't add a line
+def test_eof_line():
+    assert get_tokens(Lexer(io.StringIO('a\nb')))[-2:] == [('ID', 'b', 1), ('$$', '', 2)]
+    assert get_tokens(Lexer(io.StringIO('a\nb\n')))[-2:] == [('ID', 'b', 1), ('$$', '', 2)]
+    assert get_tokens(Lexer(io.StringIO('')))[-1][0] == '$$'
+
+
+def test_release():
+    reader = SourceReader(io.StringIO('abcdefghij'), chunk_size=2)
+    assert reader.char_at(5) == 'f' and reader.buffer == ''
+    reader.release(4)
+    assert reader.base == 4 and reader.slice(4, 6) == 'ef' and reader.line_at(9) == 0
+    assert reader.char_at(10) == '$$'
+
+
+# the lexemes after the DFA gives characters back, the lexemes of the errors and the truncated unclosed comment
+def test_lexemes():
+    assert get_tokens(Lexer(io.StringIO('a==b=c 12ab /* abcdefghijk\n'))) == [
+        ('ID', 'a', 0), ('SYMBOL', '==', 0), ('ID', 'b', 0), ('SYMBOL', '=', 0), ('ID', 'c', 0),
+        ('Invalid number', '12a', 0), ('ID', 'b', 0), ('Unclosed comment', '/* abcd...', 0), ('$$', '', 1)]
+    assert get_tokens(Lexer(io.StringIO('x = 3; a* / */ b! //c\n/'))) == [
+        ('ID', 'x', 0), ('SYMBOL', '=', 0), ('NUM', '3', 0), ('SYMBOL', ';', 0), ('ID', 'a', 0), ('SYMBOL', '*', 0),
+        ('SYMBOL', '/', 0), ('Unmatched comment', '*/', 0), ('Invalid input', 'b!', 0), ('COMMENT', '//c\n', 0),
+        ('SYMBOL', '', 1), ('$$', '', 2)]
+
+
+# each lexeme is sliced once from the buffer, when its token is returned
+def test_one_slice_per_token():
+    lexer = Lexer(io.StringIO('int abc = 12 /* a comment */;'))
+    slices = []
+    slice_chars = lexer.chars.slice
+    lexer.chars.slice = lambda start, end: (slices.append(start), slice_chars(start, end))[1]
+    tokens = get_tokens(lexer)
+    assert len(slices) == len(tokens)
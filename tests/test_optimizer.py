@@ -0,0 +1,40 @@
+import pytest
+
+from compiler import compile_source_text
+from optimizer import UnknownCode, parse_operand
+from vm import VM
+
+MAX_STEPS = 100000
+
+
+# the printed values of a source, compiled with or without the optimizer
+def run(source: str, optimized: bool) -> list:
+    return VM(compile_source_text(source, optimized=optimized).program_block, MAX_STEPS).run()
+
+
+# the break of a loop jumps to a jump which the jump back of the loop passes on its way
+def test_break_of_a_constant_loop():
+    source = 'void main ( void ) { while ( 27 < 56 ) break ; output(7); }'
+    assert run(source, False) == [7]
+    assert run(source, True) == [7]
+
+
+# a folded value which doesn't fit in a packed operand is left to the runtime
+def test_folding_keeps_a_large_product():
+    source = 'void main(void){ output(100000 * 100000 * 100000 * 100000); }'
+    instructions = list(compile_source_text(source, optimized=True).program_block.instructions())
+    assert [op for op, *_ in instructions] == ['MULT', 'PRINT']
+    assert instructions[0][1] == '#1000000000000000'
+
+
+# a folded constant may be negative, only an immediate can be
+def test_negative_immediate():
+    assert parse_operand('#-4') == ('#', -4)
+    assert parse_operand('@4') == ('@', 4) and parse_operand(4) == ('', 4)
+    for operand in ['@-4', '-4', '#-', '#4a']:
+        with pytest.raises(UnknownCode):
+            parse_operand(operand)
+    source = 'void main(void) { int a; a = 0 - 4; output(a * 2); output(a - 3); }'
+    assert run(source, False) == run(source, True) == [-8, -7]
+    instructions = list(compile_source_text(source, optimized=True).program_block.instructions())
+    assert [x for op, x, *_ in instructions if op == 'PRINT'] == ['#-8', '#-7']
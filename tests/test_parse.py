@@ -0,0 +1,45 @@
+import io
+
+from parse import Parser
+
+# the samples which made the panic mode run forever at $: an unclosed comment, and a stray symbol after the program
+UNCLOSED_COMMENT = 'int x;\nvoid main(void){x=1;/*abc'
+STRAY_SYMBOLS = ['void main(void){int a; a = 1;}\n*', 'void main(void){int a; a = 1;}\n/',
+                 'void main(void){int a; a = 1;}\n=']
+
+UNCLOSED_COMMENT_ERRORS = ['#3 : syntax error , illegal ', 'syntax error , discarded (SYMBOL, ;) from stack',
+                           'syntax error , discarded expression from stack',
+                           '#3 : syntax error , missing compound_stmt',
+                           '#3 : syntax error , illegal ', 'syntax error , discarded compound_stmt from stack',
+                           '#3 : syntax error , missing compound_stmt', '#3 : syntax error , Unexpected EOF']
+STRAY_SYMBOL_ERRORS = ['#2 : syntax error , illegal ', 'syntax error , discarded (SYMBOL, }) from stack',
+                       '#3 : syntax error , missing compound_stmt', '#3 : syntax error , illegal ',
+                       'syntax error , discarded compound_stmt from stack', '#3 : syntax error , missing compound_stmt',
+                       '#3 : syntax error , Unexpected EOF']
+
+
+def parse(source: str) -> Parser:
+    parser = Parser(io.StringIO(source), tree='node')
+    parser.get_parse_tree()
+    return parser
+
+
+# a panic mode at $ may change the stack and be followed by another one, but when one starts again with a stack
+# which has been seen at $ the parsing halts
+def test_eof_recoveries():
+    samples = [(source, STRAY_SYMBOL_ERRORS) for source in STRAY_SYMBOLS]
+    for source, errors in [(UNCLOSED_COMMENT, UNCLOSED_COMMENT_ERRORS)] + samples:
+        parser = parse(source)
+        assert parser.get_syntax_errors() == errors
+        assert parser.eof_recoveries and not parser.has_parse_tree
+    assert len(parse(UNCLOSED_COMMENT).eof_recoveries) == 2
+
+
+# an error before the end recovers as before (the errors of the parser before the recovery tables)
+def test_recovery():
+    parser = parse('void main(void){int a; a = 1 + ; output(a);}')
+    assert parser.get_syntax_errors() == ['#1 : syntax error , illegal ;',
+                                          'syntax error , discarded (SYMBOL, +) from stack',
+                                          '#1 : syntax error , discarded output from input',
+                                          '#1 : syntax error , missing addop']
+    assert not parser.eof_recoveries and parser.has_parse_tree
@@ -0,0 +1,162 @@
+import json
+import os
+import random
+import shutil
+
+import pytest
+
+import parse_table
+from parse_table import TABLE_FILE, ERROR, SHIFT, REDUCE, ACCEPT, ACTION_BITS, load_table, get_cache_file, \
+    compile_table, get_packed, pack_rows, get_default_reductions
+
+# $accept -> L $, L -> L a | epsilon
+SMALL_TABLE = {'terminals': ['$', 'a'], 'non_terminals': ['$accept', 'L'],
+               'grammar': {'0': ['$accept', '->', 'L', '$'], '1': ['L', '->', 'L', 'a'], '2': ['L', '->', 'epsilon']},
+               'first': {'$accept': ['a'], 'L': ['a']}, 'follow': {'$accept': [], 'L': ['$', 'a']},
+               'parse_table': {'0': {'$': 'reduce_2', 'a': 'reduce_2', 'L': 'goto_1'},
+                               '1': {'$': 'accept', 'a': 'shift_2'}, '2': {'$': 'reduce_1', 'a': 'reduce_1'}}}
+
+
+# the cell of a packed matrix, like the parser reads it
+def get_cell(table: dict, key: str, state: int, column: int, empty: int) -> int:
+    offsets, values, check = get_packed(table, key)
+    cell = offsets[state] + column
+    return values[cell] if check[cell] == offsets[state] else empty
+
+
+# the symbols are interned to integers and the actions are packed with their kind in the low bits
+def test_compile_table():
+    table = compile_table(json.loads(json.dumps(SMALL_TABLE)))
+    assert table['terminal_ids'] == {'$': 0, 'a': 1} and table['non_terminal_ids'] == {'$accept': 0, 'L': 1}
+    assert table['action_width'] == 3 and table['goto_width'] == 2
+    assert [get_cell(table, 'action', 1, column, ERROR) for column in range(3)] == \
+        [ACCEPT, 2 << ACTION_BITS | SHIFT, ERROR]       # the last column is for the tokens which aren't terminals
+    assert get_cell(table, 'action', 2, 1, ERROR) == 1 << ACTION_BITS | REDUCE
+    assert get_cell(table, 'goto', 0, 1, -1) == 1 and get_cell(table, 'goto', 1, 1, -1) == -1
+    assert table['rule_lhs'] == [0, 1, 1] and table['rule_length'] == [2, 2, 0]
+    assert 'parse_table' not in table and 'first' not in table
+
+
+# the compiled table of table.json has every action and goto of the json table
+def test_table_cells():
+    with open(TABLE_FILE) as file:
+        source = json.load(file)
+    table = load_table()
+    for state, row in source['parse_table'].items():
+        reduction, lookaheads = table['default_reductions'][int(state)], table['reduce_lookaheads'][int(state)]
+        for terminal, column in table['terminal_ids'].items():
+            action = get_cell(table, 'action', int(state), column, ERROR)
+            if reduction:
+                action = reduction if lookaheads >> column & 1 else ERROR
+            assert action == (parse_table.pack_action(row[terminal]) if terminal in row else ERROR)
+        for non_terminal, column in table['non_terminal_ids'].items():
+            expected = int(row[non_terminal].split('_')[1]) if non_terminal in row else -1
+            assert get_cell(table, 'goto', int(state), column, -1) == expected
+
+
+# the same rows are kept once, the dense rows are laid first and a row without cells gets an offset of its own
+def test_pack_rows():
+    matrix = [5, -1, -1,
+              -1, 6, 7,
+              5, -1, -1,
+              -1, -1, -1]
+    assert pack_rows(matrix, 3, -1) == ([3, 0, 3, 1], [-1, 6, 7, 5, -1, -1], [-1, 0, 0, 3, -1, -1])
+
+
+# every cell of a packed matrix reads back, the empty ones too
+def test_pack_random_rows():
+    generator = random.Random(0)
+    for width in [1, 2, 5, 8]:
+        matrix = [generator.choice([-1, -1, -1, generator.randrange(10)]) for _ in range(width * 20)]
+        offsets, values, check = pack_rows(matrix, width, -1)
+        assert len(set(offsets)) == len(set(tuple(matrix[i:i + width]) for i in range(0, len(matrix), width)))
+        for state, offset in enumerate(offsets):
+            row = [values[offset + column] if check[offset + column] == offset else -1 for column in range(width)]
+            assert row == matrix[state * width:(state + 1) * width]
+
+
+# only a state whose actions all reduce one rule has a default reduction, on the terminals of its actions
+def test_default_reductions():
+    reduce_1, reduce_2, shift = 1 << ACTION_BITS | REDUCE, 2 << ACTION_BITS | REDUCE, 3 << ACTION_BITS | SHIFT
+    action = [reduce_1, reduce_1, ERROR,
+              reduce_1, reduce_2, ERROR,
+              shift, ERROR, ERROR,
+              ERROR, ERROR, ERROR,
+              ERROR, ERROR, reduce_2]
+    assert get_default_reductions(action, 3) == ([reduce_1, ERROR, ERROR, ERROR, reduce_2], [0b011, 0, 0, 0, 0b100])
+
+
+# the panic mode stacks the first non-terminal by name of the state which the terminal can follow
+def test_compile_recovery():
+    table = compile_table(json.loads(json.dumps(SMALL_TABLE)))
+    assert table['has_goto'] == [1, 0, 0]
+    assert [get_cell(table, 'recovery', 0, column, -1) for column in range(3)] == [1, 1, -1]
+    assert all(get_cell(table, 'recovery', state, column, -1) == -1 for state in [1, 2] for column in range(3))
+
+
+# the recovery tables of table.json, against the scan of the json rows which the panic mode did before them
+def test_recovery_cells():
+    with open(TABLE_FILE) as file:
+        source = json.load(file)
+    table = load_table()
+    non_terminals = set(source['non_terminals'])
+    for state, row in source['parse_table'].items():
+        assert table['has_goto'][int(state)] == any(key in non_terminals for key in row)
+        for terminal, column in table['terminal_ids'].items():
+            expected = next((key for key in sorted(row) if key in non_terminals and terminal in source['follow'][key]),
+                            None)
+            assert get_cell(table, 'recovery', int(state), column, -1) == \
+                (table['non_terminal_ids'][expected] if expected else -1)
+
+
+# a copy of the table in a directory of its own, so its cache is written there
+@pytest.fixture
+def table_file(tmp_path):
+    file_name = str(tmp_path / 'table.json')
+    shutil.copy(TABLE_FILE, file_name)
+    yield file_name
+    parse_table.loaded_tables.pop(file_name, None)
+
+
+# load_table as a new process would run it, counting the times the json table is compiled
+def load_again(file_name: str, monkeypatch) -> tuple:
+    compiled = []
+    compile_table = parse_table.compile_table
+    monkeypatch.setattr(parse_table, 'compile_table', lambda table: (compiled.append(1), compile_table(table))[1])
+    parse_table.loaded_tables.pop(file_name, None)
+    return load_table(file_name), len(compiled)
+
+
+def test_cache(table_file, monkeypatch):
+    table, compiled = load_again(table_file, monkeypatch)
+    assert compiled == 1 and os.path.exists(get_cache_file(table_file))
+    assert load_table(table_file) is table      # the same process shares the loaded table
+    cached, compiled = load_again(table_file, monkeypatch)
+    assert compiled == 0 and cached['digest'] == table['digest'] and cached['action_values'] == table['action_values']
+
+
+# a touched file is hashed again but not compiled, a changed file is compiled again
+def test_invalidation(table_file, monkeypatch):
+    table, _ = load_again(table_file, monkeypatch)
+    os.utime(table_file, ns=(0, 0))
+    assert load_again(table_file, monkeypatch)[1] == 0
+    with open(table_file) as file:
+        source = json.load(file)
+    source['grammar']['0'] = source['grammar']['0'] + ['$']
+    with open(table_file, 'w') as file:
+        json.dump(source, file)
+    changed, compiled = load_again(table_file, monkeypatch)
+    assert compiled == 1 and changed['digest'] != table['digest']
+    assert changed['rule_length'][0] == table['rule_length'][0] + 1
+    assert load_again(table_file, monkeypatch)[1] == 0
+
+
+# a broken cache, or one of another format, is ignored and written again
+def test_broken_cache(table_file, monkeypatch):
+    load_again(table_file, monkeypatch)
+    with open(get_cache_file(table_file), 'wb') as file:
+        file.write(b'broken')
+    assert load_again(table_file, monkeypatch)[1] == 1
+    monkeypatch.setattr(parse_table, 'CACHE_VERSION', parse_table.CACHE_VERSION + 1)
+    assert load_again(table_file, monkeypatch)[1] == 1
+    assert load_again(table_file, monkeypatch)[1] == 0
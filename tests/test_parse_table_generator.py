@@ -0,0 +1,50 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+from parse_table import TABLE_FILE
+
+GENERATOR = os.path.join(os.path.dirname(TABLE_FILE), 'parse_table_generator.py')
+
+
+def run_generator(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, GENERATOR] + list(args), capture_output=True, text=True)
+
+
+# grammar.y gives the table of table.json
+def test_check():
+    process = run_generator('--check')
+    assert process.returncode == 0, process.stderr
+    assert process.stderr.splitlines()[-1] == f'{TABLE_FILE} is up to date'
+
+
+# a table which is up to date is written as it is, so its digest doesn't change, and a new table has every set and
+# row of table.json
+def test_regenerate(tmp_path):
+    file_name = str(tmp_path / 'table.json')
+    shutil.copy(TABLE_FILE, file_name)
+    assert run_generator('-o', file_name).returncode == 0
+    with open(TABLE_FILE, 'rb') as file, open(file_name, 'rb') as generated:
+        assert generated.read() == file.read()
+    new_file = str(tmp_path / 'new.json')
+    assert run_generator('-o', new_file).returncode == 0
+    assert run_generator('-o', new_file, '--check').returncode == 0
+    with open(TABLE_FILE) as file, open(new_file) as generated:
+        table, new = json.load(file), json.load(generated)
+    assert new['follow']['declaration_list'] == ['$', 'int', 'void']
+    assert {symbol: set(terminals) for symbol, terminals in new['follow'].items()} == \
+        {symbol: set(terminals) for symbol, terminals in table['follow'].items()}
+    assert new['parse_table'] == table['parse_table']
+
+
+# a table of another grammar is out of date
+def test_out_of_date(tmp_path):
+    file_name = str(tmp_path / 'table.json')
+    with open(TABLE_FILE) as file:
+        table = json.load(file)
+    table['parse_table']['0'].pop('int')
+    with open(file_name, 'w') as file:
+        json.dump(table, file)
+    assert run_generator('-o', file_name, '--check').returncode == 1
@@ -0,0 +1,30 @@
+import io
+
+import anytree
+
+from parse import Parser
+from parse_tree import render_tree
+
+SOURCES = ['int a[2];\nvoid main(void) { int b; b = a[1] + 2; if (b < 3) b = 1; else { output(b); } }',
+           'void main(void) { a = ; if ( ) }']      # the panic mode adds children to the nodes of the stack
+
+
+# every tree builder gives the tree which anytree.RenderTree writes
+def test_render_tree():
+    for source in SOURCES:
+        root = Parser(io.StringIO(source), tree='anytree').get_parse_tree()
+        expected = '\n'.join(f'{pre}{node.name}' for pre, _, node in anytree.RenderTree(root))
+        for tree in ['anytree', 'node', 'tuple']:
+            text = io.StringIO()
+            render_tree(Parser(io.StringIO(source), tree=tree).get_parse_tree(), text, batch_size=3)
+            assert text.getvalue() == expected, (source, tree)
+
+
+# a deep tree is rendered without recursion
+def test_deep_tree():
+    node = ('0', ())
+    for i in range(1, 5000):
+        node = (str(i), (node,))
+    text = io.StringIO()
+    render_tree(node, text)
+    assert text.getvalue().count('\n') == 4999 and text.getvalue().endswith(f'{" " * 4 * 4997}└── 0')
@@ -0,0 +1,90 @@
+import io
+import json
+import os
+import subprocess
+import sys
+
+from lexer import Lexer
+from parse import Parser
+from parse_tree import render_tree
+from profiler import Profile, instrument, count_results, phase
+
+SOURCE = 'void main(void) { int a; a = 1 + 2; output(a); }'
+ERROR_SOURCE = 'void main(void) { int a; a = 1 + ; output(a) }'
+COMPILER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'compiler.py')
+
+
+# the tree and the code of a parser, with or without a profile
+def parse(source: str, profile: Profile = None) -> tuple:
+    parser = Parser(io.StringIO(source), tree='node')
+    if profile is not None:
+        instrument(parser, profile)
+    with phase(profile, 'parse'):
+        root = parser.get_parse_tree()
+    if profile is not None:
+        count_results(parser, profile)
+    text = io.StringIO()
+    render_tree(root, text)
+    return text.getvalue(), parser.get_syntax_errors(), list(parser.code_generator.program_block.instructions())
+
+
+# the wrappers only count and time, the instrumented parser gives the results of the plain one
+def test_instrumented_parser():
+    for source in [SOURCE, ERROR_SOURCE]:
+        profile = Profile()
+        assert parse(source, profile) == parse(source)
+        assert profile.counters['characters'] == len(source)
+        assert profile.counters['tokens'] == profile.phases['lex'][2]
+        assert profile.phases['tree'][2] == profile.phases['code_gen'][2] == sum(profile.reduces.values())
+        assert profile.phases['parse'][2] == 1
+    assert 0 < profile.counters['panic recoveries'] <= profile.counters['syntax errors']
+    profile = Profile()
+    parse(SOURCE, profile)
+    lexer = Lexer(io.StringIO(SOURCE))
+    tokens = [lexer.get_next_token()]
+    while tokens[-1][0] != '$$':
+        tokens.append(lexer.get_next_token())
+    # every token is shifted (the $$ too), and the parser reads the $$ once more before it accepts
+    assert profile.counters['tokens'] == len(tokens) + 1
+    assert profile.counters['shifts'] == len(tokens) and profile.counters['panic recoveries'] == 0
+
+
+# a parser which isn't instrumented keeps its plain methods
+def test_plain_parser():
+    parser = Parser(io.StringIO(SOURCE))
+    assert not {'shift', 'reduce', 'panic_recovery'} & set(vars(parser))
+    assert 'get_next_token' not in vars(parser.lexer) and 'code_gen' not in vars(parser.code_generator)
+    with phase(None, 'parse'):
+        parser.get_parse_tree()
+
+
+def test_profile_reports():
+    profile = Profile()
+    parse(SOURCE, profile)
+    data = json.loads(profile.to_json())
+    assert set(data['phases']) == {'lex', 'tree', 'code_gen', 'parse'}
+    assert data['counters'] == profile.counters
+    assert sum(data['reduces'].values()) == profile.phases['tree'][2]
+    table = profile.to_table(top_rules=3)
+    assert table.splitlines()[0].split() == ['phase', 'wall', 'ms', 'cpu', 'ms', 'calls', 'peak', 'MB']
+    assert f'{sum(profile.reduces.values())} reductions, the most frequent rules:' in table
+    assert len(table.split('the most frequent rules:\n')[1].splitlines()) == 3
+
+
+# the compiler prints the profile to stderr and writes the outputs of a compilation without it
+def test_profile_option(tmp_path):
+    with open(tmp_path / 'input.txt', 'w') as file:
+        file.write(SOURCE)
+    outputs = []
+    for options in [['--local'], ['--profile=json'], ['--profile', '-O']]:
+        process = subprocess.run([sys.executable, COMPILER] + options, cwd=tmp_path, capture_output=True, text=True,
+                                 check=True)
+        with open(tmp_path / 'output.txt') as file:
+            outputs.append(file.read())
+        if options == ['--profile=json']:
+            profile = json.loads(process.stderr)
+            assert {'parse', 'write_tree', 'layout', 'write_code'} <= set(profile['phases'])
+            assert profile['counters']['memory end'] > 0
+        elif options == ['--profile', '-O']:
+            assert process.stderr.splitlines()[0].startswith('phase') and 'optimized instructions' in process.stderr
+    assert outputs[0] == outputs[1]
@@ -0,0 +1,37 @@
+import pytest
+
+from compiler import compile_source_text
+from program_block import ProgramBlock, PACKED_LIMIT, VIRTUAL_TEMP
+from vm import VM
+
+
+# a number which doesn't fit in a packed operand is kept as it is written
+def test_large_literal():
+    assert compile_source_text('void main(void){ output(99999999999999999999); }').get_output_text() == \
+        '0\t(PRINT, #99999999999999999999)\n'
+
+
+def test_packed_limit():
+    program_block = ProgramBlock()
+    program_block[0] = ('ASSIGN', f'#{PACKED_LIMIT - 1}', PACKED_LIMIT, None)
+    program_block[1] = ('ASSIGN', f'#{PACKED_LIMIT}', f'@{PACKED_LIMIT - 1}', None)
+    assert list(program_block) == [('ASSIGN', f'#{PACKED_LIMIT - 1}', PACKED_LIMIT, None),
+                                   ('ASSIGN', f'#{PACKED_LIMIT}', f'@{PACKED_LIMIT - 1}', None)]
+
+
+# a line at a temp address is a broken semantic stack, the block doesn't grow to it
+def test_line_at_a_temp():
+    program_block = ProgramBlock()
+    with pytest.raises(IndexError):
+        program_block[VIRTUAL_TEMP] = ('JP', 0, None, None)
+    assert len(program_block) == 0
+
+
+# the switch expression is popped, so the jump of the if is filled at its own line and the block has no empty
+# lines up to a temp address
+def test_switch_in_if():
+    source = 'void main(void){ int a; if (1 < 2) { switch (1 < 18) { case 1: a = 1; } } endif output(a); }'
+    for optimized in [False, True]:
+        program_block = compile_source_text(source, optimized=optimized).program_block
+        assert len(program_block) == sum(1 for _ in program_block.instructions())
+        assert VM(program_block).run() == [1]
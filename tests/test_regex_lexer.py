@@ -0,0 +1,30 @@
+import io
+
+from lexer import Lexer
+from regex_lexer import RegexLexer
+
+SOURCES = ['int a[10];\nvoid main(void) {\n  a[1] = 2 * 3;\n  if (a == b) return; else x = 1 < 2;\n}\n',
+           '/* a comment\n */ a /* an unclosed comment\n which is long',
+           '12ab 3$ @ a=b==c ==* */ /*/ // a line comment\nx', '\n\n  a\n  =', 'a /', 'a *',
+           'int // the end', '  \n ', '']
+
+
+def get_tokens(lexer: Lexer) -> list:
+    tokens = [lexer.get_next_token()]
+    while tokens[-1][0] != '$$':
+        tokens.append(lexer.get_next_token())
+    return tokens + [lexer.get_next_token()]
+
+
+# the regex lexer gives the tokens, the lexemes and the line numbers of the DFA lexer, also after the EOF
+def test_same_tokens():
+    for source in SOURCES:
+        assert get_tokens(RegexLexer(io.StringIO(source))) == get_tokens(Lexer(io.StringIO(source))), source
+
+
+# a token which is longer than the buffer is matched again on a larger buffer
+def test_long_token():
+    source = 'a' * 100 + ' /*' + 'x' * 1000 + '*/ 1'
+    lexer = RegexLexer(io.StringIO(source))
+    lexer.chars.chunk_size = 8
+    assert get_tokens(lexer) == get_tokens(Lexer(io.StringIO(source)))
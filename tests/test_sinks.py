@@ -0,0 +1,90 @@
+import io
+
+import pytest
+
+import sinks
+from compiler import ERROR_FORMAT, compile_source_text, get_error_sink
+from sinks import Sink, CollectorSink, StreamSink, FileSink
+
+ERROR_SOURCE = 'void main(void) { int a; a = 1 + ; output(a) }'
+
+
+# a sink with a limit counts every record but keeps only the first ones
+def test_limit():
+    sink = CollectorSink(limit=2)
+    for record in 'abcd':
+        sink.write(record)
+    assert sink.records == ['a', 'b'] and sink.count == 4 and sink.get_dropped() == 2
+    sink = CollectorSink()
+    for record in 'abcd':
+        sink.write(record)
+    assert sink.records == list('abcd') and sink.get_dropped() == 0
+    sink = Sink(limit=0)
+    sink.write('a')
+    assert sink.count == 1 and sink.get_dropped() == 1
+
+
+# the note about the dropped records is the last record, and there is none if nothing is dropped
+@pytest.mark.parametrize('limit, expected', [(None, 'a\nb\nc\n'), (3, 'a\nb\nc\n'), (2, 'a\nb\n1 more records\n'),
+                                             (0, '3 more records\n')])
+def test_dropped_note(limit, expected):
+    text = io.StringIO()
+    with StreamSink(text, limit=limit, dropped_note='{} more records') as sink:
+        for record in 'abc':
+            sink.write(record)
+    assert text.getvalue() == expected
+
+
+# empty is written without any record, end after the last one, and a sink is closed once
+def test_stream_format():
+    text = io.StringIO()
+    sink = StreamSink(text, separator=', ', end='.', empty='none')
+    sink.close()
+    sink.close()
+    assert text.getvalue() == 'none'
+    text = io.StringIO()
+    with StreamSink(text, separator=', ', end='.', empty='none') as sink:
+        sink.write('a')
+        sink.write('b')
+    sink.close()
+    assert text.getvalue() == 'a, b.'
+
+
+# the buffered records are written in batches, joined like the records of a single write
+def test_buffer(monkeypatch):
+    monkeypatch.setattr(sinks, 'BUFFER_SIZE', 2)
+    text = io.StringIO()
+    with StreamSink(text) as sink:
+        for record in 'abcde':
+            sink.write(record)
+            assert len(sink.buffer) < 2
+        assert text.getvalue() == 'a\nb\nc\nd'
+    assert text.getvalue() == 'a\nb\nc\nd\ne\n' and sink.written == 5
+
+
+def test_file_sink(tmp_path):
+    file_name = str(tmp_path / 'records.txt')
+    with FileSink(file_name, limit=1, dropped_note='and {} more') as sink:
+        sink.write('a')
+        sink.write('b')
+    assert sink.stream.closed
+    with open(file_name) as file:
+        assert file.read() == 'a\nand 1 more\n'
+
+
+# syntax_errors.txt with --max-errors, and the same text from a compile with max_errors
+def test_error_limit(tmp_path):
+    errors = compile_source_text(ERROR_SOURCE).syntax_errors
+    assert len(errors) > 2
+    file_name = str(tmp_path / 'syntax_errors.txt')
+    with get_error_sink(file_name, limit=2) as sink:
+        for error in errors:
+            sink.write(error)
+    with open(file_name) as file:
+        text = file.read()
+    assert text == '\n'.join(errors[:2] + [f'{len(errors) - 2} more syntax errors are not reported'])
+    result = compile_source_text(ERROR_SOURCE, max_errors=2)
+    assert result.syntax_errors == errors[:2] and result.error_count == len(errors)
+    assert result.get_syntax_errors_text() == text
+    assert compile_source_text(ERROR_SOURCE).get_syntax_errors_text() == '\n'.join(errors)
+    assert compile_source_text('void main(void) { }').get_syntax_errors_text() == ERROR_FORMAT['empty']
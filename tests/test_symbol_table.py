@@ -0,0 +1,49 @@
+from compiler import compile_source_text
+from symbol_table import SymbolTable, FIRST_ADDRESS, ARRAY_BASE, WORD_SIZE
+from vm import VM
+
+
+# a name is looked up from the innermost scope, and the symbols of a scope are gone when it's left
+def test_scopes():
+    symbols = SymbolTable()
+    a = symbols.declare('a')
+    symbols.enter_scope()
+    inner = symbols.declare('a')
+    b = symbols.declare('b')
+    assert symbols.lookup('a') is inner and symbols.get_depth() == 1
+    assert inner.address != a.address and symbols.get_symbol_at(b.address) is b
+    symbols.exit_scope()
+    assert symbols.lookup('a') is a and symbols.lookup('b') is None
+    symbols.exit_scope()        # the global scope is never left
+    assert symbols.get_depth() == 0 and symbols.lookup('a') is a
+
+
+# a name which is never declared becomes a global variable, also inside a scope
+def test_undeclared_name():
+    symbols = SymbolTable()
+    symbols.enter_scope()
+    address = symbols.get_address('x')
+    symbols.exit_scope()
+    assert symbols.lookup('x').address == address == FIRST_ADDRESS
+
+
+# an array leaves the variables, a variable which has just been declared gives its word back
+def test_arrays():
+    symbols = SymbolTable()
+    a = symbols.declare('a')
+    symbols.set_size(a, 3)
+    b = symbols.declare('b')
+    c = symbols.declare('c')
+    symbols.set_size(b, 2)
+    assert (a.address, b.address, c.address) == (ARRAY_BASE, ARRAY_BASE + 3 * WORD_SIZE, FIRST_ADDRESS + WORD_SIZE)
+    assert a.kind == b.kind == 'array' and symbols.get_symbol_at(FIRST_ADDRESS) is None
+    assert symbols.get_data_end() == FIRST_ADDRESS + 2 * WORD_SIZE
+    assert symbols.get_arrays() == range(ARRAY_BASE, ARRAY_BASE + 5 * WORD_SIZE, WORD_SIZE)
+    assert symbols.reserve(2) == symbols.get_data_end() - 2 * WORD_SIZE
+
+
+# the variables of a block shadow the outer ones only inside the block
+def test_shadowing_program():
+    source = ('int a; void main(void) { int b; a = 1; b = 2; { int a; a = 10; b = b + a; output(a); } '
+              'output(a); output(b); }')
+    assert VM(compile_source_text(source).program_block).run() == [10, 1, 12]
@@ -0,0 +1,77 @@
+import io
+import subprocess
+import sys
+
+import compiler
+from compiler import compile_source_text
+from differential_check import generate_sources
+from lexer import Lexer
+from parse import Parser
+from parse_tree import render_tree
+from token_array import TokenArray
+
+# programs with comments, lexical and syntax errors, an unclosed comment, a missing end, and stray tokens at the end
+SAMPLES = [
+    'int a;\nint b[10];\nvoid main(void) {\n    int i;\n    int j;\n    i = 0;\n    /* block comment\n       across '
+    'lines */\n    while (i < 10) {\n        b[i] = i * 2 + 1;\n        if (b[i] == 7) {\n            output(b[i]);\n'
+    '        } else {\n            a = a + b[i] / 1;\n        } endif\n        i = i + 1; // line comment\n    }\n'
+    '    switch (a) {\n        case 1:\n            output(1);\n            break;\n        case 2:\n'
+    '            output(2);\n        default:\n            output(a - 3);\n    }\n    output(a);\n}\n',
+    'void main(void) {\n    int x;\n    x = 3 +* 2;\n    if (x < ) output(x) endif\n    while x\n    123abc = 5;\n'
+    '    @ # $\n    */ \n    y = = 4;\n    x == 2;\n}\n/* unclosed comment that keeps going\n',
+    'int f(int a, int b[]) {\n    return a + b[0];\n}\nvoid main(void) {\n    int arr[5];\n    int k;\n'
+    '    k = f(2, arr);\n    output(k);\n    ///\n    /**/\n    /***/ /*a*b*/\n    k = k/2; k=k==3;\n}\n',
+    'int x;\nvoid main(void){x=1;/*abc',
+    'int x;\nvoid main(void){x=12',
+    '',
+    'int x; /* ok */ void main(void) { x = 2; }\n// trailing no newline',
+    'void main(void){int a; a = 1;}\n*',
+    'void main(void){int a; a = 1;}\n/',
+    'void main(void){int a; a = 1;}\n=',
+    'void main(void){int a; a = 1;}\n*/',
+    'void main(void){int a; a = 1;}\n12',
+    'void main(void){int a; a = 1;}\nab',
+    'void main(void){int a; a = 1 ;}\n\t\x0c\x0b x',
+    'int a;\n/* a */b*/c;',
+]
+
+
+# the outputs of a compile which can differ
+def get_outputs(source: str, prelex: bool, optimized: bool = False) -> tuple:
+    result = compile_source_text(source, want_tree=True, optimized=optimized, prelex=prelex)
+    return (result.get_parse_tree_text(), result.syntax_errors, result.error_count, result.instructions,
+            result.memory_end)
+
+
+# a parser which walks the token array gives the trees, the errors and the code of a parser which calls the lexer
+def test_prelex_parity():
+    sources = SAMPLES + [source for _, source in generate_sources(2, 1)]
+    for source in sources:
+        for optimized in [False, True]:
+            assert get_outputs(source, True, optimized) == get_outputs(source, False, optimized), source
+
+
+def parse_tree_text(parser: Parser) -> tuple:
+    text = io.StringIO()
+    render_tree(parser.get_parse_tree(), text)
+    return text.getvalue(), parser.get_syntax_errors()
+
+
+# the arrays read back from their bytes parse like the arrays of the lexer
+def test_cached_tokens():
+    for source in SAMPLES:
+        tokens = TokenArray.from_bytes(TokenArray(Lexer(io.StringIO(source))).to_bytes())
+        assert parse_tree_text(Parser(None, tree='node', tokens=tokens)) == \
+            parse_tree_text(Parser(io.StringIO(source), tree='node'))
+
+
+# compiler.py --prelex writes the files of a compile without it
+def test_prelex_option(tmp_path):
+    with open(tmp_path / 'input.txt', 'w') as file:
+        file.write(SAMPLES[1])
+    outputs = []
+    for options in [['--local'], ['--local', '--prelex']]:
+        subprocess.run([sys.executable, compiler.__file__] + options, cwd=tmp_path, check=True)
+        names = ['output.txt', 'syntax_errors.txt', 'parse_tree.txt']
+        outputs.append([(tmp_path / name).read_text(encoding='utf-8') for name in names])
+    assert outputs[0] == outputs[1]
@@ -0,0 +1,28 @@
+import pytest
+
+from compiler import compile_source_text
+from program_block import ProgramBlock
+from vm import VM
+
+
+# a result which doesn't fit in a word of the memory stops the program with its line
+def test_overflow():
+    with pytest.raises(OverflowError, match='line 2'):
+        VM(compile_source_text('void main(void){ output(100000 * 100000 * 100000 * 100000); }').program_block).run()
+
+
+# an immediate which the program block can't pack is printed as it is
+def test_large_immediate():
+    assert VM(compile_source_text('void main(void){ output(99999999999999999999); }').program_block).run() == \
+        [99999999999999999999]
+
+
+# an indirect access past the memory grows it and runs the same line again, the lines before it don't run again
+def test_grow_resumes_at_the_line():
+    program_block = ProgramBlock()
+    for i, line in enumerate([('ASSIGN', '#5000', 100, None), ('PRINT', '#1', None, None),
+                              ('ASSIGN', '#7', '@100', None), ('PRINT', '@100', None, None)]):
+        program_block[i] = line
+    vm = VM(program_block)
+    assert vm.run() == [1, 7]
+    assert vm.steps == 4 and len(vm.memory) > 5000
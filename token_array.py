@@ -0,0 +1,83 @@
+import marshal
+from array import array
+from typing import Dict, List, Tuple
+
+from lexer import Lexer
+from parse_table import load_table
+
+VALID_TOKENS = {'NUM', 'ID', 'KEYWORD', 'SYMBOL', '$$'}      # the tokens which the parser sees
+
+
+# some tokens are called with their lexeme (like int) but some aren't (like NUM)...
+def get_terminal(kind: str, lexeme: str) -> str:
+    if kind == 'KEYWORD' or kind == 'SYMBOL':
+        return lexeme
+    if kind == '$$':
+        return '$'
+    return kind
+
+
+# the name of the leaf of a token in the parse tree
+def get_leaf_name(kind: str, lexeme: str) -> str:
+    return '$' if kind == '$$' else f'({kind}, {lexeme})'
+
+
+# the whole input lexed at once into parallel arrays, the comments and the lexical errors are already dropped
+# each token has its terminal id, the id of its interned (kind, lexeme) and its line number
+# the last two tokens are $$, the lexer gives the line of $$ again after the first one (which may be the line after
+# the last one), and the parser stays on the last token when it reads past the end
+# the arrays don't keep the lexer, so they can be cached (to_bytes) and parsed many times
+class TokenArray:
+
+    def __init__(self, lexer: Lexer) -> None:
+        table = load_table()
+        terminal_ids = table['terminal_ids']
+        other = table['action_width'] - 1           # the column of the tokens which are not terminals
+        self.terminals = array('H')                 # terminal id of each token
+        self.lexeme_ids = array('I')                # interned lexeme id of each token
+        self.lines = array('i')                     # line number of each token
+        self.kinds: List[str] = []                  # token kind of each lexeme id
+        self.lexemes: List[str] = []                # lexeme of each lexeme id
+        self.names: List[str] = []                  # parse tree leaf name of each lexeme id
+        ids: Dict[Tuple[str, str], int] = {}
+        terminals = []                              # terminal id of each lexeme id
+        get_next_token = lexer.get_next_token
+        ends = 0                                    # number of the $$ tokens so far
+        while ends < 2:
+            kind, lexeme, line = get_next_token()
+            if kind not in VALID_TOKENS:
+                continue
+            lexeme_id = ids.get((kind, lexeme))
+            if lexeme_id is None:
+                lexeme_id = ids[kind, lexeme] = len(self.lexemes)
+                self.kinds.append(kind)
+                self.lexemes.append(lexeme)
+                self.names.append(get_leaf_name(kind, lexeme))
+                terminals.append(terminal_ids.get(get_terminal(kind, lexeme), other))
+            self.terminals.append(terminals[lexeme_id])
+            self.lexeme_ids.append(lexeme_id)
+            self.lines.append(line)
+            ends += kind == '$$'
+
+    def __len__(self) -> int:
+        return len(self.terminals)
+
+    # the token at an index like the lexer returns it: (kind, lexeme, line number)
+    def get_token(self, index: int) -> Tuple[str, str, int]:
+        lexeme_id = self.lexeme_ids[index]
+        return self.kinds[lexeme_id], self.lexemes[lexeme_id], self.lines[index]
+
+    # the arrays as bytes which from_bytes reads back (the terminal ids depend on the parse table)
+    def to_bytes(self) -> bytes:
+        return marshal.dumps((self.terminals.tobytes(), self.lexeme_ids.tobytes(), self.lines.tobytes(),
+                              self.kinds, self.lexemes, self.names))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'TokenArray':
+        tokens = cls.__new__(cls)
+        terminals, lexeme_ids, lines, tokens.kinds, tokens.lexemes, tokens.names = marshal.loads(data)
+        tokens.terminals, tokens.lexeme_ids, tokens.lines = array('H'), array('I'), array('i')
+        tokens.terminals.frombytes(terminals)
+        tokens.lexeme_ids.frombytes(lexeme_ids)
+        tokens.lines.frombytes(lines)
+        return tokens
@@ -0,0 +1,243 @@
+"""
+    Virtual machine
+    runs the three address codes of the program block in this process, the memory is a flat array
+    of words which is indexed by the addresses (every address is a word, like the addresses of the tester)
+
+    usage: python vm.py [-O] [--check] [--bench N] [--max-steps N] [FILE]
+"""
+import argparse
+import sys
+import time
+from array import array
+from typing import List, Tuple, Optional
+
+from program_block import ProgramBlock, INTEGER, DIRECT, IMMEDIATE, INDIRECT, MODE_BITS, MODE_MASK
+
+# opcodes of the decoded lines
+NOP, ADD, SUB, MULT, DIV, EQ, LT, ASSIGN, JPF, JP, PRINT = range(11)
+OPCODES = {'ADD': ADD, 'SUB': SUB, 'MULT': MULT, 'DIV': DIV, 'EQ': EQ, 'LT': LT, 'ASSIGN': ASSIGN, 'JPF': JPF,
+           'JP': JP, 'PRINT': PRINT}
+MAX_MEMORY = 1 << 24        # the memory grows up to this many words
+
+# a decoded line: (opcode, x mode, x, y mode, y, z mode, z), the modes are IMMEDIATE, DIRECT or INDIRECT
+# (an integer operand is a direct address, or the line number of a jump)
+Code = Tuple[int, int, int, int, int, int, int]
+
+
+# decodes an operand which isn't packed in the program block, only immediates (negative or too large to be
+# packed) are valid
+def decode_operand(operand: object, i: int) -> Tuple[int, int]:
+    if operand is None:
+        return DIRECT, 0
+    if type(operand) is str and operand.startswith('#'):
+        number = operand[2:] if operand.startswith('#-') else operand[1:]
+        if number.isdecimal() and number.isascii():
+            return IMMEDIATE, int(operand[1:])
+    raise ValueError(f'line {i}: unknown operand {operand!r}')
+
+
+# decodes the program block to integer opcodes and operands, the empty lines become NOPs
+def decode(program_block: ProgramBlock) -> List[Code]:
+    code = []
+    for i, opcode in enumerate(program_block.opcodes):
+        if not opcode:
+            code.append((NOP, 0, 0, 0, 0, 0, 0))
+            continue
+        name = program_block.opcode_names[opcode]
+        if name not in OPCODES:
+            raise ValueError(f'line {i}: unknown opcode {name}')
+        line = [OPCODES[name]]
+        for column in program_block.columns:
+            value = column[i]
+            if value < 0:       # no operand, or an operand which the program block can't pack (like #-4)
+                line.extend(decode_operand(program_block.operands[-1 - value], i))
+                continue
+            mode = value & MODE_MASK
+            line.extend((DIRECT if mode == INTEGER else mode, value >> MODE_BITS))
+        code.append(tuple(line))
+    return code
+
+
+class VM:
+
+    def __init__(self, program_block: ProgramBlock, max_steps: int = 0) -> None:
+        self.code = decode(program_block)       # decoded lines
+        self.max_steps = max_steps              # a positive limit stops a program which never ends
+        size = self.get_memory_size()
+        if size > MAX_MEMORY:
+            raise MemoryError(f'the program uses address {size - 1}, the memory has {MAX_MEMORY} words')
+        self.memory = array('q', bytes(8 * size))
+        self.output = []                        # printed values
+        self.steps = 0                          # number of the executed lines
+        self.elapsed = 0.0                      # running time in seconds
+
+    # the memory has all the direct addresses of the operands at first, indirect addresses may make it grow
+    def get_memory_size(self) -> int:
+        size = 0
+        for op, x_mode, x, y_mode, y, z_mode, z in self.code:
+            if op == JP:
+                continue
+            for mode, value in ((x_mode, x), (y_mode, y if op != JPF else 0), (z_mode, z)):
+                if mode != IMMEDIATE:
+                    size = max(size, value + 1)
+        return size
+
+    # makes the memory have the address, negative addresses and addresses over MAX_MEMORY are errors
+    def grow(self, address: int) -> None:
+        if address < 0 or address >= MAX_MEMORY:
+            raise IndexError(f'address {address} is out of memory')
+        size = max(2 * len(self.memory), address + 1)
+        self.memory.extend(bytes(8 * (min(size, MAX_MEMORY) - len(self.memory))))
+
+    # runs the program until it leaves the program block (or reaches max_steps), returns the printed values
+    def run(self) -> List[int]:
+        start = time.perf_counter()
+        pc = 0
+        steps = self.steps
+        try:
+            while True:
+                try:
+                    pc, steps = self.execute(pc, steps)
+                    break
+                except IndexError as error:     # an address which isn't in the memory yet
+                    address = get_missing_address(error)
+                    if address is None:
+                        raise
+                    self.grow(address)
+                    pc, steps = error.args[2:]      # the line runs again
+        finally:
+            self.steps = steps
+            self.elapsed += time.perf_counter() - start
+        return self.output
+
+    # the main loop, an indirect access which isn't in the memory raises IndexError(message, address, line, steps)
+    # before the line changes anything, so the line is executed again after the memory grows
+    def execute(self, pc: int, steps: int) -> Tuple[int, int]:
+        code = self.code
+        memory = self.memory
+        output = self.output
+        size = len(memory)
+        end = len(code)
+        max_steps = self.max_steps or -1
+        while pc < end:
+            if steps == max_steps:
+                raise RuntimeError(f'the program has not ended after {steps} steps')
+            op, x_mode, x, y_mode, y, z_mode, z = code[pc]
+            steps += 1
+            pc += 1
+            if op == NOP:
+                continue
+            if op == JP:        # an indirect jump (a return) goes to the line which the memory has
+                pc = x if x_mode != INDIRECT else memory[x]
+                continue
+            # the value of x
+            if x_mode == DIRECT:
+                x = memory[x]
+            elif x_mode == INDIRECT:
+                x = memory[x]
+                if not 0 <= x < size:
+                    raise IndexError('indirect address', x, pc - 1, steps - 1)
+                x = memory[x]
+            if op == JPF:
+                if not x:
+                    pc = y
+                continue
+            if op == PRINT:
+                output.append(x)
+                continue
+            if op == ASSIGN:
+                value, z_mode, z = x, y_mode, y
+            else:
+                if y_mode == DIRECT:
+                    y = memory[y]
+                elif y_mode == INDIRECT:
+                    y = memory[y]
+                    if not 0 <= y < size:
+                        raise IndexError('indirect address', y, pc - 1, steps - 1)
+                    y = memory[y]
+                if op == ADD:
+                    value = x + y
+                elif op == SUB:
+                    value = x - y
+                elif op == MULT:
+                    value = x * y
+                elif op == LT:
+                    value = int(x < y)
+                elif op == EQ:
+                    value = int(x == y)
+                else:       # division truncates towards zero, like C
+                    if not y:
+                        raise ZeroDivisionError(f'division by zero at line {pc - 1}')
+                    value = abs(x) // abs(y) * (1 if (x < 0) == (y < 0) else -1)
+            if z_mode == INDIRECT:
+                z = memory[z]
+                if not 0 <= z < size:
+                    raise IndexError('indirect address', z, pc - 1, steps - 1)
+            try:
+                memory[z] = value
+            except OverflowError:       # a word of the memory is an int64
+                raise OverflowError(f'the result of line {pc - 1} is out of the int64 range') from None
+        return pc, steps
+
+
+# the indirect address of an IndexError which the memory can grow to have
+def get_missing_address(error: IndexError) -> Optional[int]:
+    return error.args[1] if len(error.args) == 4 else None
+
+
+# compiles the file to the program block which the VM runs
+def compile_program(file_name: str, optimized: bool) -> ProgramBlock:
+    from compiler import build_program
+    from parse import Parser
+    from sinks import Sink
+
+    parser = Parser(file_name, tree=None, error_sink=Sink())    # no errors are kept
+    parser.get_parse_tree()
+    return build_program(parser, optimized)[0]
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='compile a C-minus file and run it')
+    arg_parser.add_argument('file', nargs='?', default='input.txt', help='source file (default: input.txt)')
+    arg_parser.add_argument('-O', '--optimize', action='store_true',
+                            help='run the optimized program (programs with functions are not optimized)')
+    arg_parser.add_argument('--check', action='store_true', help='check that the optimized program prints the same')
+    arg_parser.add_argument('--bench', type=int, default=0, metavar='N', help='compile and run N times and report '
+                                                                             'the average times')
+    arg_parser.add_argument('--max-steps', type=int, default=0, help='stop a program which runs longer than this')
+    args = arg_parser.parse_args()
+
+    runs = max(args.bench, 1)
+    compile_time = run_time = 0.0
+    executed = 0
+    for _ in range(runs):
+        compile_start = time.perf_counter()
+        block = compile_program(args.file, args.optimize)
+        compile_time += time.perf_counter() - compile_start
+        vm = VM(block, args.max_steps)
+        try:
+            vm.run()
+        except (ArithmeticError, RuntimeError) as error:   # the program fails, like a division by zero
+            print(f'the program stopped: {error}', file=sys.stderr)
+            sys.exit(1)
+        run_time += vm.elapsed
+        executed += vm.steps
+    if args.check:      # run the program which the other option gives
+        other = VM(compile_program(args.file, not args.optimize), args.max_steps)
+        try:
+            other.run()
+        except (ArithmeticError, RuntimeError) as error:
+            print(f'the {"plain" if args.optimize else "optimized"} program stopped: {error}', file=sys.stderr)
+            sys.exit(1)
+        if other.output != vm.output:
+            print('the optimized program prints other values', file=sys.stderr)
+            sys.exit(1)
+    if not args.bench:
+        print('\n'.join(map(str, vm.output)))
+        print(f'{vm.steps} executed lines in {vm.elapsed:.6f} s, {len(vm.memory)} words of memory', file=sys.stderr)
+        if args.check:
+            print(f'the {"plain" if args.optimize else "optimized"} program prints the same values in '
+                  f'{other.steps} executed lines, {len(other.memory)} words of memory', file=sys.stderr)
+    else:
+        print(f'{runs} runs: compile {compile_time / runs * 1000:.3f} ms, run {run_time / runs * 1000:.3f} ms, '
+              f'{executed / runs:.0f} executed lines, {executed / run_time if run_time else 0:.0f} lines/s')